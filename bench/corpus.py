@@ -0,0 +1,119 @@
+"""基准测试语料生成：按塔科夫客户端 / 服务端的形态生成压缩包、日志和标记文件。
+
+生成的文件放在工作目录中，参数相同时直接复用，避免每次都重新写入数 GB 数据。
+"""
+
+import json
+import random
+import shutil
+import zipfile
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, List
+
+# 生成大文件时每次写入的块（随机数据，不可压缩，与真实 .bundle 相近）
+_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class CorpusSpec:
+    """语料规模。"""
+    small_files: int  # 客户端压缩包中的小文件数量
+    bundle_count: int  # 以 ZIP_STORED 存放的大 .bundle 数量
+    bundle_size: int  # 每个 .bundle 的字节数
+    download_size: int  # 下载测试的文件大小（由本地 HTTP 替身在内存中提供）
+    log_size: int  # 服务端日志大小
+    mod_count: int  # 标记文件中的 MOD 数量
+    files_per_mod: int  # 每个 MOD 记录的文件数量
+
+
+SCALES: Dict[str, CorpusSpec] = {
+    # 几秒内跑完，用于改动后的快速对比
+    "small": CorpusSpec(small_files=5000, bundle_count=2, bundle_size=64 * 1024 * 1024,
+                        download_size=32 * 1024 * 1024, log_size=16 * 1024 * 1024,
+                        mod_count=20, files_per_mod=500),
+    # 接近真实客户端：数万个小文件加数 GB 的未压缩资源包
+    "full": CorpusSpec(small_files=40000, bundle_count=3, bundle_size=2 * 1024 * 1024 * 1024,
+                       download_size=512 * 1024 * 1024, log_size=256 * 1024 * 1024,
+                       mod_count=60, files_per_mod=3000),
+}
+
+
+def _write_random(f, size: int, rng: random.Random) -> None:
+    remaining = size
+    block = rng.randbytes(_CHUNK_SIZE)
+    while remaining > 0:
+        chunk = block[:min(_CHUNK_SIZE, remaining)]
+        f.write(chunk)
+        remaining -= len(chunk)
+
+
+def _is_fresh(path: Path, spec: CorpusSpec) -> bool:
+    """语料存在且由同一规模生成时复用。"""
+    stamp = path.with_name(path.name + ".spec.json")
+    try:
+        return path.exists() and json.loads(stamp.read_text(encoding="utf-8")) == asdict(spec)
+    except (OSError, ValueError):
+        return False
+
+
+def _mark_fresh(path: Path, spec: CorpusSpec) -> None:
+    path.with_name(path.name + ".spec.json").write_text(json.dumps(asdict(spec)), encoding="utf-8")
+
+
+def client_zip(workdir: Path, spec: CorpusSpec) -> Path:
+    """客户端形态的压缩包：BepInEx / 配置等小文件（DEFLATED）加若干大 .bundle（STORED）。"""
+    path = workdir / "client.zip"
+    if _is_fresh(path, spec):
+        return path
+    rng = random.Random(20)
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+        for idx in range(spec.small_files):
+            folder = ("BepInEx/plugins", "EscapeFromTarkov_Data/StreamingAssets/Windows/assets",
+                      "EscapeFromTarkov_Data/Managed", "SPT_Data/Server/database/locales")[idx % 4]
+            # 文本类小文件，内容有重复，压缩率接近真实配置和脚本
+            payload = (f'{{"id": {idx}, "name": "item_{idx}"}}\n' * rng.randint(4, 200)).encode()
+            archive.writestr(f"{folder}/sub{idx % 97}/file{idx}.json", payload)
+        for idx in range(spec.bundle_count):
+            info = zipfile.ZipInfo(f"EscapeFromTarkov_Data/StreamingAssets/Windows/maps/map{idx}.bundle")
+            info.compress_type = zipfile.ZIP_STORED
+            with archive.open(info, "w", force_zip64=True) as dst:
+                _write_random(dst, spec.bundle_size, rng)
+    _mark_fresh(path, spec)
+    return path
+
+
+def download_payload(spec: CorpusSpec) -> bytes:
+    """下载测试用的内容（不可压缩）。"""
+    return random.Random(21).randbytes(spec.download_size)
+
+
+def server_log(workdir: Path, spec: CorpusSpec) -> Path:
+    """SPT 服务端日志：user/logs/spt/ 下的大日志文件，返回 SPT 目录。"""
+    spt_dir = workdir / "SPT"
+    log_file = spt_dir / "user" / "logs" / "spt" / "spt.log"
+    if _is_fresh(log_file, spec):
+        return spt_dir
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+    line = "[2025-01-01 12:00:00.000][Info][SPT.Server] Loading database item templates... ok\n"
+    block = line * (1024 * 1024 // len(line))
+    with log_file.open("w", encoding="utf-8") as f:
+        written = 0
+        while written < spec.log_size:
+            f.write(block)
+            written += len(block)
+    _mark_fresh(log_file, spec)
+    return spt_dir
+
+
+def mod_files(spec: CorpusSpec, mod_idx: int) -> List[str]:
+    """一个 BepInEx 插件包的文件列表：大量文件共享很深的相同前缀。"""
+    prefix = Path("BepInEx") / "plugins" / f"Author{mod_idx}-PluginPack" / "assets"
+    return [str(prefix / f"group{idx % 25}" / f"item{idx}.bundle") for idx in range(spec.files_per_mod)]
+
+
+def reset_dir(path: Path) -> Path:
+    """清空并重建目录（只用于工作目录下的测试输出）。"""
+    shutil.rmtree(path, ignore_errors=True)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""性能基准：解压、下载、标记文件读写和服务端日志读取，结果写成 JSON 便于跨提交对比。
+
+用法：
+    python bench/run_bench.py                          # small 规模，结果写入 bench_results.json
+    python bench/run_bench.py --scale full --workdir D:/bench_cache
+    python bench/run_bench.py --compare old.json       # 与之前的结果对比
+    python bench/run_bench.py --only extract download  # 只跑名称中包含关键字的项目
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+# 添加项目根目录和 test 目录到路径（复用测试用的本地 HTTP 替身）
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "test"))
+
+from range_http_server import RangeHTTPServer
+from scripts import config, manifest, utils
+from scripts.config import GameVersion
+from scripts.launcher_runner import ServerLogReader
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import corpus  # noqa: E402
+
+
+class Bench:
+    """收集各项目的耗时：每个项目重复 repeat 次，记录每次耗时与中位数。"""
+
+    def __init__(self, repeat: int, only: List[str]) -> None:
+        self.repeat = repeat
+        self.only = only
+        self.results: List[dict] = []
+
+    def run(self, name: str, func: Callable[[], None], setup: Optional[Callable[[], None]] = None,
+            bytes_count: int = 0, items: int = 0) -> None:
+        """执行一个项目；setup 在每次计时前调用，不计入耗时。"""
+        if self.only and not any(key in name for key in self.only):
+            return
+        runs = []
+        for _ in range(self.repeat):
+            if setup:
+                setup()
+            started = time.perf_counter()
+            func()
+            runs.append(time.perf_counter() - started)
+        median = statistics.median(runs)
+        result = {"name": name, "median_s": round(median, 6), "min_s": round(min(runs), 6),
+                  "runs_s": [round(r, 6) for r in runs]}
+        line = f"{name:<40} 中位数 {median * 1000:10.1f} ms"
+        if bytes_count:
+            result["bytes"] = bytes_count
+            result["mb_per_s"] = round(bytes_count / 1048576 / median, 1) if median > 0 else 0.0
+            line += f"  {result['mb_per_s']:8.1f} MB/s"
+        if items:
+            result["items"] = items
+            line += f"  {items} 项"
+        print(line)
+        self.results.append(result)
+
+
+def bench_extract(bench: Bench, workdir: Path, spec: corpus.CorpusSpec) -> None:
+    zip_path = corpus.client_zip(workdir, spec)
+    index = utils.load_zip_index(zip_path)
+    files = sum(1 for entry in index.entries if not entry.is_dir())
+    target = workdir / "extract"
+
+    def _reset() -> None:
+        corpus.reset_dir(target)
+
+    bench.run("extract_zip.sequential", lambda: utils.extract_zip(zip_path, target), setup=_reset,
+              bytes_count=index.total_bytes, items=files)
+    workers = max(config.EXTRACT_WORKERS, 2)
+    bench.run(f"extract_zip.workers_{workers}", lambda: utils.extract_zip(zip_path, target, workers=workers),
+              setup=_reset, bytes_count=index.total_bytes, items=files)
+    # 目标目录已是同一版本：增量模式只做比对
+    utils.extract_zip(zip_path, target, workers=workers)
+    bench.run("extract_zip.incremental_unchanged",
+              lambda: utils.extract_zip(zip_path, target, workers=workers, incremental=True),
+              bytes_count=index.total_bytes, items=files)
+    bench.run("load_zip_index.warm", lambda: utils.load_zip_index(zip_path), items=files)
+
+
+def bench_download(bench: Bench, workdir: Path, spec: corpus.CorpusSpec) -> None:
+    payload = corpus.download_payload(spec)
+    dest = workdir / "download.bin"
+    with RangeHTTPServer({"client.zip": payload}) as server:
+        url = server.url("client.zip")
+
+        def _reset() -> None:
+            dest.unlink(missing_ok=True)
+
+        for segments in sorted({1, config.DOWNLOAD_SEGMENTS}):
+            bench.run(f"download_file.segments_{segments}",
+                      lambda: utils.download_file(url, dest, show_progress=False, segments=segments),
+                      setup=_reset, bytes_count=len(payload))
+
+
+def bench_manifest(bench: Bench, workdir: Path, spec: corpus.CorpusSpec) -> None:
+    root = workdir / "manifest"
+    version = GameVersion("bench", "server.zip", "client.zip")
+    mod_names = [f"Mod{idx}" for idx in range(spec.mod_count)]
+    total_files = spec.mod_count * spec.files_per_mod
+
+    def _record_all() -> None:
+        for idx, name in enumerate(mod_names):
+            manifest.record_mod_installation("1.0", "bench", root, name, corpus.mod_files(spec, idx))
+
+    def _fresh() -> None:
+        corpus.reset_dir(root)
+        manifest.write_manifest(root, version)
+
+    bench.run("manifest.record_mods", _record_all, setup=_fresh, items=total_files)
+    # 只运行部分项目时 record_mods 可能被跳过，这里重新准备一份完整的标记
+    _fresh()
+    _record_all()
+    size = manifest.manifest_db_path(root).stat().st_size
+    bench.run("manifest.load", lambda: manifest.load_manifest(root), bytes_count=size)
+    bench.run("manifest.get_mod_files", lambda: [manifest.get_mod_files(root, name) for name in mod_names],
+              items=spec.mod_count)
+    bench.run("manifest.update_server_version",
+              lambda: manifest.update_manifest_server_version(root, "bench-2", "server2.zip"), bytes_count=size)
+    bench.run("manifest.save_fika_config", lambda: manifest.save_fika_config(root, "host", "127.0.0.1"),
+              bytes_count=size)
+
+    def _remove_all() -> None:
+        for name in mod_names:
+            manifest.remove_mod_record(root, name)
+
+    bench.run("manifest.remove_mods", _remove_all, setup=lambda: (_fresh(), _record_all()), items=spec.mod_count)
+
+
+def bench_server_log(bench: Bench, workdir: Path, spec: corpus.CorpusSpec) -> None:
+    spt_dir = corpus.server_log(workdir, spec)
+    log_file = spt_dir / "user" / "logs" / "spt" / "spt.log"
+    size = log_file.stat().st_size
+    # 从日志开头读取：等同于服务端启动后写了整份日志
+    reader = ServerLogReader(log_file, 0)
+    bench.run("server_log.read_new_lines", reader.read_new_lines, bytes_count=size)
+    bench.run("server_log.contains_missing", lambda: reader.contains(["Server is running", "服务端已启动"]),
+              bytes_count=size)
+    bench.run("server_log.create", lambda: ServerLogReader.create(spt_dir))
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _compare(results: List[dict], baseline_path: Path) -> None:
+    """按项目名对比中位数，比值小于 1 表示变快。"""
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    old: Dict[str, float] = {item["name"]: item["median_s"] for item in baseline.get("results", [])}
+    print(f"\n与 {baseline_path}（{baseline.get('commit') or '未知提交'}）对比：")
+    for item in results:
+        before = old.get(item["name"])
+        if not before:
+            continue
+        ratio = item["median_s"] / before
+        print(f"{item['name']:<40} {before * 1000:10.1f} -> {item['median_s'] * 1000:10.1f} ms  x{ratio:.2f}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="一键安装器性能基准")
+    parser.add_argument("--scale", choices=sorted(corpus.SCALES), default="small", help="语料规模")
+    parser.add_argument("--workdir", type=Path, help="语料与输出目录（默认临时目录，指定后可复用已生成的语料）")
+    parser.add_argument("--repeat", type=int, default=3, help="每个项目的重复次数")
+    parser.add_argument("--output", type=Path, default=Path("bench_results.json"), help="结果文件")
+    parser.add_argument("--compare", type=Path, help="之前的结果文件，输出对比")
+    parser.add_argument("--only", nargs="*", default=[], help="只运行名称中包含这些关键字的项目")
+    args = parser.parse_args()
+
+    spec = corpus.SCALES[args.scale]
+    bench = Bench(args.repeat, args.only)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        workdir = args.workdir or Path(tmpdir)
+        workdir.mkdir(parents=True, exist_ok=True)
+        print(f"规模 {args.scale}，工作目录 {workdir}")
+        for suite in (bench_extract, bench_download, bench_manifest, bench_server_log):
+            suite(bench, workdir, spec)
+
+    report = {
+        "commit": _git_commit(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": args.scale,
+        "spec": asdict(spec),
+        "repeat": args.repeat,
+        "results": bench.results,
+    }
+    args.output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\n结果已写入 {args.output}")
+    if args.compare:
+        _compare(bench.results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,30 +1,148 @@
 # announcement.py 或者你原来的文件
 import json
+import threading
+import time
 import requests
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
+from . import config, http_client
 from .config import ANNOUNCEMENT_URL
 
-def get_announcement() -> Dict[str, Any]:
+# 公告缓存：内存中按 TTL 复用，同时持久化到 resources/，过期后用 ETag/Last-Modified 条件请求重新验证
+CACHE_TTL = config.ANNOUNCEMENT_TTL
+_CACHE_FILE = config.RESOURCES_DIR / "announcement_cache.json"
+_NETWORK_ERROR = "网络错误，无法获取公告，官方网站：tkf.pyden.dev"
+
+_cache: Optional[Dict[str, Any]] = None
+_cache_lock = threading.Lock()
+# 最近一次尝试联网的时间（含失败），保证同一个 TTL 窗口内最多联网一次
+_last_attempt = 0.0
+# 正在进行的联网请求，完成时 set
+_fetch_done: Optional[threading.Event] = None
+_refresh_thread: Optional[threading.Thread] = None
+
+
+def _load_disk_cache() -> Optional[Dict[str, Any]]:
+    """读取磁盘上的公告缓存，无效时返回 None。"""
+    try:
+        cached = json.loads(_CACHE_FILE.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+    if not isinstance(cached, dict) or not isinstance(cached.get("data"), dict):
+        return None
+    return cached
+
+
+def _save_disk_cache(cached: Dict[str, Any]) -> None:
+    """写入磁盘缓存（先写临时文件再替换），失败不影响主流程。"""
+    try:
+        _CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = _CACHE_FILE.with_name(_CACHE_FILE.name + ".tmp")
+        tmp_path.write_text(json.dumps(cached, ensure_ascii=False), encoding="utf-8")
+        tmp_path.replace(_CACHE_FILE)
+    except Exception:
+        pass
+
+
+def _fetch(cached: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """联网获取公告；已有缓存时发送条件请求，304 则沿用缓存内容。"""
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+    # 界面会等待公告：连接失败不重试，离线时尽快改用旧缓存
+    response = http_client.get_quick(ANNOUNCEMENT_URL, headers=headers)
+    if cached and response.status_code == 304:
+        return dict(cached, fetched_at=time.time())
+    response.raise_for_status()          # 4xx/5xx 会抛异常
+    data = response.json()               # 自动解析 JSON → dict
+
+    # 顺手做个简单校验，防止你哪天不小心把文件写坏了
+    if not isinstance(data, dict):
+        raise ValueError("公告文件不是有效的 JSON 对象")
+
+    return {
+        "data": data,
+        "etag": response.headers.get("etag", ""),
+        "last_modified": response.headers.get("last-modified", ""),
+        "fetched_at": time.time(),
+    }
+
+
+def _fallback(cached: Optional[Dict[str, Any]], error: str) -> Dict[str, Any]:
+    """联网失败时的返回值：有旧缓存时返回旧缓存（附带 "stale": True）。"""
+    if cached:
+        # 离线时使用上一次成功获取的公告
+        return {"success": True, "data": cached["data"], "stale": True}
+    return {"success": False, "error": error}
+
+
+def get_announcement(force_refresh: bool = False) -> Dict[str, Any]:
     """
     从 GitHub 获取公告，返回统一格式的字典。
     成功时：{"success": True, "data": {公告字典}}
     失败时：{"success": False, "error": "错误提示"}
-    """
-    try:
-        response = requests.get(ANNOUNCEMENT_URL, timeout=10)
-        response.raise_for_status()          # 4xx/5xx 会抛异常
-        data = response.json()               # 自动解析 JSON → dict
 
-        # 顺手做个简单校验，防止你哪天不小心把文件写坏了
-        if not isinstance(data, dict):
-            raise ValueError("公告文件不是有效的 JSON 对象")
+    TTL 内直接返回缓存；过期后重新验证，网络不可用时返回旧缓存（附带 "stale": True）。
+    联网期间不持有缓存锁；其他线程正在联网时等待它的结果，不重复请求。
+    """
+    global _cache, _last_attempt, _fetch_done
+    with _cache_lock:
+        if _cache is None:
+            _cache = _load_disk_cache()
+        cached = _cache
+        now = time.time()
+        if not force_refresh and cached and now - cached.get("fetched_at", 0) < CACHE_TTL:
+            return {"success": True, "data": cached["data"]}
+        waiting = _fetch_done
+        if waiting is None:
+            if not force_refresh and now - _last_attempt < CACHE_TTL:
+                # 本窗口内已经联网失败过，不再重复等待超时
+                return _fallback(cached, _NETWORK_ERROR)
+            _last_attempt = now
+            _fetch_done = threading.Event()
+    if waiting is not None:
+        waiting.wait()
+        return get_announcement()
 
-        return {"success": True, "data": data}
+    try:
+        fresh = _fetch(cached)
+        _save_disk_cache(fresh)
+        with _cache_lock:
+            _cache = fresh
+        return {"success": True, "data": fresh["data"]}
 
     except requests.exceptions.RequestException as e:
-        return {"success": False, "error": f"网络错误，无法获取公告，官方网站：tkf.pyden.dev"}
+        error = _NETWORK_ERROR
     except (json.JSONDecodeError, ValueError) as e:
-        return {"success": False, "error": f"公告错误{e}"}
+        error = f"公告错误{e}"
     except Exception as e:  # 兜底，永远不会崩溃
-        return {"success": False, "error": f"未知错误: {e}"}
\ No newline at end of file
+        error = f"未知错误: {e}"
+    finally:
+        with _cache_lock:
+            _fetch_done.set()
+            _fetch_done = None
+    return _fallback(cached, error)
+
+
+def peek_announcement() -> Dict[str, Any]:
+    """
+    不联网、不等待，立即返回最近一次获取到的公告（内存或磁盘缓存）。
+    返回格式与 get_announcement 相同；还没有任何缓存时返回失败结构。
+    """
+    # 不加锁：后台刷新持有锁期间也不能阻塞菜单绘制
+    cached = _cache if _cache is not None else _load_disk_cache()
+    if cached:
+        return {"success": True, "data": cached["data"]}
+    return {"success": False, "error": "正在获取公告..."}
+
+
+def refresh_in_background() -> None:
+    """在后台线程调用 get_announcement 刷新缓存；已有刷新在进行时不重复启动。"""
+    global _refresh_thread
+    if _refresh_thread is not None and _refresh_thread.is_alive():
+        return
+    _refresh_thread = threading.Thread(target=get_announcement, name="announcement-refresh", daemon=True)
+    _refresh_thread.start()
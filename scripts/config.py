@@ -1,6 +1,7 @@
 from dataclasses import dataclass
 from pathlib import Path
 from typing import List
+import os
 import sys
 
 # 路径配置：以仓库根目录为基础，便于在任何位置运行。
@@ -46,10 +47,22 @@ REQUIRED_DIR = RESOURCES_DIR / "required"
 TARGET_SUBDIR = "SPT"
 # 安装完成后放置的标记文件，用于判断已安装过
 MANIFEST_FILE = ".spt_installed.json"
+# 标记数据库（MOD 文件列表等），旧版 JSON 标记文件会被自动导入
+MANIFEST_DB = ".spt_installed.db"
+# MOD 覆盖的原文件备份区（安装目录下，与安装目录同一分区，移入移出只需重命名）
+MOD_BACKUP_DIR = ".spt_mod_backups"
 # 在线公告 URL
 ANNOUNCEMENT_URL = "https://gitee.com/ripang/tkflxbInstallationscript/raw/main/announcement.json"
+# 公告缓存有效期（秒），有效期内的菜单刷新不会联网
+ANNOUNCEMENT_TTL = 300
 # 软件版本（安装器程序本身的版本）
 SOFTWARE_VERSION = "1.5"
+# 解压线程数：zlib 解压时会释放 GIL，多线程可以用满多核
+EXTRACT_WORKERS = min(8, os.cpu_count() or 1)
+# 大文件下载的并发连接数（服务器支持 Range 时生效）
+DOWNLOAD_SEGMENTS = 4
+# 自动安装时同时进行客户端、服务端解压和 required 复制（共用 EXTRACT_WORKERS 个解压线程）
+CONCURRENT_INSTALL = True
 
 
 @dataclass(frozen=True)
@@ -86,6 +99,8 @@ class ServerVersion:
     version: str
     server_zip: str
     download_url: str
+    sha256: str = ""      # 压缩包 SHA-256，为空时不校验
+    size: int = 0         # 压缩包字节数，为 0 时不校验
 
 
 @dataclass(frozen=True)
@@ -94,6 +109,8 @@ class ModVersion:
     name: str
     zip_name: str
     download_url: str
+    sha256: str = ""      # 压缩包 SHA-256，为空时不校验
+    size: int = 0         # 压缩包字节数，为 0 时不校验
 
 
 def discover_server_versions_from_announcement() -> List[ServerVersion]:
@@ -102,10 +119,11 @@ def discover_server_versions_from_announcement() -> List[ServerVersion]:
     如果加载失败，返回空列表。
     """
     try:
-        import requests
-        response = requests.get(ANNOUNCEMENT_URL, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        from .announcement import get_announcement
+        ann = get_announcement()
+        if not ann["success"]:
+            return []
+        data = ann["data"]
         
         server_versions = data.get("server_versions", [])
         versions = []
@@ -114,7 +132,9 @@ def discover_server_versions_from_announcement() -> List[ServerVersion]:
                 version = ServerVersion(
                     version=item.get("version", ""),
                     server_zip=item.get("server_zip", ""),
-                    download_url=item.get("download_url", "")
+                    download_url=item.get("download_url", ""),
+                    sha256=str(item.get("sha256", "")).lower(),
+                    size=int(item.get("size", 0) or 0)
                 )
                 if version.version and version.server_zip and version.download_url:
                     versions.append(version)
@@ -143,10 +163,11 @@ def discover_mod_versions_from_announcement() -> List[ModVersion]:
     如果加载失败，返回空列表。
     """
     try:
-        import requests
-        response = requests.get(ANNOUNCEMENT_URL, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        from .announcement import get_announcement
+        ann = get_announcement()
+        if not ann["success"]:
+            return []
+        data = ann["data"]
         
         mod_versions = data.get("mod_versions", [])
         versions = [] # version = [ModVersion(name="", zip_name="", download_url="")]
@@ -155,7 +176,9 @@ def discover_mod_versions_from_announcement() -> List[ModVersion]:
                 version = ModVersion(
                     name=item.get("name", ""),
                     zip_name=item.get("zip_name", ""),
-                    download_url=item.get("download_url", "")
+                    download_url=item.get("download_url", ""),
+                    sha256=str(item.get("sha256", "")).lower(),
+                    size=int(item.get("size", 0) or 0)
                 )
                 if version.name and version.zip_name and version.download_url:
                     versions.append(version)
@@ -3,9 +3,10 @@
 from pathlib import Path
 from typing import Optional, TYPE_CHECKING
 
-from .. import config, utils
+from .. import config, ownership, resource_index, utils
 from ..config import ModVersion
-from ..manifest import load_manifest, record_mod_installation
+from ..manifest import get_install_info, record_mod_installation
+from ..stream_extract import download_and_extract
 
 if TYPE_CHECKING:
     from ..installers import InstallerState
@@ -58,27 +59,42 @@ def download_and_install_fika(state: "InstallerState", silent: bool = True) -> b
     
     mod_zip_path = config.MODS_DIR / fika_mod.zip_name
     
-    # 下载 MOD
-    if not mod_zip_path.exists():
-        if not silent:
-            print("正在下载 Fika 联机 MOD...")
-        success = utils.download_file(fika_mod.download_url, mod_zip_path, show_progress=not silent)
-        if not success:
-            if not silent:
-                print("Fika MOD 下载失败。")
-            return False
-    
-    # 安装 MOD
+    # 安装 MOD（本地没有压缩包时边下载边解压）
     try:
-        if not silent:
-            print("正在安装 Fika 联机 MOD...")
-        extracted_files = utils.extract_zip(mod_zip_path, install_path, strip_common_root=False, show_progress=not silent)
+        if mod_zip_path.exists() and not resource_index.check_package(mod_zip_path, fika_mod.sha256, fika_mod.size):
+            # 本地压缩包与公告不一致（下载不完整或已损坏），重新下载
+            mod_zip_path.unlink()
+        # 与安装其他 MOD 一样：暂存后以重命名方式提交，被覆盖的原文件移入备份区，卸载时还原
+        if mod_zip_path.exists():
+            if not silent:
+                print("正在安装 Fika 联机 MOD...")
+                conflicts = ownership.find_conflicts(install_path, utils.zip_entry_map(mod_zip_path), fika_mod.name)
+                if conflicts:
+                    ownership.print_conflicts(conflicts)
+            result = ownership.install_mod_files(install_path, fika_mod.name, mod_zip_path, show_progress=not silent)
+        else:
+            if not silent:
+                print("正在下载并安装 Fika 联机 MOD...")
+
+            def _download(stage_dir: Path) -> Optional[list]:
+                return download_and_extract(fika_mod.download_url, mod_zip_path, stage_dir,
+                                            show_progress=not silent, expected_sha256=fika_mod.sha256,
+                                            expected_size=fika_mod.size)
+
+            result = ownership.install_mod_files(install_path, fika_mod.name, mod_zip_path, extract=_download,
+                                                 show_progress=not silent)
+            if result is None:
+                if not silent:
+                    print("Fika MOD 下载失败。")
+                return False
+        extracted_files, backups = result
         
         # 记录安装
         mod_version = fika_mod.name.rsplit('-', 1)[-1] if '-' in fika_mod.name else ""
-        manifest = load_manifest(install_path)
+        manifest = get_install_info(install_path)
         mod_supported_versions = manifest.get("version", "") if manifest else ""
-        record_mod_installation(mod_version, mod_supported_versions, install_path, fika_mod.name, extracted_files)
+        record_mod_installation(mod_version, mod_supported_versions, install_path, fika_mod.name, extracted_files,
+                                backups)
         
         if not silent:
             print("联机MOD已安装完成")
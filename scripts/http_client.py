@@ -0,0 +1,70 @@
+"""共享的 HTTP 客户端：所有网络请求复用同一个连接池，统一超时、重试与压缩协商。"""
+
+import threading
+from typing import Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .config import SOFTWARE_VERSION
+
+# (连接超时, 读取超时) 秒
+DEFAULT_TIMEOUT = (10, 30)
+# 界面等待的请求（如公告）使用的超时：连接失败不重试，离线时几秒内返回
+QUICK_TIMEOUT = (3, 10)
+# 每个主机保留的最大连接数，需不小于分段下载的并发数
+POOL_MAXSIZE = 16
+
+# {连接重试次数: 会话}
+_sessions: Dict[int, requests.Session] = {}
+_session_lock = threading.Lock()
+
+
+def _build_session(connect_retries: int = 3) -> requests.Session:
+    """创建带连接池和重试策略的会话。"""
+    retry = Retry(
+        total=3,
+        connect=connect_retries,
+        read=0,  # 读取中断由调用方（如断点续传）自行处理
+        status=3,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({
+        "User-Agent": f"SPT-Installer/{SOFTWARE_VERSION}",
+        "Accept-Encoding": "gzip, deflate",
+    })
+    return session
+
+
+def get_session(connect_retries: int = 3) -> requests.Session:
+    """返回进程内共享的会话（keep-alive 连接会在多次请求之间复用），连接重试次数不同的请求各用一个会话。"""
+    session = _sessions.get(connect_retries)
+    if session is None:
+        with _session_lock:
+            session = _sessions.get(connect_retries)
+            if session is None:
+                session = _sessions[connect_retries] = _build_session(connect_retries)
+    return session
+
+
+def get(url: str, timeout=DEFAULT_TIMEOUT, **kwargs) -> requests.Response:
+    """通过共享会话发送 GET 请求。"""
+    return get_session().get(url, timeout=timeout, **kwargs)
+
+
+def get_quick(url: str, timeout=QUICK_TIMEOUT, **kwargs) -> requests.Response:
+    """发送连接失败不重试的 GET 请求，用于界面等待结果的请求（如公告），离线时尽快失败。"""
+    return get_session(connect_retries=0).get(url, timeout=timeout, **kwargs)
+
+
+def head(url: str, timeout=DEFAULT_TIMEOUT, **kwargs) -> requests.Response:
+    """通过共享会话发送 HEAD 请求。"""
+    return get_session().head(url, timeout=timeout, **kwargs)
@@ -0,0 +1,130 @@
+"""自动安装日志：安装过程中按批追加记录已写完的文件，中断后据此只补做未完成的部分。"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from .config import GameVersion, MANIFEST_FILE
+
+JOURNAL_FILE = MANIFEST_FILE + ".journal"
+# 累积这么多条记录或距上次写入超过 _FLUSH_INTERVAL 秒时写一批
+_BATCH_SIZE = 500
+_FLUSH_INTERVAL = 1.0
+
+
+def journal_path(target_root: Path) -> Path:
+    """返回安装日志路径（与标记文件放在同一目录）。"""
+    return target_root / JOURNAL_FILE
+
+
+def _read_records(path: Path) -> List[dict]:
+    """读取日志的每一行；中断时写了一半的最后一行会被忽略。"""
+    records = []
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+    except OSError:
+        pass
+    return records
+
+
+def pending_install_version(target_root: Path) -> Optional[str]:
+    """目录中存在未完成的安装时返回其版本标签，否则返回 None。"""
+    records = _read_records(journal_path(target_root))
+    if records and records[0].get("type") == "begin":
+        return records[0].get("version")
+    return None
+
+
+class InstallJournal:
+    """只追加的安装日志（JSON Lines）。
+
+    第一行记录安装的版本和压缩包，之后每行是某个阶段的一批已完成文件，或阶段完成标记。
+    写入按批进行并 fsync，进程被关闭时最多丢失最后一批记录（这些文件会被重新写入）。
+    """
+
+    def __init__(self, path: Path, completed: Dict[str, Set[str]], finished: Set[str]) -> None:
+        self.path = path
+        self._completed = completed
+        self._finished = finished
+        self._pending: List[tuple] = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._file = path.open("a", encoding="utf-8")
+
+    @classmethod
+    def open(cls, target_root: Path, version: GameVersion) -> "InstallJournal":
+        """打开安装日志：同一版本的未完成日志会被续用，否则重新开始。"""
+        path = journal_path(target_root)
+        records = _read_records(path)
+        header = {"type": "begin", "version": version.label, "client_zip": version.client_zip,
+                  "server_zip": version.server_zip}
+        completed: Dict[str, Set[str]] = {}
+        finished: Set[str] = set()
+        if records and {k: records[0].get(k) for k in header} == header:
+            for record in records[1:]:
+                if record.get("type") == "files":
+                    completed.setdefault(record["stage"], set()).update(record["files"])
+                elif record.get("type") == "stage_done":
+                    finished.add(record["stage"])
+            # 丢弃末尾可能写坏的行，保证之后追加的内容能被完整读取
+            path.write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records), encoding="utf-8")
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(header, ensure_ascii=False) + "\n", encoding="utf-8")
+        return cls(path, completed, finished)
+
+    def completed(self, stage: str) -> Set[str]:
+        """某个阶段已经写完的文件（目标相对路径，/ 分隔）。"""
+        return set(self._completed.get(stage, ()))
+
+    def is_finished(self, stage: str) -> bool:
+        return stage in self._finished
+
+    def record(self, stage: str, rel_path: str) -> None:
+        """记录一个写完的文件（线程安全），攒够一批再写入磁盘。"""
+        with self._lock:
+            self._pending.append((stage, rel_path))
+            if len(self._pending) >= _BATCH_SIZE or time.monotonic() - self._last_flush >= _FLUSH_INTERVAL:
+                self._flush()
+
+    def finish_stage(self, stage: str) -> None:
+        """标记阶段完成；续装时整个阶段都会被跳过。"""
+        with self._lock:
+            self._flush()
+            self._finished.add(stage)
+            self._write({"type": "stage_done", "stage": stage})
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush()
+            self._file.close()
+
+    def remove(self) -> None:
+        """安装完成（标记文件已写入）后删除日志。"""
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+    def _flush(self) -> None:
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        by_stage: Dict[str, List[str]] = {}
+        for stage, rel_path in self._pending:
+            by_stage.setdefault(stage, []).append(rel_path)
+        self._pending.clear()
+        for stage, files in by_stage.items():
+            self._completed.setdefault(stage, set()).update(files)
+            self._write({"type": "files", "stage": stage, "files": files})
+
+    def _write(self, record: dict) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
@@ -1,14 +1,19 @@
+import functools
 import json
 import shutil
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional, TYPE_CHECKING
+from typing import Dict, List, Optional, Set, Tuple, TYPE_CHECKING
 
 from . import config
 from .config import GameVersion
 from . import utils
 from .dotnet_env import post_install_dotnet_flow
-from .manifest import load_manifest, write_manifest
+from .install_journal import InstallJournal, pending_install_version
+from .manifest import BASE_CLIENT, BASE_SERVER, get_install_info, record_base_files, write_manifest
+from .progress import ProgressBar
 
 if TYPE_CHECKING:
     from .launcher_runner import ServerLogReader
@@ -89,7 +94,7 @@ def select_install_path(state: InstallerState) -> None:
             time.sleep(2)
             continue
 
-        manifest = load_manifest(chosen)
+        manifest = get_install_info(chosen)
         if manifest:
             # 已有安装标记，直接使用该路径
             state.install_path = chosen
@@ -99,6 +104,15 @@ def select_install_path(state: InstallerState) -> None:
             print(f"检测到已安装版本: {installed_ver}，已选中目录: {chosen}")
             return
 
+        pending_version = pending_install_version(chosen)
+        if pending_version:
+            # 上次安装被中断，保留已解压的文件，自动安装时继续
+            state.install_path = chosen
+            state.loaded_from_cache = True
+            _save_install_path(state.install_path)
+            print(f"检测到版本 {pending_version} 未完成的安装，已选中目录: {chosen}，请通过自动安装继续。")
+            return
+
         error = utils.ensure_empty_directory(chosen)
         if error:
             print(error)
@@ -119,8 +133,8 @@ def _require_install_path(state: InstallerState, enforce_empty: bool = False) ->
     if not state.install_path:
         print("请先通过选项 1 选择安装路径。")
         return None
-    if enforce_empty and not load_manifest(state.install_path):
-        # 只有在不存在标记文件时才要求空目录；有标记视为已安装目录。
+    if enforce_empty and not get_install_info(state.install_path) and not pending_install_version(state.install_path):
+        # 只有在不存在标记文件时才要求空目录；有标记视为已安装目录，有安装日志视为未完成的安装。
         error = utils.ensure_empty_directory(state.install_path)
         if error:
             print(error)
@@ -128,16 +142,150 @@ def _require_install_path(state: InstallerState, enforce_empty: bool = False) ->
     return state.install_path
     
 
-def _copy_required(target_root: Path) -> None:
-    """复制 required 安装必备组件到目标路径。"""
+def _required_files() -> Dict[str, int]:
+    """required 组件复制后的 {目标相对路径（/ 分隔）: 大小}。"""
+    src = config.REQUIRED_DIR
+    if not src.exists():
+        return {}
+    return {
+        f"required/{path.relative_to(src).as_posix()}": path.stat().st_size
+        for path in src.rglob("*") if path.is_file()
+    }
+
+
+def _copy_required(target_root: Path, show_progress: bool = True, progress: Optional[ProgressBar] = None) -> None:
+    """复制 required 安装必备组件到目标路径；传入 progress 时计入共用的进度条。"""
     src = config.REQUIRED_DIR
     dst = target_root / "required"
     if not src.exists():
         print("未找到 resources/required，跳过该步骤。")
         return
-    shutil.copytree(src, dst, dirs_exist_ok=True)
+    bar = progress or ProgressBar(sum(_required_files().values()), enabled=show_progress)
 
+    def _copy(src_file: str, dst_file: str) -> str:
+        result = shutil.copy2(src_file, dst_file)
+        bar.advance(Path(src_file).stat().st_size)
+        return result
 
+    try:
+        shutil.copytree(src, dst, dirs_exist_ok=True, copy_function=_copy)
+    finally:
+        if progress is None:
+            bar.finish()
+
+
+def _extract_stage(journal: Optional[InstallJournal], stage: str, zip_path: Path, install_path: Path,
+                   strip_common_root: bool, members: Optional[Set[str]] = None, **kwargs) -> None:
+    """解压一个安装阶段；有安装日志时跳过已记录完成的文件，并把新写完的文件记入日志。"""
+    on_entry = None
+    if journal is not None:
+        done = journal.completed(stage)
+        if done:
+            if members is None:
+                members = set(utils.zip_entry_map(zip_path, strip_common_root))
+            members = members - done
+        on_entry = functools.partial(journal.record, stage)
+    utils.extract_zip(zip_path, install_path, strip_common_root=strip_common_root, workers=config.EXTRACT_WORKERS,
+                      members=members, on_entry=on_entry, **kwargs)
+
+
+def _install_sequentially(install_path: Path, client_zip: Path, server_zip: Path,
+                          journal: Optional[InstallJournal] = None) -> Dict[str, float]:
+    """依次执行三个安装阶段，返回各阶段用时；日志中已完成的阶段会被跳过。"""
+    timings: Dict[str, float] = {}
+    steps = [
+        ("client", "客户端", "[1/3] 解压客户端文件...",
+         lambda: _extract_stage(journal, "client", client_zip, install_path, False, show_progress=True)),
+        ("server", "服务端", "[2/3] 解压服务端/补丁文件...",
+         lambda: _extract_stage(journal, "server", server_zip, install_path, True, show_progress=True)),
+        ("required", "required", "[3/3] 复制 required 必备组件...",
+         lambda: _copy_required(install_path)),
+    ]
+    for stage, label, message, run in steps:
+        if journal is not None and journal.is_finished(stage):
+            print(f"{message}上次已完成，跳过。")
+            continue
+        started = time.perf_counter()
+        print(message)
+        run()
+        if journal is not None:
+            journal.finish_stage(stage)
+        timings[label] = time.perf_counter() - started
+    return timings
+
+
+def _install_concurrently(install_path: Path, client_zip: Path, server_zip: Path,
+                          journal: Optional[InstallJournal] = None) -> Dict[str, float]:
+    """
+    同时执行三个安装阶段，解压共用 EXTRACT_WORKERS 个线程和一个进度条，返回各阶段用时。
+
+    与顺序安装结果一致：服务端中与客户端重名的文件在客户端解压完成后再写入；
+    required 与前两个阶段有重名文件时，整个复制阶段放到最后执行。
+    有安装日志时只处理日志中尚未完成的文件和阶段。
+    """
+    def _finished(stage: str) -> bool:
+        return journal is not None and journal.is_finished(stage)
+
+    def _remaining(stage: str, entries: Dict[str, Tuple[int, int]]) -> Dict[str, Tuple[int, int]]:
+        if _finished(stage):
+            return {}
+        done = journal.completed(stage) if journal is not None else set()
+        return {rel: meta for rel, meta in entries.items() if rel not in done}
+
+    # 文件名比较忽略大小写（Windows 文件系统不区分大小写）
+    client_map = utils.zip_entry_map(client_zip)
+    server_map = utils.zip_entry_map(server_zip, strip_common_root=True)
+    required_map = {} if _finished("required") else _required_files()
+    client_names = {rel.casefold() for rel in client_map}
+    server_overlap = {rel for rel in server_map if rel.casefold() in client_names}
+    earlier_names = client_names | {rel.casefold() for rel in server_map}
+    required_overlaps = any(rel.casefold() in earlier_names for rel in required_map)
+    client_todo = _remaining("client", client_map)
+    server_todo = _remaining("server", server_map)
+    if server_overlap and server_todo:
+        print(f"检测到 {len(server_overlap)} 个服务端文件与客户端重名，将在客户端解压完成后再写入。")
+    if required_overlaps:
+        print("required 组件与客户端或服务端文件重名，将在解压完成后再复制。")
+
+    total = (sum(size for _, size in client_todo.values()) + sum(size for _, size in server_todo.values())
+             + sum(required_map.values()))
+    timings: Dict[str, float] = {}
+    timings_lock = threading.Lock()
+
+    def _timed(label: str, func, *args, **kwargs) -> None:
+        started = time.perf_counter()
+        func(*args, **kwargs)
+        with timings_lock:
+            timings[label] = timings.get(label, 0.0) + time.perf_counter() - started
+
+    def _finish(stage: str) -> None:
+        if journal is not None:
+            journal.finish_stage(stage)
+
+    with ProgressBar(total) as progress, ThreadPoolExecutor(max_workers=config.EXTRACT_WORKERS) as pool:
+        extract = functools.partial(_extract_stage, journal, install_path=install_path, executor=pool,
+                                    progress=progress)
+        with ThreadPoolExecutor(max_workers=3) as stages:
+            futures = []
+            if not _finished("client"):
+                futures.append(stages.submit(_timed, "客户端", extract, "client", client_zip,
+                                             strip_common_root=False))
+            if not _finished("server"):
+                futures.append(stages.submit(_timed, "服务端", extract, "server", server_zip, strip_common_root=True,
+                                             members=set(server_map) - server_overlap))
+            if required_map and not required_overlaps:
+                futures.append(stages.submit(_timed, "required", _copy_required, install_path, progress=progress))
+            for future in futures:
+                future.result()
+        _finish("client")
+        # 重名的部分按原来的顺序覆盖写入
+        if server_overlap and not _finished("server"):
+            _timed("服务端", extract, "server", server_zip, strip_common_root=True, members=server_overlap)
+        _finish("server")
+        if required_map and required_overlaps:
+            _timed("required", _copy_required, install_path, progress=progress)
+        _finish("required")
+    return timings
 
 
 def auto_install(state: InstallerState, versions: List[GameVersion]) -> None:
@@ -167,11 +315,18 @@ def auto_install(state: InstallerState, versions: List[GameVersion]) -> None:
     version = versions[selection - 1]
 
     # 如果目录已有标记文件，则直接提示已安装并跳过重装
-    manifest = load_manifest(install_path)
+    manifest = get_install_info(install_path)
     if manifest:
         print(f"该目录已安装版本 {manifest.get('version', '未知')}，已跳过自动安装。")
         return
 
+    pending_version = pending_install_version(install_path)
+    if pending_version and pending_version != version.label:
+        print(f"该目录中有版本 {pending_version} 未完成的安装，请选择同一版本继续，或清空文件夹后重新安装。")
+        return
+    if pending_version:
+        print("检测到上次未完成的安装，将从中断处继续，只处理尚未完成的文件。")
+
     if not _confirm(f"确认开始安装版本 {version.label} 吗？"):
         print("已取消。")
         return
@@ -188,22 +343,35 @@ def auto_install(state: InstallerState, versions: List[GameVersion]) -> None:
         print(f"找不到服务端压缩包: {server_zip}")
         return
 
+    started = time.perf_counter()
+    try:
+        journal = InstallJournal.open(install_path, version)
+    except OSError as exc:
+        print(f"无法写入安装日志: {exc}")
+        return
     try:
-        print("[1/3] 解压客户端文件...")
-        utils.extract_zip(client_zip, install_path, strip_common_root=False, show_progress=True)
-        print("[2/3] 解压服务端/补丁文件...")
-        utils.extract_zip(server_zip, install_path, strip_common_root=True, show_progress=True)
-        print("[3/3] 复制 required 必备组件...")
-        _copy_required(install_path)
+        if config.CONCURRENT_INSTALL:
+            print("正在同时解压客户端、服务端并复制 required 必备组件...")
+            timings = _install_concurrently(install_path, client_zip, server_zip, journal)
+        else:
+            timings = _install_sequentially(install_path, client_zip, server_zip, journal)
     except Exception as exc:
+        journal.close()
         print(f"安装失败: {exc}")
+        print("再次执行自动安装时将从中断处继续。")
         return
+    stage_text = "，".join(f"{stage} {seconds:.1f} 秒" for stage, seconds in timings.items())
+    print(f"各阶段用时：{stage_text}；总用时 {time.perf_counter() - started:.1f} 秒")
 
-    # 安装完成后写入标记
+    # 安装完成后写入标记（含基础文件的归属，安装 MOD 时用于检测冲突），再删除安装日志
     try:
         write_manifest(install_path, version)
+        record_base_files(install_path, BASE_CLIENT, [str(Path(rel)) for rel in utils.zip_entry_map(client_zip)])
+        record_base_files(install_path, BASE_SERVER,
+                          [str(Path(rel)) for rel in utils.zip_entry_map(server_zip, strip_common_root=True)])
     except Exception as exc:  # 标记写入失败不影响安装结果
         print(f"写入安装标记失败（可忽略）: {exc}")
+    journal.remove()
 
     print("安装完成，已将文件解压到:", install_path)
     post_install_dotnet_flow()
\ No newline at end of file
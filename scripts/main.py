@@ -15,15 +15,17 @@ from .server_version import download_server_version, switch_server_version
 from .updater import check_update, auto_update
 from .uninstaller import uninstall_game
 from .utils import Colors, clear_screen, color_text
-from .announcement import get_announcement
+from .announcement import peek_announcement, refresh_in_background
 from .fika import be_host, join_host, restore_solo, get_fika_status
 from .profile_manager import export_profile, import_profile
+from .resource_index import verify_resources
 
 
 def print_menu(install_path: str | None, fika_status: str = "") -> None:
     """打印主菜单，使用颜色高亮选项。"""
     # ============ 获取并格式化公告 ============
-    ann = get_announcement()
+    # 只读取缓存，最新内容由后台线程获取，下次刷新菜单时显示
+    ann = peek_announcement()
     info = ann["data"] if ann["success"] else {}
     content = info.get("content","官方网站：tkf.pyden.dev").strip()
     title = f"====== SPT 自动安装器 {config.SOFTWARE_VERSION} ====== "
@@ -35,7 +37,7 @@ def print_menu(install_path: str | None, fika_status: str = "") -> None:
         print(color_text(f"公告：{ann['error']}", Colors.YELLOW))
 
     # ============ 检查版本更新 ============
-    update_info = check_update()
+    update_info = check_update(blocking=False)
     if update_info and update_info.get("has_update"):
         version_hint = color_text(
             f"发现新版本: {update_info['latest_version']} (当前: {update_info['current_version']})",
@@ -76,6 +78,7 @@ def print_more_menu() -> None:
     print(color_text("3) 检查软件更新", Colors.CYAN))
     print(color_text("4) 安装 .NET 环境", Colors.CYAN))
     print(color_text("5) 卸载游戏", Colors.CYAN))
+    print(color_text("6) 校验本地资源包", Colors.CYAN))
     print(color_text("0) 返回主菜单", Colors.RED))
 
 
@@ -226,6 +229,8 @@ def handle_more_menu(state: InstallerState) -> None:
             install_dotnet_environment()
         elif choice == "5":
             uninstall_game(state)
+        elif choice == "6":
+            verify_resources()
         elif choice == "0":
             print("已返回主菜单。")
             return
@@ -251,6 +256,8 @@ def main() -> None:
     """主循环：展示菜单并根据输入调用对应功能。"""
     state = InstallerState()
     while True:
+        # TTL 内不会联网；过期时在后台刷新，不阻塞菜单
+        refresh_in_background()
         clear_screen()
         fika_status = _get_fika_status_text(state)
         print_menu(str(state.install_path) if state.install_path else None, fika_status)
@@ -1,116 +1,722 @@
+"""安装标记：记录已安装的版本、MOD 及其文件、Fika 配置。
+
+数据保存在安装目录下的 SQLite 数据库（MANIFEST_DB）中，MOD 文件按路径建有索引，
+查询单个 MOD、查询文件归属和修改单个字段都不需要读写全部文件列表。
+旧版本的 JSON 标记文件（MANIFEST_FILE）会在首次访问时自动导入，JSON 格式仍可通过 export_manifest_json 导出。
+读取结果按数据库文件的 (mtime_ns, size) 缓存在进程内，本模块的修改函数会同步更新缓存。
+
+数据库使用 WAL 模式：每次修改作为一条事务追加到 -wal 日志，写入量只与修改的内容有关，中途崩溃不会留下写了一半的标记。
+累计修改超过 _SNAPSHOT_THRESHOLD 行时把完整内容导出为 JSON 快照（先写临时文件再重命名）；
+数据库损坏时会被移到一旁，并从这份快照重建。
+
+除 MOD 外，基础客户端 / 服务端的文件也以 BASE_CLIENT / BASE_SERVER 为名记录在同一张表中（kind = 'base'），
+构成完整的 路径 → 所有者 索引，用于安装 MOD 前检测冲突（见 ownership）；它们不出现在 MOD 列表中。
+"""
+
+import copy
 import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .config import GameVersion, MANIFEST_DB, MANIFEST_FILE
 
-from .config import GameVersion, MANIFEST_FILE
+# 表结构有变化时递增（保存在 PRAGMA user_version 中）
+_SCHEMA_VERSION = 1
+# 自上次 JSON 快照以来累计修改的行数超过该值时重新导出快照
+_SNAPSHOT_THRESHOLD = 20000
+# find_file_owners 中一条 IN 查询最多带的文件名数（SQLite 参数个数有上限）
+_QUERY_BATCH = 500
+# 文件路径按所在文件夹分组保存：dirs 保存文件夹（含末尾分隔符），files 只保存文件名，
+# 同一插件包中成千上万个文件共享的长前缀只存一次。path_key / name_key 为忽略大小写与分隔符差异的查询键
+# （Windows 上 BepInEx/Plugins 与 BepInEx/plugins 是同一个文件夹），归属查询按查询键匹配
+_SCHEMA_STATEMENTS = (
+    """CREATE TABLE IF NOT EXISTS installs (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version TEXT NOT NULL DEFAULT '',
+        server_zip TEXT NOT NULL DEFAULT '',
+        client_zip TEXT NOT NULL DEFAULT '',
+        installed_at TEXT NOT NULL DEFAULT '',
+        updated_at TEXT,
+        fika TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS mods (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE,
+        mod_version TEXT NOT NULL DEFAULT '',
+        mod_supported_versions TEXT NOT NULL DEFAULT '',
+        installed_at TEXT NOT NULL DEFAULT '',
+        kind TEXT NOT NULL DEFAULT 'mod'
+    )""",
+    """CREATE TABLE IF NOT EXISTS dirs (
+        id INTEGER PRIMARY KEY,
+        path TEXT NOT NULL UNIQUE,
+        path_key TEXT NOT NULL DEFAULT ''
+    )""",
+    """CREATE TABLE IF NOT EXISTS files (
+        id INTEGER PRIMARY KEY,
+        mod_id INTEGER NOT NULL REFERENCES mods(id),
+        dir_id INTEGER NOT NULL REFERENCES dirs(id),
+        name TEXT NOT NULL,
+        backup INTEGER NOT NULL DEFAULT 0,
+        name_key TEXT NOT NULL DEFAULT ''
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_files_path ON files(dir_id, name)",
+    "CREATE INDEX IF NOT EXISTS idx_files_key ON files(dir_id, name_key)",
+    "CREATE INDEX IF NOT EXISTS idx_files_mod ON files(mod_id)",
+    "CREATE INDEX IF NOT EXISTS idx_dirs_key ON dirs(path_key)",
+    """CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    )""",
+)
+# 按文件夹分组后的文件列表：[[文件夹（含末尾分隔符，顶层为 ""）, [文件名, ...]], ...]
+_FILE_GROUPS_KEY = "file_groups"
+
+# 基础客户端 / 服务端在归属索引中的名称
+BASE_CLIENT = "<客户端>"
+BASE_SERVER = "<服务端>"
+BASE_OWNERS = (BASE_CLIENT, BASE_SERVER)
 
 
 def manifest_path(target_root: Path) -> Path:
-    """返回标记文件路径。"""
+    """返回 JSON 标记文件路径（旧版本的标记文件，也是默认的导出位置）。"""
     return target_root / MANIFEST_FILE
 
 
+def manifest_db_path(target_root: Path) -> Path:
+    """返回标记数据库路径。"""
+    return target_root / MANIFEST_DB
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+@dataclass
+class _CacheEntry:
+    """一个安装目录的读取缓存。"""
+    stamp: tuple
+    info: Optional[dict] = None  # get_install_info 的结果
+    full: Optional[dict] = None  # load_manifest 的结果
+
+
+# {数据库路径: 缓存}；文件被其他进程修改后 stamp 不再一致，下次读取时重新查询
+_cache: Dict[Path, _CacheEntry] = {}
+_cache_lock = threading.Lock()
+
+
+def _stamp(target_root: Path) -> Optional[tuple]:
+    """数据库文件（及 WAL 文件）的 (mtime_ns, size)；数据库不存在时返回 None。"""
+    db_path = manifest_db_path(target_root)
+    parts: List[Optional[Tuple[int, int]]] = []
+    for path in (db_path, db_path.with_name(db_path.name + "-wal")):
+        try:
+            stat = path.stat()
+            parts.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            parts.append(None)
+    return tuple(parts) if parts[0] else None
+
+
+def _cached(target_root: Path, stamp: Optional[tuple]) -> Optional[_CacheEntry]:
+    """返回仍然有效的缓存。"""
+    if stamp is None:
+        return None
+    with _cache_lock:
+        entry = _cache.get(manifest_db_path(target_root))
+        return entry if entry is not None and entry.stamp == stamp else None
+
+
+def _remember(target_root: Path, stamp: Optional[tuple], **fields) -> None:
+    """保存读取结果；stamp 为读取前取得的值，读取期间文件被修改时下次会重新读取。"""
+    if stamp is None:
+        return
+    key = manifest_db_path(target_root)
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is None or entry.stamp != stamp:
+            entry = _cache[key] = _CacheEntry(stamp)
+        for name, value in fields.items():
+            setattr(entry, name, value)
+
+
+def _write_through(target_root: Path, before: Optional[tuple], update: Callable[[_CacheEntry], None]) -> None:
+    """修改提交后同步更新缓存。
+
+    before 为修改前的 stamp：缓存与修改前的文件一致时就地更新并记录新的 stamp，否则丢弃缓存。
+    """
+    key = manifest_db_path(target_root)
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is None:
+            return
+        after = _stamp(target_root)
+        if before is None or entry.stamp != before or after is None:
+            del _cache[key]
+            return
+        update(entry)
+        entry.stamp = after
+
+
+def _split_path(path: str) -> Tuple[str, str]:
+    """拆成 (文件夹（含末尾分隔符）, 文件名)，拼接后与原字符串完全一致。"""
+    cut = max(path.rfind("/"), path.rfind("\\")) + 1
+    return path[:cut], path[cut:]
+
+
+def encode_file_groups(files: Iterable[str]) -> List[list]:
+    """把文件列表编码为按文件夹分组的形式：连续位于同一文件夹的文件合为一组，解码后顺序不变。"""
+    groups: List[list] = []
+    for path in files:
+        folder, name = _split_path(path)
+        if groups and groups[-1][0] == folder:
+            groups[-1][1].append(name)
+        else:
+            groups.append([folder, [name]])
+    return groups
+
+
+def decode_file_groups(groups: Iterable[list]) -> Iterator[str]:
+    """encode_file_groups 的逆过程，逐个产出完整路径。"""
+    for folder, names in groups:
+        for name in names:
+            yield folder + name
+
+
+def _mod_files_from_json(info: dict) -> Iterable[str]:
+    """JSON 中的 MOD 文件列表：新格式为分组编码，旧格式为完整路径列表。"""
+    if _FILE_GROUPS_KEY in info:
+        return decode_file_groups(info[_FILE_GROUPS_KEY])
+    return info.get("files", [])
+
+
+def _import_json(conn: sqlite3.Connection, payload: dict) -> None:
+    """把旧版 JSON 标记文件的内容写入数据库。"""
+    fika = payload.get("fika")
+    conn.execute(
+        "INSERT OR REPLACE INTO installs (id, version, server_zip, client_zip, installed_at, updated_at, fika) "
+        "VALUES (1, ?, ?, ?, ?, ?, ?)",
+        (payload.get("version", ""), payload.get("server_zip", ""), payload.get("client_zip", ""),
+         payload.get("installed_at", ""), payload.get("updated_at"),
+         json.dumps(fika, ensure_ascii=False) if fika is not None else None),
+    )
+    for name, info in (payload.get("mods") or {}).items():
+        _insert_mod(conn, name, info.get("mod_version", ""), info.get("mod_supported_versions", ""),
+                    info.get("installed_at", ""), _mod_files_from_json(info),
+                    decode_file_groups(info.get("backups", [])))
+    for owner, groups in payload.get("base_files", {}).items():
+        _insert_mod(conn, owner, "", "", "", decode_file_groups(groups), kind="base")
+
+
+def _insert_mod(conn: sqlite3.Connection, name: str, mod_version, mod_supported_versions, installed_at: str,
+                files: Iterable[str], backups: Iterable[str] = (), kind: str = "mod") -> int:
+    """写入（或替换）一个 MOD 及其文件，返回记录的文件数；backups 中的文件标记为备份区中有原文件。"""
+    row = conn.execute("SELECT id FROM mods WHERE name = ?", (name,)).fetchone()
+    if row:
+        _delete_mod_files(conn, row[0])
+        conn.execute("DELETE FROM mods WHERE id = ?", (row[0],))
+    mod_id = conn.execute(
+        "INSERT INTO mods (name, mod_version, mod_supported_versions, installed_at, kind) VALUES (?, ?, ?, ?, ?)",
+        (name, mod_version or "", mod_supported_versions or "", installed_at, kind),
+    ).lastrowid
+    backups = set(backups)
+    before = conn.total_changes
+    # files 可以是生成器，逐条写入，不在内存中保存完整列表
+    conn.executemany("INSERT INTO files (mod_id, dir_id, name, backup, name_key) VALUES (?, ?, ?, ?, ?)",
+                     _file_rows(conn, ((mod_id, path, path in backups) for path in files)))
+    return conn.total_changes - before
+
+
+def _file_rows(conn: sqlite3.Connection,
+               items: Iterable[Tuple[int, str, bool]]) -> Iterator[Tuple[int, int, str, bool, str]]:
+    """把 (mod_id, 路径, 是否有备份) 转成 files 表的行（含查询键），按需创建 dirs 记录。"""
+    dir_ids: Dict[str, int] = {}
+    for mod_id, path, backup in items:
+        folder, name = _split_path(path)
+        dir_id = dir_ids.get(folder)
+        if dir_id is None:
+            conn.execute("INSERT OR IGNORE INTO dirs (path, path_key) VALUES (?, ?)", (folder, _path_key(folder)))
+            dir_id = dir_ids[folder] = conn.execute("SELECT id FROM dirs WHERE path = ?", (folder,)).fetchone()[0]
+        yield mod_id, dir_id, name, backup, _path_key(name)
+
+
+def _delete_mod_files(conn: sqlite3.Connection, mod_id: int) -> None:
+    """删除 MOD 的文件记录，以及因此不再被引用的文件夹。"""
+    dir_ids = [row[0] for row in conn.execute("SELECT DISTINCT dir_id FROM files WHERE mod_id = ?", (mod_id,))]
+    conn.execute("DELETE FROM files WHERE mod_id = ?", (mod_id,))
+    conn.executemany("DELETE FROM dirs WHERE id = ? AND NOT EXISTS (SELECT 1 FROM files WHERE dir_id = dirs.id)",
+                     ((dir_id,) for dir_id in dir_ids))
+
+
+def _path_key(path: str) -> str:
+    """归属查询用的键：忽略大小写，分隔符统一为 /。"""
+    return path.replace("\\", "/").casefold()
+
+
+def _prepare(conn: sqlite3.Connection) -> None:
+    """新数据库建表；数据库文件损坏时抛出 sqlite3.DatabaseError。"""
+    conn.execute("PRAGMA synchronous = NORMAL")
+    if conn.execute("PRAGMA user_version").fetchone()[0] == _SCHEMA_VERSION:
+        return
+    # journal_mode 不能在事务中修改；WAL 模式会保存在数据库文件中
+    conn.execute("PRAGMA journal_mode = WAL")
+    with conn:
+        conn.execute("BEGIN")
+        for statement in _SCHEMA_STATEMENTS:
+            conn.execute(statement)
+        conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+
+def _read_snapshot(target_root: Path) -> Optional[dict]:
+    """读取 JSON 快照（或旧版标记文件），不存在或无法解析时返回 None。"""
+    try:
+        return json.loads(manifest_path(target_root).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _quarantine(db_path: Path) -> None:
+    """把损坏的数据库（连同 WAL 文件）改名保留，之后从快照重建。"""
+    suffix = datetime.now().strftime("%Y%m%d%H%M%S")
+    print(f"标记数据库已损坏，已另存为 {db_path.name}.corrupt-{suffix}，将从快照恢复（快照之后的修改可能丢失）。")
+    for extra in ("", "-wal", "-shm"):
+        path = db_path.with_name(db_path.name + extra)
+        try:
+            if path.exists():
+                os.replace(path, path.with_name(f"{path.name}.corrupt-{suffix}"))
+        except OSError:
+            pass
+
+
+def _is_corruption(exc: sqlite3.Error) -> bool:
+    # OperationalError（如数据库被锁定）也是 DatabaseError 的子类，不属于损坏
+    return isinstance(exc, sqlite3.DatabaseError) and not isinstance(exc, sqlite3.OperationalError)
+
+
+def _count_changes(conn: sqlite3.Connection, changed: int) -> int:
+    """累加自上次快照以来的修改行数，返回累计值。"""
+    with conn:
+        conn.execute("INSERT INTO meta (key, value) VALUES ('changes_since_snapshot', ?) "
+                     "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value", (changed,))
+    return conn.execute("SELECT value FROM meta WHERE key = 'changes_since_snapshot'").fetchone()[0]
+
+
+@contextmanager
+def _open_store(target_root: Path, create: bool = False) -> Iterator[Optional[sqlite3.Connection]]:
+    """打开标记数据库，块正常结束时提交，出错时回滚。
+
+    数据库不存在（或已损坏）时：有 JSON 快照 / 旧版标记文件则自动导入；create 为 True 时新建；
+    否则产出 None（视为未安装）。块内有修改时累计修改量，超过阈值后刷新 JSON 快照。
+    """
+    db_path = manifest_db_path(target_root)
+    conn: Optional[sqlite3.Connection] = None
+    if db_path.exists():
+        conn = sqlite3.connect(db_path)
+        try:
+            _prepare(conn)
+        except sqlite3.Error as exc:
+            conn.close()
+            if not _is_corruption(exc):
+                raise
+            conn = None
+            _quarantine(db_path)
+    snapshot: Optional[dict] = None
+    if conn is None:
+        snapshot = _read_snapshot(target_root)
+        if snapshot is None and not create:
+            yield None
+            return
+        conn = sqlite3.connect(db_path)
+        _prepare(conn)
+
+    pending = 0
+    corrupted = False
+    try:
+        if snapshot is not None:
+            with conn:
+                _import_json(conn, snapshot)
+        start = conn.total_changes
+        with conn:
+            yield conn
+        changed = conn.total_changes - start
+        if changed:
+            pending = _count_changes(conn, changed)
+    except sqlite3.Error as exc:
+        corrupted = _is_corruption(exc)
+        raise
+    finally:
+        conn.close()
+        if corrupted:
+            _quarantine(db_path)
+    if pending >= _SNAPSHOT_THRESHOLD or (pending and not manifest_path(target_root).exists()):
+        export_manifest_json(target_root)
+
+
+def _installed(conn: Optional[sqlite3.Connection]) -> bool:
+    return conn is not None and conn.execute("SELECT 1 FROM installs WHERE id = 1").fetchone() is not None
+
+
+def _directories(files: Iterable[str]) -> List[str]:
+    """文件所在的文件夹（去重、排序）。"""
+    directories = {_split_path(file_path)[0][:-1] for file_path in files}
+    directories.discard("")
+    return sorted(directories)
+
+
 def load_manifest(target_root: Path) -> Optional[dict]:
-    """读取标记文件，无法读取时返回 None。"""
-    path = manifest_path(target_root)
-    if not path.exists():
+    """读取完整的标记内容（与旧版 JSON 标记文件格式相同），未安装或无法读取时返回 None。
+
+    会读出所有 MOD 的文件列表；只需要部分信息时使用 get_install_info / get_mod_files 等函数。
+    返回的是缓存中的对象，调用方不要修改；之后修改标记时缓存会换成新的对象，已返回的对象保持不变。
+    """
+    stamp = _stamp(target_root)
+    entry = _cached(target_root, stamp)
+    if entry is not None and entry.full is not None:
+        return entry.full
+    try:
+        with _open_store(target_root) as conn:
+            if not _installed(conn):
+                return None
+            payload = _install_row(conn)
+            mods: Dict[str, dict] = {}
+            files_by_id: Dict[int, List[str]] = {}
+            backups_by_id: Dict[int, List[str]] = {}
+            for mod_id, name, mod_version, supported, installed_at in conn.execute(
+                    "SELECT id, name, mod_version, mod_supported_versions, installed_at FROM mods "
+                    "WHERE kind = 'mod' ORDER BY id"):
+                files_by_id[mod_id] = []
+                backups_by_id[mod_id] = []
+                mods[name] = {
+                    "mod_version": mod_version,
+                    "mod_supported_versions": supported,
+                    "files": files_by_id[mod_id],
+                    "installed_at": installed_at,
+                }
+            for mod_id, folder, name, backup in conn.execute(
+                    "SELECT files.mod_id, dirs.path, files.name, files.backup FROM files "
+                    "JOIN dirs ON dirs.id = files.dir_id JOIN mods ON mods.id = files.mod_id "
+                    "WHERE mods.kind = 'mod' ORDER BY files.id"):
+                files_by_id[mod_id].append(folder + name)
+                if backup:
+                    backups_by_id[mod_id].append(folder + name)
+            for mod_id, info in zip(files_by_id, mods.values()):
+                info["directories"] = _directories(info["files"])
+                if backups_by_id[mod_id]:
+                    info["backups"] = backups_by_id[mod_id]
+            payload["mods"] = mods
+    except sqlite3.Error:
         return None
+    _remember(target_root, stamp, full=payload)
+    return payload
+
+
+def _install_row(conn: sqlite3.Connection) -> dict:
+    version, server_zip, client_zip, installed_at, updated_at, fika = conn.execute(
+        "SELECT version, server_zip, client_zip, installed_at, updated_at, fika FROM installs WHERE id = 1"
+    ).fetchone()
+    payload = {"version": version, "server_zip": server_zip, "client_zip": client_zip, "installed_at": installed_at}
+    if updated_at:
+        payload["updated_at"] = updated_at
+    if fika:
+        payload["fika"] = json.loads(fika)
+    return payload
+
+
+def get_install_info(target_root: Path) -> Optional[dict]:
+    """读取安装信息（版本、压缩包、时间、Fika 配置），不含 MOD 文件列表；未安装时返回 None。
+
+    数据库未变化时直接返回缓存的副本，只需一次 stat。
+    """
+    stamp = _stamp(target_root)
+    entry = _cached(target_root, stamp)
+    if entry is not None and entry.info is not None:
+        return copy.deepcopy(entry.info)
     try:
-        return json.loads(path.read_text(encoding="utf-8"))
-    except Exception:
+        with _open_store(target_root) as conn:
+            info = _install_row(conn) if _installed(conn) else None
+    except sqlite3.Error:
         return None
+    if info is not None:
+        _remember(target_root, stamp, info=info)
+        return copy.deepcopy(info)
+    return None
 
 
 def write_manifest(target_root: Path, version: GameVersion) -> None:
-    """写入标记文件，记录已安装的版本和时间。"""
-    path = manifest_path(target_root)
-    payload = {
-        "version": version.label,
-        "server_zip": version.server_zip,
-        "client_zip": version.client_zip,
-        "installed_at": datetime.now().isoformat(timespec="seconds"),
-        "mods": {},  # 初始为空的 MOD 记录
-    }
-    path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    """写入标记，记录已安装的版本和时间（清空之前的 MOD 记录），并导出 JSON 标记文件。"""
+    with _open_store(target_root, create=True) as conn:
+        conn.execute("DELETE FROM files")
+        conn.execute("DELETE FROM dirs")
+        conn.execute("DELETE FROM mods")
+        conn.execute(
+            "INSERT OR REPLACE INTO installs (id, version, server_zip, client_zip, installed_at) "
+            "VALUES (1, ?, ?, ?, ?)",
+            (version.label, version.server_zip, version.client_zip, _now()),
+        )
+    with _cache_lock:
+        _cache.pop(manifest_db_path(target_root), None)
+    export_manifest_json(target_root)
+
+
+def export_manifest_json(target_root: Path, dest: Optional[Path] = None) -> Optional[Path]:
+    """把标记导出为旧版 JSON 格式（默认写到 MANIFEST_FILE），返回写入的路径；未安装时返回 None。
+
+    写到默认位置时即为快照：之后的修改只写入数据库，数据库丢失或损坏时从快照重新导入。
+    """
+    payload = load_manifest(target_root)
+    if payload is None:
+        return None
+    snapshot = dest is None
+    dest = dest or manifest_path(target_root)
+    # MOD 文件列表按文件夹分组保存，导入时两种格式都能识别
+    exported = dict(payload, mods={
+        name: {**{k: v for k, v in info.items() if k not in ("files", "directories", "backups")},
+               _FILE_GROUPS_KEY: encode_file_groups(info["files"]),
+               **({"backups": encode_file_groups(info["backups"])} if info.get("backups") else {})}
+        for name, info in payload["mods"].items()
+    })
+    base_files = {owner: encode_file_groups(get_mod_files(target_root, owner) or []) for owner in BASE_OWNERS}
+    base_files = {owner: groups for owner, groups in base_files.items() if groups}
+    if base_files:
+        exported["base_files"] = base_files
+    tmp_path = dest.with_name(dest.name + ".tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        json.dump(exported, f, ensure_ascii=False, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, dest)
+    if snapshot:
+        # 快照已包含目前的全部内容，修改计数从零开始（直接连接，避免计入一次修改）
+        conn = sqlite3.connect(manifest_db_path(target_root))
+        try:
+            with conn:
+                conn.execute("DELETE FROM meta WHERE key = 'changes_since_snapshot'")
+        except sqlite3.Error:
+            pass
+        finally:
+            conn.close()
+    return dest
 
 
 def update_manifest_server_version(target_root: Path, server_version: str, server_zip: str) -> None:
-    """更新标记文件中的服务端版本信息。"""
-    path = manifest_path(target_root)
-    if not path.exists():
+    """更新标记中的服务端版本信息。"""
+    fields = {"version": server_version, "server_zip": server_zip, "updated_at": _now()}
+    try:
+        before = _stamp(target_root)
+        with _open_store(target_root) as conn:
+            if conn is None:
+                return
+            conn.execute("UPDATE installs SET version = ?, server_zip = ?, updated_at = ? WHERE id = 1",
+                         (server_version, server_zip, fields["updated_at"]))
+    except sqlite3.Error:
         return
+    _write_through(target_root, before, lambda entry: _update_install_fields(entry, fields))
+
+
+def _update_install_fields(entry: _CacheEntry, fields: dict) -> None:
+    """把安装信息字段的修改同步到缓存（None 表示删除该字段）。
+
+    缓存的对象可能已被 load_manifest 返回给调用方，这里换成修改后的副本而不是就地修改。
+    """
+    def _updated(payload: dict) -> dict:
+        payload = {key: value for key, value in payload.items() if fields.get(key, value) is not None}
+        payload.update((key, value) for key, value in fields.items() if value is not None)
+        return payload
+
+    if entry.info is not None:
+        entry.info = _updated(entry.info)
+    if entry.full is not None:
+        entry.full = _updated(entry.full)
+
+
+def record_mod_installation(mod_version, mod_supported_versions, target_root: Path, mod_name: str,
+                            files: Iterable[str], backups: Iterable[str] = ()) -> None:
+    """记录 MOD 安装的文件列表（同名 MOD 的旧记录会被替换）。
+
+    files 可以是任意可迭代对象（如 iter_extract_zip 的结果），逐条写入数据库，只遍历一次。
+    backups 为其中在备份区保存了被覆盖原文件的路径（见 ownership）。
+    """
+    files = iter(files)
     try:
-        payload = json.loads(path.read_text(encoding="utf-8"))
-        payload["version"] = server_version
-        payload["server_zip"] = server_zip
-        payload["updated_at"] = datetime.now().isoformat(timespec="seconds")
-        path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
-    except Exception:
+        before = _stamp(target_root)
+        with _open_store(target_root) as conn:
+            if _installed(conn):
+                _insert_mod(conn, mod_name, mod_version, mod_supported_versions, _now(), files, backups)
+        # 文件列表是流式写入的，没有保留在内存中：安装信息仍然有效，完整标记下次读取时重新查询
+        _write_through(target_root, before, lambda entry: setattr(entry, "full", None))
+    except sqlite3.Error:
+        pass
+    # 未安装或写入失败时也要遍历完：传入的是解压生成器时，解压仍需完成
+    for _ in files:
         pass
 
 
-def record_mod_installation(mod_version, mod_supported_versions, target_root: Path, mod_name: str, files: List[str]) -> None:
-    """记录 MOD 安装的文件列表到标记文件。"""
-    path = manifest_path(target_root)
-    if not path.exists():
-        return
+def list_mods(target_root: Path) -> Optional[Dict[str, int]]:
+    """返回 {MOD 名: 文件数}（按安装顺序）；未安装时返回 None。"""
     try:
-        payload = json.loads(path.read_text(encoding="utf-8"))
-        if "mods" not in payload:
-            payload["mods"] = {}
-        
-        # 提取文件所在的文件夹（去重）
-        directories = set()
-        for file_path in files:
-            # 获取文件的父目录
-            parent = str(Path(file_path).parent)
-            if parent and parent != ".":
-                directories.add(parent)
-        
-        payload["mods"][mod_name] = {
-            "mod_version": mod_version,
-            "mod_supported_versions": mod_supported_versions,
-            "files": files,
-            "directories": sorted(list(directories)),
-            "installed_at": datetime.now().isoformat(timespec="seconds"),
-        }
-        path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
-    except Exception:
-        pass
+        with _open_store(target_root) as conn:
+            if not _installed(conn):
+                return None
+            return dict(conn.execute(
+                "SELECT mods.name, COUNT(files.id) FROM mods LEFT JOIN files ON files.mod_id = mods.id "
+                "WHERE mods.kind = 'mod' GROUP BY mods.id ORDER BY mods.id"))
+    except sqlite3.Error:
+        return None
 
 
 def get_mod_files(target_root: Path, mod_name: str) -> Optional[List[str]]:
-    """获取已安装 MOD 的文件列表。"""
-    manifest = load_manifest(target_root)
-    if not manifest:
-        return None
-    mods = manifest.get("mods", {})
-    mod_info = mods.get(mod_name)
-    if not mod_info:
+    """获取已安装 MOD（或 BASE_CLIENT / BASE_SERVER）的文件列表。"""
+    try:
+        with _open_store(target_root) as conn:
+            if conn is None:
+                return None
+            row = conn.execute("SELECT id FROM mods WHERE name = ?", (mod_name,)).fetchone()
+            if not row:
+                return None
+            return [folder + name for folder, name in conn.execute(
+                "SELECT dirs.path, files.name FROM files JOIN dirs ON dirs.id = files.dir_id "
+                "WHERE files.mod_id = ? ORDER BY files.id", (row[0],))]
+    except sqlite3.Error:
         return None
-    return mod_info.get("files", [])
+
+
+def get_mod_directories(target_root: Path, mod_name: str) -> List[str]:
+    """获取已安装 MOD 的文件所在的文件夹（卸载时尝试删除其中的空文件夹）。"""
+    return _directories(get_mod_files(target_root, mod_name) or [])
+
+
+def find_file_owners(target_root: Path, paths: Iterable[str]) -> Dict[str, List[str]]:
+    """查询文件属于哪些 MOD（含 BASE_CLIENT / BASE_SERVER），返回 {路径: [所有者, ...（按记录顺序）]}，只包含有归属的路径。
+
+    比较时忽略大小写和分隔符差异（与 Windows 文件系统一致）。路径按文件夹分组，每个文件夹用一条 IN 查询
+    与索引求交集，查询次数只与文件夹数有关，与已安装的 MOD 数量无关。
+    """
+    wanted: Dict[str, Dict[str, List[str]]] = {}
+    for path in paths:
+        folder, name = _split_path(path)
+        wanted.setdefault(_path_key(folder), {}).setdefault(_path_key(name), []).append(path)
+    owners: Dict[str, List[str]] = {}
+    try:
+        with _open_store(target_root) as conn:
+            if conn is None:
+                return owners
+            for folder_key, names in wanted.items():
+                dir_ids = [row[0] for row in conn.execute("SELECT id FROM dirs WHERE path_key = ?", (folder_key,))]
+                if not dir_ids:
+                    continue
+                batch = list(names)
+                step = _QUERY_BATCH - len(dir_ids)
+                for start in range(0, len(batch), max(step, 1)):
+                    chunk = batch[start:start + max(step, 1)]
+                    query = ("SELECT files.name_key, mods.name FROM files JOIN mods ON mods.id = files.mod_id "
+                             f"WHERE files.dir_id IN ({', '.join('?' * len(dir_ids))}) "
+                             f"AND files.name_key IN ({', '.join('?' * len(chunk))}) ORDER BY files.id")
+                    for name_key, owner in conn.execute(query, (*dir_ids, *chunk)):
+                        for path in names[name_key]:
+                            owners.setdefault(path, []).append(owner)
+    except sqlite3.Error:
+        pass
+    return owners
+
+
+def get_mod_backups(target_root: Path, mod_name: str) -> List[str]:
+    """MOD 文件中在备份区保存了被覆盖原文件的路径。"""
+    try:
+        with _open_store(target_root) as conn:
+            if conn is None:
+                return []
+            return [folder + name for folder, name in conn.execute(
+                "SELECT dirs.path, files.name FROM files JOIN dirs ON dirs.id = files.dir_id "
+                "JOIN mods ON mods.id = files.mod_id WHERE mods.name = ? AND files.backup = 1 ORDER BY files.id",
+                (mod_name,))]
+    except sqlite3.Error:
+        return []
+
+
+def set_mod_backups(target_root: Path, mod_name: str, paths: Iterable[str], present: bool) -> None:
+    """修改 MOD 文件的备份标记（卸载中间的 MOD 时把备份转交给之后的 MOD）。"""
+    try:
+        before = _stamp(target_root)
+        with _open_store(target_root) as conn:
+            if conn is None:
+                return
+            row = conn.execute("SELECT id FROM mods WHERE name = ?", (mod_name,)).fetchone()
+            if not row:
+                return
+            conn.executemany(
+                "UPDATE files SET backup = ? WHERE mod_id = ? "
+                "AND dir_id = (SELECT id FROM dirs WHERE path = ?) AND name = ?",
+                ((int(present), row[0], *_split_path(path)) for path in paths))
+    except sqlite3.Error:
+        return
+    _write_through(target_root, before, lambda entry: setattr(entry, "full", None))
+
+
+def record_base_files(target_root: Path, owner: str, files: Iterable[str]) -> None:
+    """记录基础客户端 / 服务端（owner 为 BASE_CLIENT / BASE_SERVER）的文件，替换之前的记录。"""
+    try:
+        before = _stamp(target_root)
+        with _open_store(target_root) as conn:
+            if not _installed(conn):
+                return
+            _insert_mod(conn, owner, "", "", _now(), files, kind="base")
+    except sqlite3.Error:
+        return
+    # 基础文件不出现在 load_manifest 的结果中，缓存仍然有效
+    _write_through(target_root, before, lambda entry: None)
 
 
 def remove_mod_record(target_root: Path, mod_name: str) -> None:
-    """从标记文件中删除 MOD 记录。"""
-    path = manifest_path(target_root)
-    if not path.exists():
+    """从标记中删除 MOD 记录。"""
+    try:
+        before = _stamp(target_root)
+        with _open_store(target_root) as conn:
+            if conn is None:
+                return
+            row = conn.execute("SELECT id FROM mods WHERE name = ?", (mod_name,)).fetchone()
+            if not row:
+                return
+            _delete_mod_files(conn, row[0])
+            conn.execute("DELETE FROM mods WHERE id = ?", (row[0],))
+    except sqlite3.Error:
         return
+    _write_through(target_root, before, lambda entry: _replace_mods(
+        entry, lambda mods: {name: info for name, info in mods.items() if name != mod_name}))
+
+
+def clear_mod_records(target_root: Path) -> None:
+    """删除所有 MOD 记录（一键卸载全部 MOD 后调用）。"""
     try:
-        payload = json.loads(path.read_text(encoding="utf-8"))
-        if "mods" in payload and mod_name in payload["mods"]:
-            del payload["mods"][mod_name]
-            path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
-    except Exception:
-        pass
+        before = _stamp(target_root)
+        with _open_store(target_root) as conn:
+            if conn is None:
+                return
+            # 基础客户端 / 服务端的归属记录保留
+            for (mod_id,) in conn.execute("SELECT id FROM mods WHERE kind = 'mod'").fetchall():
+                _delete_mod_files(conn, mod_id)
+            conn.execute("DELETE FROM mods WHERE kind = 'mod'")
+    except sqlite3.Error:
+        return
+    _write_through(target_root, before, lambda entry: _replace_mods(entry, lambda mods: {}))
+
+
+def _replace_mods(entry: _CacheEntry, change: Callable[[dict], dict]) -> None:
+    """把 MOD 记录的修改同步到缓存：换成新的对象，不修改调用方可能正在遍历的旧对象。"""
+    if entry.full is not None:
+        entry.full = {**entry.full, "mods": change(entry.full["mods"])}
 
 
 # ============ Fika 联机配置记忆 ============
 
 def get_fika_config(target_root: Path) -> Optional[dict]:
     """获取 Fika 联机配置。
-    
+
     返回格式:
     {
         "mode": "host" | "client" | None,
@@ -118,46 +724,42 @@ def get_fika_config(target_root: Path) -> Optional[dict]:
         "my_ip": "192.168.1.2",    # 自己的公网IP（客户端模式）
     }
     """
-    manifest = load_manifest(target_root)
-    if not manifest:
+    info = get_install_info(target_root)
+    if not info:
         return None
-    return manifest.get("fika")
+    return info.get("fika")
+
+
+def _set_fika(target_root: Path, fika: Optional[dict]) -> None:
+    try:
+        before = _stamp(target_root)
+        with _open_store(target_root) as conn:
+            if conn is None:
+                return
+            conn.execute("UPDATE installs SET fika = ? WHERE id = 1",
+                         (json.dumps(fika, ensure_ascii=False) if fika is not None else None,))
+    except sqlite3.Error:
+        return
+    _write_through(target_root, before, lambda entry: _update_install_fields(entry, {"fika": fika}))
 
 
 def save_fika_config(target_root: Path, mode: str, host_ip: str = "", my_ip: str = "") -> None:
     """保存 Fika 联机配置。
-    
+
     Args:
         target_root: 安装根目录
         mode: "host" 或 "client"
         host_ip: 房主的公网IP
         my_ip: 自己的公网IP（客户端模式需要）
     """
-    path = manifest_path(target_root)
-    if not path.exists():
-        return
-    try:
-        payload = json.loads(path.read_text(encoding="utf-8"))
-        payload["fika"] = {
-            "mode": mode,
-            "host_ip": host_ip,
-            "my_ip": my_ip,
-            "updated_at": datetime.now().isoformat(timespec="seconds"),
-        }
-        path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
-    except Exception:
-        pass
+    _set_fika(target_root, {
+        "mode": mode,
+        "host_ip": host_ip,
+        "my_ip": my_ip,
+        "updated_at": _now(),
+    })
 
 
 def clear_fika_config(target_root: Path) -> None:
     """清除 Fika 联机配置（恢复单机模式时调用）。"""
-    path = manifest_path(target_root)
-    if not path.exists():
-        return
-    try:
-        payload = json.loads(path.read_text(encoding="utf-8"))
-        if "fika" in payload:
-            del payload["fika"]
-            path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
-    except Exception:
-        pass
+    _set_fika(target_root, None)
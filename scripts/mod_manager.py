@@ -1,12 +1,13 @@
-import json
 import shutil
 from pathlib import Path
 from typing import List, Optional, TYPE_CHECKING
 
-from . import config, utils
+from . import config, ownership, resource_index, utils
 from .config import ModPackage, ModVersion
-from .manifest import load_manifest, record_mod_installation, remove_mod_record
+from .manifest import (clear_mod_records, get_install_info, get_mod_directories, get_mod_files, list_mods,
+                       record_mod_installation, remove_mod_record)
 from .process import close_spt_processes
+from .stream_extract import download_and_extract
 
 if TYPE_CHECKING:
     from .installers import InstallerState
@@ -88,6 +89,10 @@ def install_mod(state: "InstallerState", mods: List[ModPackage]) -> None:
         print(f"未找到 MOD 压缩包 {mod_zip}")
         return
 
+    # 安装前用归属索引检查重名文件，不需要逐个访问安装目录
+    conflicts = ownership.find_conflicts(install_path, utils.zip_entry_map(mod_zip), mod.display_name)
+    if conflicts:
+        ownership.print_conflicts(conflicts)
     if not _confirm(f"即将安装 MOD: {mod.display_name}，并覆盖同名文件，确认吗？"):
         print("已取消。")
         return
@@ -96,17 +101,22 @@ def install_mod(state: "InstallerState", mods: List[ModPackage]) -> None:
     mod_version = _extract_mod_version(mod.display_name)
     
     # 获取当前安装的服务端版本（从标记文件读取）
-    manifest = load_manifest(install_path)
+    manifest = get_install_info(install_path)
     mod_supported_versions = manifest.get("version", "") if manifest else ""
     
     try:
-        extracted_files = utils.extract_zip(mod_zip, install_path, strip_common_root=False, show_progress=True)
+        # 只暂存与安装目录不同的文件，全部解压成功后再以重命名方式替换，失败时不留下半装的 MOD；
+        # 被替换的原文件移入备份区
+        extracted_files, backups = ownership.install_mod_files(install_path, mod.display_name, mod_zip)
         # 写入标记文件,传入当前路径和mod名字,和安装 MOD 时返回并记录解压出的文件列表
-        record_mod_installation(mod_version, mod_supported_versions, install_path, mod.display_name, extracted_files)
+        record_mod_installation(mod_version, mod_supported_versions, install_path, mod.display_name, extracted_files,
+                                backups)
     except Exception as exc:
         print(f"安装 MOD 失败: {exc}")
         return
     print(f"MOD {mod.display_name} 安装完成。")
+    if backups:
+        print(f"已备份 {len(backups)} 个被覆盖的原文件，卸载时会还原。")
 
 
 def uninstall_mod(state: "InstallerState") -> None:
@@ -119,12 +129,11 @@ def uninstall_mod(state: "InstallerState") -> None:
     if not close_spt_processes():
         return
 
-    manifest = load_manifest(install_path)
-    if not manifest:
+    mods = list_mods(install_path)
+    if mods is None:
         print("未检测到已安装的游戏。")
         return
 
-    mods = manifest.get("mods", {})
     if not mods:
         print("未找到已安装的 MOD。")
         return
@@ -132,9 +141,7 @@ def uninstall_mod(state: "InstallerState") -> None:
     print("已安装的 MOD：")
     mod_names = list(mods.keys())
     for idx, mod_name in enumerate(mod_names, start=1):
-        mod_info = mods[mod_name]
-        file_count = len(mod_info.get("files", []))
-        print(f"{idx}. {mod_name} ({file_count} 个文件)")
+        print(f"{idx}. {mod_name} ({mods[mod_name]} 个文件)")
 
     try:
         selection = int(input("请选择要卸载的 MOD（0 取消）：").strip() or "0")
@@ -151,29 +158,17 @@ def uninstall_mod(state: "InstallerState") -> None:
         return
 
     mod_name = mod_names[selection - 1]
-    mod_info = mods[mod_name]
-    files_to_delete = mod_info.get("files", [])
+    files_to_delete = get_mod_files(install_path, mod_name) or []
 
     if not _confirm(f"确认卸载 MOD: {mod_name}（将删除 {len(files_to_delete)} 个文件）吗？"):
         print("已取消。")
         return
 
-    deleted_count = 0
-    skipped_count = 0
-    for file_path in files_to_delete:
-        full_path = install_path / file_path
-        try:
-            if full_path.exists():
-                full_path.unlink()
-                deleted_count += 1
-            else:
-                skipped_count += 1
-        except Exception as exc:
-            print(f"删除文件失败 {file_path}: {exc}")
-            skipped_count += 1
+    # 仍属于基础文件或其他 MOD 的文件保留，被覆盖过的原文件从备份区还原
+    summary = ownership.uninstall_mod_files(install_path, mod_name)
 
     # 删除 MOD 的文件夹（如果为空）
-    directories = mod_info.get("directories", [])
+    directories = get_mod_directories(install_path, mod_name)
     deleted_dirs_count = 0
     for dir_path in sorted(directories, reverse=True):  # 从深层目录开始删除
         full_dir_path = install_path / dir_path
@@ -190,7 +185,9 @@ def uninstall_mod(state: "InstallerState") -> None:
     remove_mod_record(install_path, mod_name)
 
     print(f"MOD {mod_name} 卸载完成。")
-    print(f"已删除 {deleted_count} 个文件，跳过 {skipped_count} 个文件。")
+    print(f"已删除 {summary.deleted} 个文件，跳过 {summary.skipped + summary.failed} 个文件。")
+    if summary.restored or summary.kept:
+        print(f"已还原 {summary.restored} 个被覆盖的原文件，保留 {summary.kept} 个仍被其他内容使用的文件。")
     if deleted_dirs_count > 0:
         print(f"已删除 {deleted_dirs_count} 个空文件夹。")
 
@@ -266,15 +263,9 @@ def uninstall_all_mods(state: "InstallerState") -> None:
             print(f"访问 {bepinex_plugins_dir} 失败: {exc}")
             skipped_count += 1
 
-    # 清除 MOD 安装记录
-    manifest = load_manifest(install_path)
-    if manifest and manifest.get("mods"):
-        try:
-            manifest["mods"] = {}
-            manifest_path = install_path / config.MANIFEST_FILE
-            manifest_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
-        except Exception:
-            pass
+    # 还原被 MOD 覆盖的基础文件，再清除 MOD 安装记录
+    restored_count = ownership.restore_base_files(install_path)
+    clear_mod_records(install_path)
 
     print("\n====== 卸载完成 ======")
     print(f"已删除 {deleted_mods_count + deleted_plugins_count} 个项目，跳过 {skipped_count} 个项目。")
@@ -282,9 +273,47 @@ def uninstall_all_mods(state: "InstallerState") -> None:
         print(f"  • 已删除 MOD 目录")
     if deleted_plugins_count > 0:
         print(f"  • 已删除 {deleted_plugins_count} 个 BepInEx 插件")
+    if restored_count > 0:
+        print(f"  • 已还原 {restored_count} 个被 MOD 覆盖的基础文件")
     print("SPT 环境已恢复到纯净状态。")
 
 
+def _download_and_install_mod(install_path: Path, selected_mod: ModVersion, mod_zip_path: Path) -> None:
+    """边下载边解压安装 MOD，压缩包同时保存到 resources/mods 供以后重装。"""
+    # 检测并关闭 SPT 进程
+    if not close_spt_processes():
+        return
+
+    # 与"安装 MOD"使用同一个记录名（压缩包文件名），重装时会覆盖这条记录
+    display_name = mod_zip_path.stem
+    manifest = get_install_info(install_path)
+    mod_supported_versions = manifest.get("version", "") if manifest else ""
+
+    print(f"正在下载并安装 MOD {selected_mod.name}...")
+
+    def _download(stage_dir: Path) -> Optional[List[str]]:
+        # 边下载边解压到暂存目录，下载完成后与直接安装一样以重命名方式提交并备份被覆盖的原文件
+        return download_and_extract(selected_mod.download_url, mod_zip_path, stage_dir, show_progress=True,
+                                    expected_sha256=selected_mod.sha256, expected_size=selected_mod.size)
+
+    try:
+        result = ownership.install_mod_files(install_path, display_name, mod_zip_path, extract=_download)
+        if result is None:
+            print(f"MOD {selected_mod.name} 下载失败，再次下载时将从断点继续。")
+            return
+        extracted_files, backups = result
+        if selected_mod.sha256:
+            resource_index.remember(mod_zip_path, selected_mod.sha256)
+        record_mod_installation(_extract_mod_version(display_name), mod_supported_versions, install_path,
+                                display_name, extracted_files, backups)
+    except Exception as exc:
+        print(f"安装 MOD 失败: {exc}")
+        return
+    print(f"MOD {selected_mod.name} 下载并安装完成。")
+    if backups:
+        print(f"已备份 {len(backups)} 个被覆盖的原文件，卸载时会还原。")
+
+
 def download_mod(state: "InstallerState") -> None:
     """下载指定的 MOD 到 resources/mods 文件夹。"""
     mod_versions = config.discover_mod_versions_from_announcement()
@@ -317,21 +346,31 @@ def download_mod(state: "InstallerState") -> None:
 
     mod_zip_path = config.MODS_DIR / selected_mod.zip_name
     if mod_zip_path.exists():
-        print(f"MOD {selected_mod.name} 已存在于本地，无需下载。")
-        return
+        if resource_index.check_package(mod_zip_path, selected_mod.sha256, selected_mod.size):
+            print(f"MOD {selected_mod.name} 已存在于本地，无需下载。")
+            return
+        print(f"本地的 MOD {selected_mod.name} 压缩包与公告中的校验值不一致，将重新下载。")
+        mod_zip_path.unlink()
 
     if not _confirm(f"确认下载 MOD {selected_mod.name} 吗？"):
         print("已取消。")
         return
 
+    # 已完成自动安装时，可以边下载边安装，省去下载完再解压的等待
+    spt_dir = state.spt_dir()
+    if spt_dir and (spt_dir / "SPT.Server.exe").exists() and _confirm("是否在下载的同时安装到当前游戏目录？"):
+        _download_and_install_mod(state.install_path, selected_mod, mod_zip_path)
+        return
+
     print(f"正在下载 MOD {selected_mod.name}...")
-    success = utils.download_file(selected_mod.download_url, mod_zip_path, show_progress=True)
+    success = utils.download_file(selected_mod.download_url, mod_zip_path, show_progress=True,
+                                  segments=config.DOWNLOAD_SEGMENTS, expected_sha256=selected_mod.sha256,
+                                  expected_size=selected_mod.size)
 
     if success:
+        if selected_mod.sha256:
+            resource_index.remember(mod_zip_path, selected_mod.sha256)
         print(f"MOD {selected_mod.name} 下载完成。")
     else:
-        print(f"MOD {selected_mod.name} 下载失败。")
-        try:
-            mod_zip_path.unlink()
-        except Exception:
-            pass
+        # 未完成的 .part 文件会保留，再次下载时从断点续传
+        print(f"MOD {selected_mod.name} 下载失败，再次下载时将从断点继续。")
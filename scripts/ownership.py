@@ -0,0 +1,178 @@
+"""MOD 文件归属：安装前按压缩包的文件列表检测冲突，被覆盖的原文件移到备份区，卸载时还原。
+
+归属索引保存在标记数据库中（基础客户端 / 服务端和每个 MOD 各一条记录，见 manifest）。
+备份区位于安装目录下的 MOD_BACKUP_DIR，每个 MOD 一个子目录，原文件以重命名方式移入，不复制内容。
+
+同一文件被多个 MOD 先后覆盖时，每个 MOD 的备份保存的是它覆盖之前的内容：
+卸载最后覆盖的 MOD 时还原它的备份；卸载中间的 MOD 时文件保持不变，它的备份转交给之后的 MOD。
+"""
+
+import hashlib
+import os
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from . import config, manifest, staging, utils
+
+
+@dataclass
+class ReleaseSummary:
+    """MOD 放弃一批文件后的处理结果。"""
+    deleted: int = 0  # 无其他所有者，已删除
+    restored: int = 0  # 从备份区还原了原文件
+    kept: int = 0  # 仍属于基础文件或其他 MOD，保留
+    skipped: int = 0  # 文件已不存在
+    failed: int = 0
+
+
+def backup_dir(install_path: Path, owner: str) -> Path:
+    """MOD 的备份目录（目录名取 MOD 名的哈希，避免名称中的特殊字符）。"""
+    key = hashlib.sha1(owner.encode("utf-8")).hexdigest()[:16]
+    return install_path / config.MOD_BACKUP_DIR / key
+
+
+def _layered(owners: List[str]) -> List[str]:
+    """所有者按覆盖顺序排列：基础文件在最下层，MOD 按安装顺序。"""
+    return sorted(owners, key=lambda owner: owner not in manifest.BASE_OWNERS)
+
+
+def find_conflicts(install_path: Path, names: Iterable[str], mod_name: str) -> Dict[str, str]:
+    """压缩包中（/ 分隔的相对路径）已属于基础文件或其他 MOD 的文件，返回 {路径: 当前的所有者}。
+
+    只查询归属索引，不访问安装目录；重装同一 MOD 时它自己的文件不算冲突。
+    """
+    records = {str(Path(rel)): rel for rel in names}
+    conflicts = {}
+    for path, owners in manifest.find_file_owners(install_path, records).items():
+        top = _layered(owners)[-1]
+        if top != mod_name:
+            conflicts[records[path]] = top
+    return conflicts
+
+
+def print_conflicts(conflicts: Dict[str, str], limit: int = 3) -> None:
+    """按所有者汇总打印冲突的文件。"""
+    by_owner: Dict[str, List[str]] = {}
+    for rel, owner in conflicts.items():
+        by_owner.setdefault(owner, []).append(rel)
+    print(f"检测到 {len(conflicts)} 个文件与已安装的内容重名，安装后将被覆盖（原文件会备份，卸载时还原）：")
+    for owner, paths in by_owner.items():
+        examples = "、".join(sorted(paths)[:limit])
+        more = " 等" if len(paths) > limit else ""
+        print(f"  • {owner}: {len(paths)} 个文件（{examples}{more}）")
+
+
+def install_mod_files(install_path: Path, mod_name: str, zip_path: Path,
+                      extract: Optional[Callable[[Path], Optional[list]]] = None, show_progress: bool = True
+                      ) -> Optional[Tuple[List[str], List[str]]]:
+    """以暂存方式安装 MOD，被替换的原文件移入备份区，返回 (文件列表, 有备份的文件列表)（标记中的格式）。
+
+    extract 负责把文件写入暂存目录（参数为暂存目录，返回 None 表示失败，此时返回 None），
+    默认只解压与安装目录内容不同的文件；边下载边解压时传入下载函数。
+    重装同一 MOD 时沿用上次的备份，新版本不再包含的文件按卸载的规则处理。
+    """
+    previous = manifest.get_mod_files(install_path, mod_name) or []
+    previous_backups = set(manifest.get_mod_backups(install_path, mod_name))
+    owned = set(previous)
+    with staging.StagedChanges(install_path) as staged:
+        if extract is None:
+            members = utils.changed_entries(zip_path, install_path)
+            if members:
+                utils.extract_zip(zip_path, staged.stage_dir, show_progress=show_progress, workers=config.EXTRACT_WORKERS,
+                                  members=members)
+        elif extract(staged.stage_dir) is None:
+            return None
+        files = [str(Path(rel)) for rel in utils.zip_entry_map(zip_path)]
+        staged.commit()
+        # 被替换的是 MOD 自己上一版的文件时不需要备份
+        fresh = [rel for rel in staged.replaced if str(Path(rel)) not in owned]
+        kept = staged.keep_backups(backup_dir(install_path, mod_name), fresh)
+
+    current = set(files)
+    dropped = [path for path in previous if path not in current]
+    if dropped:
+        release_files(install_path, mod_name, dropped)
+    backups = [path for path in files if path in previous_backups] + [str(Path(rel)) for rel in kept]
+    return files, backups
+
+
+def release_files(install_path: Path, mod_name: str, paths: List[str]) -> ReleaseSummary:
+    """MOD 放弃这些文件（卸载或新版本不再包含）：按归属索引决定删除、还原备份还是保留。"""
+    summary = ReleaseSummary()
+    backups = set(manifest.get_mod_backups(install_path, mod_name))
+    owners = manifest.find_file_owners(install_path, paths)
+    source = backup_dir(install_path, mod_name)
+    handed: Dict[str, List[str]] = {}
+    dropped: Dict[str, List[str]] = {}
+    for path in paths:
+        layers = _layered(owners.get(path, [mod_name]))
+        position = layers.index(mod_name) if mod_name in layers else len(layers)
+        below, above = layers[:position], layers[position + 1:]
+        target = install_path / path
+        try:
+            if above:
+                # 已被之后安装的 MOD 覆盖：文件保持不变，下一个 MOD 的备份改为本 MOD 覆盖之前的内容
+                heir = above[0]
+                if path in backups:
+                    _move(source / path, backup_dir(install_path, heir) / path)
+                    handed.setdefault(heir, []).append(path)
+                elif not below:
+                    (backup_dir(install_path, heir) / path).unlink(missing_ok=True)
+                    dropped.setdefault(heir, []).append(path)
+                summary.kept += 1
+            elif path in backups:
+                _move(source / path, target)
+                summary.restored += 1
+            elif below:
+                summary.kept += 1
+            elif target.exists():
+                target.unlink()
+                summary.deleted += 1
+            else:
+                summary.skipped += 1
+        except OSError as exc:
+            print(f"处理文件失败 {path}: {exc}")
+            summary.failed += 1
+    for heir, moved in handed.items():
+        manifest.set_mod_backups(install_path, heir, moved, True)
+    for heir, moved in dropped.items():
+        manifest.set_mod_backups(install_path, heir, moved, False)
+    return summary
+
+
+def uninstall_mod_files(install_path: Path, mod_name: str) -> ReleaseSummary:
+    """卸载 MOD 的文件（不删除标记记录），全部处理成功后删除它的备份目录。"""
+    summary = release_files(install_path, mod_name, manifest.get_mod_files(install_path, mod_name) or [])
+    if not summary.failed:
+        shutil.rmtree(backup_dir(install_path, mod_name), ignore_errors=True)
+    return summary
+
+
+def restore_base_files(install_path: Path) -> int:
+    """一键卸载时还原被 MOD 覆盖的基础客户端 / 服务端文件并清空备份区，返回还原的文件数。
+
+    基础文件的原始内容保存在最早覆盖它的 MOD 的备份中。
+    """
+    restored = 0
+    seen = set()
+    for mod_name in manifest.list_mods(install_path) or {}:
+        backups = [path for path in manifest.get_mod_backups(install_path, mod_name) if path not in seen]
+        owners = manifest.find_file_owners(install_path, backups)
+        for path in backups:
+            if not any(owner in manifest.BASE_OWNERS for owner in owners.get(path, [])):
+                continue
+            seen.add(path)
+            try:
+                _move(backup_dir(install_path, mod_name) / path, install_path / path)
+                restored += 1
+            except OSError as exc:
+                print(f"还原文件失败 {path}: {exc}")
+    shutil.rmtree(install_path / config.MOD_BACKUP_DIR, ignore_errors=True)
+    return restored
+
+
+def _move(src: Path, dst: Path) -> None:
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(src, dst)
@@ -0,0 +1,88 @@
+"""按字节统计的进度条：显示速度与剩余时间，并限制刷新频率，下载、解压、复制共用。"""
+
+import threading
+import time
+
+# 两次重绘之间的最短间隔（秒），约每秒 10 次
+_REFRESH_INTERVAL = 0.1
+_BAR_LENGTH = 30
+
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+class ProgressBar:
+    """线程安全的字节进度条，按行覆盖显示。
+
+    各工作线程调用 advance() 累加完成的字节数；重绘最多每 0.1 秒一次，finish() 输出最终状态并换行。
+    total 为 0 表示总大小未知，此时只显示已完成字节和速度。
+
+    Args:
+        total: 总字节数
+        enabled: 为 False 时只计数不输出
+        initial: 已完成的字节数（续传时），不计入速度
+    """
+
+    def __init__(self, total: int, enabled: bool = True, initial: int = 0) -> None:
+        self.total = total
+        self.enabled = enabled
+        self.current = initial
+        self._initial = initial
+        self._started = time.monotonic()
+        self._last_draw = 0.0
+        self._finished = False
+        self._lock = threading.Lock()
+
+    def advance(self, count: int) -> None:
+        """累加完成的字节数。"""
+        with self._lock:
+            self.current += count
+            self._maybe_draw()
+
+    def finish(self) -> None:
+        """输出最终状态并换行；重复调用无效。"""
+        with self._lock:
+            if self._finished:
+                return
+            self._finished = True
+            if self.enabled and (self.current or self.total):
+                self._draw(time.monotonic())
+                print()  # 换行
+
+    def __enter__(self) -> "ProgressBar":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.finish()
+
+    def _maybe_draw(self) -> None:
+        if not self.enabled or self._finished:
+            return
+        now = time.monotonic()
+        if now - self._last_draw >= _REFRESH_INTERVAL:
+            self._draw(now)
+
+    def _draw(self, now: float) -> None:
+        self._last_draw = now
+        elapsed = now - self._started
+        speed = (self.current - self._initial) / elapsed if elapsed > 0 else 0.0
+        done_mb = self.current / 1048576
+        speed_text = f"{speed / 1048576:.1f} MB/s"
+        if self.total <= 0:
+            print(f"\r{done_mb:.1f} MB  {speed_text}", end="", flush=True)
+            return
+        ratio = min(self.current / self.total, 1.0)
+        filled = int(_BAR_LENGTH * ratio)
+        bar = "█" * filled + "-" * (_BAR_LENGTH - filled)
+        if self.current >= self.total:
+            eta_text = f"用时 {_format_duration(elapsed)}"
+        elif speed > 0:
+            eta_text = f"剩余 {_format_duration((self.total - self.current) / speed)}"
+        else:
+            eta_text = "剩余 --:--"
+        print(f"\r[{bar}] {int(ratio * 100):3d}% {done_mb:.1f}/{self.total / 1048576:.1f} MB  "
+              f"{speed_text}  {eta_text}   ", end="", flush=True)
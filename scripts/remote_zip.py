@@ -0,0 +1,245 @@
+"""远程 zip 差量获取：用 Range 请求只读取中央目录和变化的条目，其余条目从本地旧版本压缩包复制。"""
+
+import struct
+import time
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from . import http_client, utils
+from .progress import ProgressBar
+
+_EOCD = struct.Struct("<4s4H2LH")
+_EOCD_SIG = b"PK\x05\x06"
+_ZIP64_LOCATOR = struct.Struct("<4sLQL")
+_ZIP64_LOCATOR_SIG = b"PK\x06\x07"
+_ZIP64_EOCD = struct.Struct("<4sQ2H2L4Q")
+_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+_LOCAL_HEADER_SIG = b"PK\x03\x04"
+_FLAG_DATA_DESCRIPTOR = 0x8
+# 文件尾部一次读取的长度：EOCD（22 字节）+ 最长注释，通常也能顺带取到中央目录
+_TAIL_SIZE = 64 * 1024 + 22
+# 相邻待下载区间间隔小于该值时合并为一次请求
+_MERGE_GAP = 64 * 1024
+_COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class RangeUnsupported(Exception):
+    """服务器不支持 Range 请求，无法差量获取。"""
+
+
+@dataclass
+class DeltaResult:
+    """差量获取的结果统计。"""
+
+    total_size: int       # 远程压缩包大小
+    fetched_bytes: int    # 实际下载的字节数
+    changed: List[str]    # 需要写入安装目录的条目（去除顶层目录后的相对路径，/ 分隔）
+
+
+def _fetch_range(url: str, start: int, end: int, f, on_bytes=None) -> int:
+    """下载 [start, end] 字节写入 f 的相同偏移处，返回远程文件总大小。"""
+    headers = {"Accept-Encoding": "identity", "Range": f"bytes={start}-{end}"}
+    with http_client.get(url, stream=True, headers=headers) as response:
+        response.raise_for_status()
+        if response.status_code != 206:
+            raise RangeUnsupported("服务器不支持 Range 请求")
+        total = int(response.headers.get("content-range", "*/0").rsplit("/", 1)[-1])
+        f.seek(start)
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            if chunk:
+                f.write(chunk)
+                if on_bytes:
+                    on_bytes(len(chunk))
+        if f.tell() != end + 1:
+            raise requests.exceptions.ConnectionError(f"区间 {start}-{end} 下载不完整")
+    return total
+
+
+def _fetch_tail(url: str) -> Tuple[int, bytes]:
+    """读取远程文件末尾，返回 (文件总大小, 末尾字节)。"""
+    headers = {"Accept-Encoding": "identity", "Range": f"bytes=-{_TAIL_SIZE}"}
+    # 流式读取：服务器忽略 Range 返回完整文件时，不读正文就放弃
+    with http_client.get(url, stream=True, headers=headers) as response:
+        response.raise_for_status()
+        if response.status_code != 206:
+            raise RangeUnsupported("服务器不支持 Range 请求")
+        total = int(response.headers.get("content-range", "*/0").rsplit("/", 1)[-1])
+        tail = bytearray()
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            tail += chunk
+            if len(tail) >= _TAIL_SIZE:
+                break
+    return total, bytes(tail[:_TAIL_SIZE])
+
+
+def _central_directory_start(tail: bytes, tail_offset: int) -> int:
+    """从文件末尾字节中解析 EOCD（含 zip64），返回中央目录起始偏移。"""
+    pos = tail.rfind(_EOCD_SIG)
+    if pos < 0 or pos + _EOCD.size > len(tail):
+        raise zipfile.BadZipFile("找不到中央目录结束记录")
+    cd_offset = _EOCD.unpack_from(tail, pos)[6]
+    if cd_offset == 0xFFFFFFFF:
+        locator_pos = pos - _ZIP64_LOCATOR.size
+        signature, _, zip64_eocd_offset, _ = _ZIP64_LOCATOR.unpack_from(tail, locator_pos)
+        if signature != _ZIP64_LOCATOR_SIG:
+            raise zipfile.BadZipFile("zip64 定位记录损坏")
+        record_pos = zip64_eocd_offset - tail_offset
+        if record_pos < 0:
+            raise zipfile.BadZipFile("zip64 结束记录不在文件尾部")
+        cd_offset = _ZIP64_EOCD.unpack_from(tail, record_pos)[9]
+    return cd_offset
+
+
+def _strip_map(archive: zipfile.ZipFile) -> Dict[str, zipfile.ZipInfo]:
+    """返回 {去除统一顶层目录后的相对路径: 条目}，仅文件条目；与解压时的规则相同（含 .. 的条目被跳过）。"""
+    plan = utils._plan_entries(utils.ZipIndex.from_archive(archive), strip_common_root=True)
+    return {"/".join(dest_parts): archive.getinfo(entry.name) for entry, dest_parts in plan if not entry.is_dir()}
+
+
+def _slots(archive: zipfile.ZipFile, cd_offset: int) -> Dict[str, Tuple[int, int]]:
+    """每个条目在文件中占用的区间 {原始条目名: (起始, 结束不含)}。"""
+    ordered = sorted(archive.infolist(), key=lambda info: info.header_offset)
+    slots = {}
+    for idx, info in enumerate(ordered):
+        end = ordered[idx + 1].header_offset if idx + 1 < len(ordered) else cd_offset
+        slots[info.filename] = (info.header_offset, end)
+    return slots
+
+
+def _header_fits(f, start: int, header_end: int) -> bool:
+    """f 中 start 处是否为本地文件头，且长度（含文件名和扩展字段）正好到 header_end。"""
+    f.seek(start)
+    fixed = f.read(_LOCAL_HEADER.size)
+    if len(fixed) != _LOCAL_HEADER.size:
+        return False
+    header = _LOCAL_HEADER.unpack(fixed)
+    return header[0] == _LOCAL_HEADER_SIG and _LOCAL_HEADER.size + header[10] + header[11] == header_end - start
+
+
+def _copy_old_data(base, old_info: zipfile.ZipInfo, dst, offset: int) -> None:
+    """把旧压缩包中条目的压缩数据原样复制到新文件 offset 处（本地文件头另外从远程读取）。"""
+    base.seek(old_info.header_offset)
+    old_header = _LOCAL_HEADER.unpack(base.read(_LOCAL_HEADER.size))
+    base.seek(old_info.header_offset + _LOCAL_HEADER.size + old_header[10] + old_header[11])
+    dst.seek(offset)
+    remaining = old_info.compress_size
+    while remaining:
+        data = base.read(min(remaining, _COPY_CHUNK_SIZE))
+        if not data:
+            raise zipfile.BadZipFile(f"旧版本压缩包数据不完整: {old_info.filename}")
+        dst.write(data)
+        remaining -= len(data)
+
+
+def _merge_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """合并相邻或间隔很小的区间（结束不含），减少请求次数。"""
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start - merged[-1][1] <= _MERGE_GAP:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def fetch_delta(url: str, base_zip: Path, dest_zip: Path, install_root: Optional[Path] = None,
+                show_progress: bool = True, expected_sha256: str = "") -> DeltaResult:
+    """
+    以本地旧版本压缩包 base_zip 为基础，只下载远程压缩包中变化的条目，在 dest_zip 拼出完整的新版本压缩包。
+
+    1. Range 读取远程文件尾部的中央目录；
+    2. 按去除顶层目录后的路径对比 CRC-32 与大小，相同的条目从 base_zip 原样复制压缩数据，
+       其余条目（以及无法在原位置复制的条目）用合并后的 Range 请求下载；
+       复制的条目的本地文件头（扩展字段可能与中央目录不同）也从远程读取，与下载区间一起合并；
+    3. 对下载的条目逐个解压做 CRC 校验，成功后才替换 dest_zip。
+
+    install_root 给出时，安装目录中缺失的文件也会计入变化的条目。
+    给出 expected_sha256 时，拼出的压缩包还要与其一致才会替换 dest_zip。
+    服务器不支持 Range 时抛出 RangeUnsupported。
+    """
+    started = time.perf_counter()
+    work_path = dest_zip.with_name(dest_zip.name + ".delta")
+    total_size, tail = _fetch_tail(url)
+    tail_offset = total_size - len(tail)
+    fetched = len(tail)
+    cd_offset = _central_directory_start(tail, tail_offset)
+
+    dest_zip.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        with open(work_path, "w+b") as out:
+            out.truncate(total_size)
+            out.seek(tail_offset)
+            out.write(tail)
+            if cd_offset < tail_offset:
+                # 中央目录比尾部更长，补齐剩余部分
+                _fetch_range(url, cd_offset, tail_offset - 1, out)
+                fetched += tail_offset - cd_offset
+            out.flush()
+
+            with zipfile.ZipFile(work_path) as remote, zipfile.ZipFile(base_zip) as base_archive, \
+                    open(base_zip, "rb") as base:
+                new_entries = _strip_map(remote)
+                old_entries = _strip_map(base_archive)
+                slots = _slots(remote, cd_offset)
+
+                changed: List[str] = []
+                downloaded: List[str] = []
+                reused: List[Tuple[str, int, int, int]] = []  # (路径, 区间起始, 数据起始, 区间结束)
+                to_fetch: List[Tuple[int, int]] = []
+                for rel, info in new_entries.items():
+                    start, end = slots[info.filename]
+                    old = old_entries.get(rel)
+                    same = old is not None and (old.CRC, old.file_size) == (info.CRC, info.file_size)
+                    if not same or (install_root is not None and not (install_root / rel).exists()):
+                        changed.append(rel)
+                    data_start = end - info.compress_size
+                    if (same and old.compress_type == info.compress_type and old.compress_size == info.compress_size
+                            and not info.flag_bits & _FLAG_DATA_DESCRIPTOR and data_start > start):
+                        # 区间 = 本地文件头 + 压缩数据，只需下载文件头
+                        _copy_old_data(base, old, out, data_start)
+                        to_fetch.append((start, data_start))
+                        reused.append((rel, start, data_start, end))
+                    else:
+                        to_fetch.append((start, end))
+                        downloaded.append(rel)
+                # 目录条目等没有数据的区间也要补齐
+                covered = {slots[info.filename] for info in new_entries.values()}
+                to_fetch.extend(slot for slot in slots.values() if slot not in covered and slot[1] > slot[0])
+
+                ranges = _merge_ranges(to_fetch)
+                need = sum(end - start for start, end in ranges)
+                with ProgressBar(need, enabled=show_progress and need > 0) as progress:
+                    for start, end in ranges:
+                        _fetch_range(url, start, end - 1, out, progress.advance)
+                fetched += need
+                # 文件头长度与区间不符（例如数据后面还有其他内容）的条目改为整个下载
+                retry = [(rel, data_start, end) for rel, start, data_start, end in reused
+                         if not _header_fits(out, start, data_start)]
+                for start, end in _merge_ranges([(data_start, end) for _, data_start, end in retry]):
+                    _fetch_range(url, start, end - 1, out)
+                    fetched += end - start
+                downloaded.extend(rel for rel, _, _ in retry)
+                out.flush()
+
+            # 下载的条目逐个解压一遍，确认 CRC 正确
+            with zipfile.ZipFile(work_path) as rebuilt:
+                rebuilt_entries = _strip_map(rebuilt)
+                for rel in downloaded:
+                    with rebuilt.open(rebuilt_entries[rel]) as src:
+                        while src.read(_COPY_CHUNK_SIZE):
+                            pass
+            if expected_sha256 and utils.file_sha256(work_path) != expected_sha256.lower():
+                raise zipfile.BadZipFile("拼出的压缩包与公告中的 SHA-256 不一致")
+        work_path.replace(dest_zip)
+    finally:
+        work_path.unlink(missing_ok=True)
+
+    if show_progress:
+        elapsed = time.perf_counter() - started
+        print(f"差量下载完成：{len(changed)} 个条目有变化，下载 {fetched / 1048576:.1f} MB"
+              f"（完整包 {total_size / 1048576:.1f} MB），用时 {elapsed:.1f} 秒")
+    return DeltaResult(total_size=total_size, fetched_bytes=fetched, changed=changed)
@@ -0,0 +1,178 @@
+"""本地资源包校验索引：按 (路径, 大小, mtime_ns) 缓存 SHA-256 与中央目录是否可读，文件不变时不再重新计算。"""
+
+import json
+import os
+import threading
+import time
+import zipfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from . import config, utils
+
+_ROOT = config.RESOURCES_DIR
+_INDEX_FILE = config.RESOURCES_DIR / "verify_index.json"
+# 参与校验的资源目录
+_PACKAGE_DIRS = (config.SERVER_DIR, config.CLIENT_DIR, config.MODS_DIR, config.REQUIRED_DIR)
+
+_index: Optional[Dict[str, dict]] = None
+_index_lock = threading.Lock()
+
+
+def _key(path: Path) -> str:
+    """索引键：resources/ 下的文件用相对路径（/ 分隔），其余用绝对路径。"""
+    resolved = path.resolve()
+    try:
+        return resolved.relative_to(_ROOT.resolve()).as_posix()
+    except ValueError:
+        return str(resolved)
+
+
+def _load() -> Dict[str, dict]:
+    """读取索引（只在第一次调用时读盘），调用方需持有 _index_lock。"""
+    global _index
+    if _index is None:
+        try:
+            loaded = json.loads(_INDEX_FILE.read_text(encoding="utf-8"))
+            _index = loaded if isinstance(loaded, dict) else {}
+        except Exception:
+            _index = {}
+    return _index
+
+
+def _save() -> None:
+    """写入索引（先写临时文件再替换），失败不影响主流程。调用方需持有 _index_lock。"""
+    try:
+        _INDEX_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = _INDEX_FILE.with_name(_INDEX_FILE.name + ".tmp")
+        tmp_path.write_text(json.dumps(_index, ensure_ascii=False), encoding="utf-8")
+        tmp_path.replace(_INDEX_FILE)
+    except Exception:
+        pass
+
+
+def _zip_ok(path: Path) -> bool:
+    """中央目录能否正常读取（下载不完整的压缩包通常在这里就会失败），同时生成压缩包的索引文件。"""
+    try:
+        utils.load_zip_index(path)
+        return True
+    except (zipfile.BadZipFile, OSError):
+        return False
+
+
+def _lookup(path: Path, stat: os.stat_result, save: bool = True) -> dict:
+    """返回文件的校验记录；大小或修改时间变化时重新计算。"""
+    key = _key(path)
+    with _index_lock:
+        record = _load().get(key)
+    if record and record.get("size") == stat.st_size and record.get("mtime_ns") == stat.st_mtime_ns:
+        return record
+    record = {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": utils.file_sha256(path),
+        "zip_ok": _zip_ok(path),
+    }
+    with _index_lock:
+        _load()[key] = record
+        if save:
+            _save()
+    return record
+
+
+def check_package(path: Path, expected_sha256: str = "", expected_size: int = 0) -> bool:
+    """
+    检查本地资源包是否完好：中央目录可读，且与公告给出的 SHA-256 / 大小一致（未给出的项不检查）。
+
+    文件未变化时直接使用索引中的结果，不重新读取文件内容。
+    """
+    try:
+        stat = path.stat()
+    except OSError:
+        return False
+    if expected_size and stat.st_size != expected_size:
+        return False
+    record = _lookup(path, stat)
+    if not record["zip_ok"]:
+        return False
+    return not expected_sha256 or record["sha256"] == expected_sha256.lower()
+
+
+def remember(path: Path, sha256: str) -> None:
+    """记录刚下载并校验过的文件，之后检查时不必重新计算摘要。"""
+    stat = path.stat()
+    record = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256.lower(), "zip_ok": _zip_ok(path)}
+    with _index_lock:
+        _load()[_key(path)] = record
+        _save()
+
+
+def _expected_checksums() -> Dict[str, Tuple[str, int]]:
+    """公告中给出的 {压缩包文件名: (sha256, size)}。"""
+    expected: Dict[str, Tuple[str, int]] = {}
+    for sv in config.discover_server_versions_from_announcement():
+        expected[sv.server_zip] = (sv.sha256, sv.size)
+    for mv in config.discover_mod_versions_from_announcement():
+        expected[mv.zip_name] = (mv.sha256, mv.size)
+    return expected
+
+
+def scan_packages(dirs=None, expected: Optional[Dict[str, Tuple[str, int]]] = None) -> List[Tuple[Path, str]]:
+    """
+    校验资源目录下的所有 zip，返回 [(文件, 问题描述)]。
+
+    expected 为 {文件名: (sha256, size)}，用于与公告核对；索引中已不存在的文件记录会被清除。
+    """
+    expected = expected or {}
+    problems: List[Tuple[Path, str]] = []
+    seen = set()
+    with _index_lock:
+        before = dict(_load())
+    for folder in dirs if dirs is not None else _PACKAGE_DIRS:
+        if not folder.exists():
+            continue
+        for zip_path in sorted(folder.glob("*.zip")):
+            seen.add(_key(zip_path))
+            stat = zip_path.stat()
+            sha256, size = expected.get(zip_path.name, ("", 0))
+            if size and stat.st_size != size:
+                problems.append((zip_path, f"大小为 {stat.st_size} 字节，公告中为 {size} 字节"))
+                continue
+            record = _lookup(zip_path, stat, save=False)
+            if not record["zip_ok"]:
+                problems.append((zip_path, "压缩包不完整或已损坏"))
+            elif sha256 and record["sha256"] != sha256.lower():
+                problems.append((zip_path, "SHA-256 与公告不一致"))
+    with _index_lock:
+        index = _load()
+        if dirs is None:
+            for key in [key for key in index if key not in seen]:
+                del index[key]
+        if index != before or not _INDEX_FILE.exists():
+            _save()
+    return problems
+
+
+def verify_resources() -> None:
+    """菜单入口：校验 resources/ 下的所有压缩包，可选择删除损坏的文件。"""
+    # 公告中的校验值需要联网获取，不计入校验用时
+    expected = _expected_checksums()
+    started = time.perf_counter()
+    problems = scan_packages(expected=expected)
+    elapsed = time.perf_counter() - started
+    if not problems:
+        print(f"所有本地资源包校验通过（用时 {elapsed * 1000:.0f} 毫秒）。")
+        return
+    print(f"发现 {len(problems)} 个有问题的资源包（用时 {elapsed * 1000:.0f} 毫秒）：")
+    for zip_path, reason in problems:
+        print(f"  {zip_path.parent.name}/{zip_path.name}：{reason}")
+    reply = input("是否删除这些压缩包以便重新下载？(y/N): ").strip().lower()
+    if reply != "y":
+        print("已保留。")
+        return
+    for zip_path, _ in problems:
+        try:
+            zip_path.unlink()
+        except OSError as exc:
+            print(f"删除失败 {zip_path.name}: {exc}")
+    print("已删除，请重新下载。")
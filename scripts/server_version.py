@@ -1,8 +1,9 @@
 from pathlib import Path
-from typing import List, Optional, TYPE_CHECKING
+from typing import List, Optional, Set, TYPE_CHECKING
 
-from . import config, utils
-from .manifest import load_manifest, update_manifest_server_version
+from . import config, remote_zip, resource_index, staging, utils
+from .manifest import (BASE_CLIENT, BASE_SERVER, find_file_owners, load_manifest, record_base_files,
+                       update_manifest_server_version)
 from .process import close_spt_processes
 
 if TYPE_CHECKING:
@@ -23,6 +24,110 @@ def _require_install_path(state: "InstallerState") -> Optional[Path]:
     return state.install_path
 
 
+def _mod_owned_files(manifest: dict) -> Set[str]:
+    """收集所有已安装 MOD 记录的文件（/ 分隔），切换版本时不删除它们。"""
+    owned: Set[str] = set()
+    for mod_info in manifest.get("mods", {}).values():
+        for file_path in mod_info.get("files", []):
+            owned.add(Path(file_path).as_posix())
+    return owned
+
+
+def _client_owned(install_path: Path, paths: List[str]) -> Set[str]:
+    """paths（/ 分隔）中同时属于基础客户端的文件：客户端与服务端压缩包有重名文件，切换服务端时不能删除。"""
+    records = {str(Path(rel)): rel for rel in paths}
+    return {records[path] for path, owners in find_file_owners(install_path, records).items()
+            if BASE_CLIENT in owners}
+
+
+def _prune_empty_dirs(install_path: Path, removed: List[str]) -> int:
+    """自下而上删除因移除旧文件而变空的文件夹，返回删除数量。"""
+    candidates: Set[Path] = set()
+    for rel in removed:
+        parent = Path(rel).parent
+        while parent != Path("."):
+            candidates.add(parent)
+            parent = parent.parent
+    deleted = 0
+    for rel_dir in sorted(candidates, key=lambda p: len(p.parts), reverse=True):
+        full_dir = install_path / rel_dir
+        try:
+            if full_dir.is_dir() and not any(full_dir.iterdir()):
+                full_dir.rmdir()
+                deleted += 1
+        except OSError:
+            pass
+    return deleted
+
+
+def _switch_differential(old_zip: Path, new_zip: Path, install_path: Path, manifest: dict) -> None:
+    """差量切换：对比新旧压缩包的中央目录，只删除旧版独有文件、写入新增或变化的文件。"""
+    old_entries = utils.zip_entry_map(old_zip, strip_common_root=True)
+    new_entries = utils.zip_entry_map(new_zip, strip_common_root=True)
+
+    # 旧版独有的文件；被 MOD 覆盖记录过的文件交给 MOD 管理，客户端也包含的文件属于客户端，都不在这里删除
+    mod_files = _mod_owned_files(manifest)
+    stale = [rel for rel in old_entries if rel not in new_entries and rel not in mod_files]
+    client_files = _client_owned(install_path, stale)
+    stale = [rel for rel in stale if rel not in client_files]
+    # 新增或内容变化的文件；相同的文件如果在磁盘上缺失也需要补回
+    changed = {
+        rel for rel, meta in new_entries.items()
+        if old_entries.get(rel) != meta or not (install_path / rel).exists()
+    }
+
+    # 新文件先解压到暂存目录，再与旧文件删除一起以重命名方式提交；任一文件被占用时整体回滚
+    staged = staging.extract_staged(new_zip, install_path, strip_common_root=True, members=changed, removals=stale)
+    removed = staged.removed
+    pruned_dirs = _prune_empty_dirs(install_path, removed)
+
+    unchanged = len(new_entries) - len(changed)
+    print(f"差量切换：写入 {len(changed)} 个文件，删除 {len(removed)} 个旧版文件"
+          f"（{pruned_dirs} 个空文件夹），保留 {unchanged} 个相同文件。")
+
+
+def _apply_server_zip(install_path: Path, manifest: dict, selected_zip: Path) -> bool:
+    """把安装目录中的服务端更新为 selected_zip 对应的版本并写入标记文件，返回是否成功。"""
+    new_version = selected_zip.stem
+    current_server_zip = manifest.get("server_zip", "")
+    print(f"正在切换到版本 {new_version}...")
+    current_zip = config.SERVER_DIR / current_server_zip if current_server_zip else None
+    try:
+        if current_zip and current_zip.exists():
+            _switch_differential(current_zip, selected_zip, install_path, manifest)
+        else:
+            # 找不到当前版本的压缩包时无法对比，退回按文件内容比对后覆盖
+            print("未找到当前版本的服务端压缩包，将以增量方式覆盖解压。")
+            staging.extract_staged(selected_zip, install_path, strip_common_root=True)
+        update_manifest_server_version(install_path, new_version, selected_zip.name)
+        record_base_files(install_path, BASE_SERVER,
+                          [str(Path(rel)) for rel in utils.zip_entry_map(selected_zip, strip_common_root=True)])
+        print(f"成功切换到版本 {new_version}。")
+        return True
+    except PermissionError:
+        print("\n切换版本失败。")
+        print("可能原因：游戏服务端仍在运行。")
+        print("解决方案：请关闭 SPT.Server.exe 后再试。")
+    except Exception as exc:
+        print(f"切换版本失败: {exc}")
+    return False
+
+
+def _download_delta(url: str, base_zip: Path, server_zip_path: Path, install_path: Path,
+                    expected_sha256: str = "") -> bool:
+    """以本地当前版本压缩包为基础差量下载新版本，服务器不支持时返回 False 交给完整下载。"""
+    print("检测到本地已有当前版本的压缩包，仅下载有变化的文件...")
+    try:
+        remote_zip.fetch_delta(url, base_zip, server_zip_path, install_root=install_path,
+                               expected_sha256=expected_sha256)
+        return True
+    except remote_zip.RangeUnsupported:
+        print("服务器不支持分段下载，改为完整下载。")
+    except Exception as exc:
+        print(f"差量下载失败（{exc}），改为完整下载。")
+    return False
+
+
 def download_server_version(state: "InstallerState") -> None:
     """下载指定的服务端版本到 server 文件夹。"""
     install_path = _require_install_path(state)
@@ -61,24 +166,36 @@ def download_server_version(state: "InstallerState") -> None:
 
     server_zip_path = config.SERVER_DIR / selected_version.server_zip
     if server_zip_path.exists():
-        print(f"版本 {selected_version.version} 已存在于本地，无需下载。")
-        return
+        if resource_index.check_package(server_zip_path, selected_version.sha256, selected_version.size):
+            print(f"版本 {selected_version.version} 已存在于本地，无需下载。")
+            return
+        print(f"本地的版本 {selected_version.version} 压缩包与公告中的校验值不一致，将重新下载。")
+        server_zip_path.unlink()
 
     if not _confirm(f"确认下载版本 {selected_version.version} 吗？"):
         print("已取消。")
         return
 
     print(f"正在下载服务端版本 {selected_version.version}...")
-    success = utils.download_file(selected_version.download_url, server_zip_path, show_progress=True)
+    current_server_zip = manifest.get("server_zip", "")
+    base_zip = config.SERVER_DIR / current_server_zip if current_server_zip else None
+    delta = bool(base_zip and base_zip.exists()) and _download_delta(
+        selected_version.download_url, base_zip, server_zip_path, install_path, selected_version.sha256)
+    success = delta or utils.download_file(selected_version.download_url, server_zip_path, show_progress=True,
+                                           segments=config.DOWNLOAD_SEGMENTS,
+                                           expected_sha256=selected_version.sha256,
+                                           expected_size=selected_version.size)
 
     if success:
+        if selected_version.sha256:
+            resource_index.remember(server_zip_path, selected_version.sha256)
         print(f"版本 {selected_version.version} 下载完成。")
+        if delta and close_spt_processes():
+            # 差量下载时同步更新安装目录，只写入变化的文件
+            _apply_server_zip(install_path, manifest, server_zip_path)
     else:
-        print(f"版本 {selected_version.version} 下载失败。")
-        try:
-            server_zip_path.unlink()
-        except Exception:
-            pass
+        # 未完成的 .part 文件会保留，再次下载时从断点续传
+        print(f"版本 {selected_version.version} 下载失败，再次下载时将从断点继续。")
 
 
 def switch_server_version(state: "InstallerState") -> None:
@@ -132,6 +249,9 @@ def switch_server_version(state: "InstallerState") -> None:
         return
 
     new_version = selected_zip.stem
+    if not resource_index.check_package(selected_zip):
+        print(f"版本 {new_version} 的压缩包不完整或已损坏，请删除后重新下载。")
+        return
     if not _confirm(f"确认切换到版本 {new_version} 吗？"):
         print("已取消。")
         return
@@ -140,14 +260,4 @@ def switch_server_version(state: "InstallerState") -> None:
     if not close_spt_processes():
         return
 
-    print(f"正在切换到版本 {new_version}...")
-    try:
-        utils.extract_zip(selected_zip, install_path, strip_common_root=True, show_progress=True)
-        update_manifest_server_version(install_path, new_version, selected_zip.name)
-        print(f"成功切换到版本 {new_version}。")
-    except PermissionError:
-        print("\n切换版本失败。")
-        print("可能原因：游戏服务端仍在运行。")
-        print("解决方案：请关闭 SPT.Server.exe 后再试。")
-    except Exception as exc:
-        print(f"切换版本失败: {exc}")
+    _apply_server_zip(install_path, manifest, selected_zip)
@@ -0,0 +1,156 @@
+"""暂存后原子替换：先把新文件写到安装目录旁的临时目录，再逐个重命名替换，失败时回滚。"""
+
+import os
+import shutil
+from pathlib import Path
+from typing import Collection, Iterable, List, Optional, Set, Tuple
+
+from . import config, utils
+
+
+class StagedChanges:
+    """安装目录的一组文件变更（写入与删除），提交前不触碰安装目录。
+
+    暂存目录与安装目录位于同一父目录下（同一分区），提交时只做重命名：
+    被替换或删除的原文件移到备份区，新文件从暂存区移入。任何一步失败都会把已移动的文件按相反顺序还原，
+    因此提交耗时只与文件数量有关，与文件大小无关。
+
+    用法：
+        with StagedChanges(install_path) as staged:
+            utils.extract_zip(zip_path, staged.stage_dir, ...)
+            staged.remove("SPT/old.dll")
+            staged.commit()
+            staged.keep_backups(backup_root, staged.replaced)  # 可选：保留被替换的原文件
+    with 块内抛出异常时，已提交的变更会被回滚；正常结束后删除暂存目录和备份。
+    """
+
+    def __init__(self, target_root: Path) -> None:
+        self.target_root = target_root
+        root = target_root.resolve()
+        self.work_dir = root.parent / f".{root.name}.staging-{os.getpid()}"
+        self.stage_dir = self.work_dir / "new"
+        self.backup_dir = self.work_dir / "backup"
+        self._removals: Set[str] = set()
+        # 已完成的操作，回滚时倒序撤销：("backup", 相对路径) / ("place", 相对路径) / ("mkdir", 相对路径)
+        self._done: List[Tuple[str, str]] = []
+        self.committed = False
+        # 提交后实际删除的文件与被新文件替换的原文件（/ 分隔的相对路径）
+        self.removed: List[str] = []
+        self.replaced: List[str] = []
+
+    def __enter__(self) -> "StagedChanges":
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        self.stage_dir.mkdir(parents=True)
+        self.backup_dir.mkdir(parents=True)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None and self.committed:
+            self.rollback()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def remove(self, rel_path: str) -> None:
+        """提交时删除安装目录中的文件（/ 分隔的相对路径），原文件进入备份区。"""
+        self._removals.add(rel_path)
+
+    def staged_files(self) -> List[str]:
+        """暂存区中的文件（/ 分隔的相对路径）。"""
+        files = []
+        for dirpath, _, filenames in os.walk(self.stage_dir):
+            rel_dir = Path(dirpath).relative_to(self.stage_dir)
+            files.extend((rel_dir / name).as_posix() for name in filenames)
+        return files
+
+    def _staged_dirs(self) -> List[str]:
+        dirs = []
+        for dirpath, dirnames, _ in os.walk(self.stage_dir):
+            rel_dir = Path(dirpath).relative_to(self.stage_dir)
+            dirs.extend((rel_dir / name).as_posix() for name in dirnames)
+        return dirs
+
+    def commit(self) -> None:
+        """用重命名把暂存的变更应用到安装目录；失败时回滚并重新抛出异常。"""
+        try:
+            for rel in self._staged_dirs():
+                target = self.target_root / rel
+                if not target.exists():
+                    target.mkdir()
+                    self._done.append(("mkdir", rel))
+            for rel in sorted(self._removals):
+                if self._backup(rel):
+                    self.removed.append(rel)
+            for rel in self.staged_files():
+                if self._backup(rel):
+                    self.replaced.append(rel)
+                os.replace(self.stage_dir / rel, self.target_root / rel)
+                self._done.append(("place", rel))
+        except BaseException:
+            self.rollback()
+            raise
+        self.committed = True
+
+    def rollback(self) -> None:
+        """撤销已完成的重命名：移除放入的新文件，还原备份的原文件。"""
+        while self._done:
+            action, rel = self._done.pop()
+            target = self.target_root / rel
+            try:
+                if action == "place":
+                    target.unlink()
+                elif action == "backup":
+                    os.replace(self.backup_dir / rel, target)
+                elif action == "mkdir":
+                    target.rmdir()
+            except OSError as exc:
+                print(f"回滚失败 {rel}: {exc}")
+        self.removed.clear()
+        self.replaced.clear()
+        self.committed = False
+
+    def keep_backups(self, dest_root: Path, rel_paths: Iterable[str]) -> List[str]:
+        """提交后把备份区中的原文件移到 dest_root 下（同一分区，只做重命名），返回移动成功的路径。
+
+        必须在 with 块内调用；未移走的备份随暂存目录一起删除。单个文件移动失败只打印提示，不影响已提交的变更。
+        """
+        kept = []
+        for rel in rel_paths:
+            dest = dest_root / rel
+            try:
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(self.backup_dir / rel, dest)
+            except OSError as exc:
+                print(f"保留原文件备份失败 {rel}: {exc}")
+                continue
+            kept.append(rel)
+        return kept
+
+    def _backup(self, rel: str) -> bool:
+        """把安装目录中已有的文件移到备份区，文件不存在时返回 False。"""
+        target = self.target_root / rel
+        if not target.is_file():
+            return False
+        backup = self.backup_dir / rel
+        backup.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(target, backup)
+        self._done.append(("backup", rel))
+        return True
+
+
+def extract_staged(zip_path: Path, target_root: Path, strip_common_root: bool = False,
+                   members: Optional[Collection[str]] = None, removals: Iterable[str] = (),
+                   show_progress: bool = True) -> StagedChanges:
+    """以暂存方式把压缩包应用到安装目录，返回已提交的变更（可读取 removed）。
+
+    members 为需要写入的目标相对路径（/ 分隔）；不传时与安装目录比对（大小 + CRC-32），只写入不同的文件。
+    removals 中的文件会在同一次提交中删除。提交失败时安装目录保持原样，异常继续向外抛出。
+    """
+    if members is None:
+        members = utils.changed_entries(zip_path, target_root, strip_common_root)
+    with StagedChanges(target_root) as staged:
+        for rel in removals:
+            staged.remove(rel)
+        if members:
+            utils.extract_zip(zip_path, staged.stage_dir, strip_common_root=strip_common_root,
+                              show_progress=show_progress, workers=config.EXTRACT_WORKERS, members=members)
+        staged.commit()
+    return staged
@@ -0,0 +1,303 @@
+"""边下载边解压：按到达顺序解析 zip 本地文件头，下载未结束就开始写入安装目录。"""
+
+import hashlib
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path, PurePosixPath
+from typing import List, Optional
+
+import requests
+
+from . import config, http_client, utils
+from .progress import ProgressBar
+
+_LOCAL_HEADER_SIG = b"PK\x03\x04"
+_DATA_DESCRIPTOR_SIG = b"PK\x07\x08"
+_LOCAL_HEADER = struct.Struct("<HHHHHIIIHH")
+_ZIP64_EXTRA_ID = 0x0001
+_FLAG_ENCRYPTED = 0x1
+_FLAG_DATA_DESCRIPTOR = 0x8
+_FLAG_UTF8 = 0x800
+_STREAM_CHUNK_SIZE = 64 * 1024
+# 下载线程与解压线程之间最多缓存的块数（约 8 MB），解压跟不上时下载会等待
+_QUEUE_CHUNKS = 128
+
+
+class StreamUnsupported(Exception):
+    """压缩包结构无法流式解析（加密、未知压缩方式等），需要下载完成后再解压。"""
+
+
+class _ChunkReader:
+    """从队列中按需读取字节，供解析线程顺序消费下载线程放入的数据块。"""
+
+    def __init__(self) -> None:
+        self.chunks: "queue.Queue[Optional[bytes]]" = queue.Queue(maxsize=_QUEUE_CHUNKS)
+        self._buffer = bytearray()
+        self._eof = False
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        chunk = self.chunks.get()
+        if chunk is None:
+            self._eof = True
+            return False
+        self._buffer += chunk
+        return True
+
+    def read(self, size: int) -> bytes:
+        """读取最多 size 字节；数据不足时等待下载线程。"""
+        while len(self._buffer) < size and self._fill():
+            pass
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def read_exact(self, size: int) -> bytes:
+        data = self.read(size)
+        if len(data) != size:
+            raise StreamUnsupported("压缩包数据提前结束")
+        return data
+
+    def read_some(self) -> bytes:
+        """读取当前可用的数据（至少一个块），到结尾返回空字节。"""
+        if not self._buffer:
+            self._fill()
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+    def unread(self, data: bytes) -> None:
+        """把多读的数据放回缓冲区头部。"""
+        self._buffer[:0] = data
+
+
+def _zip64_sizes(extra: bytes, compressed: int, uncompressed: int) -> tuple:
+    """从 zip64 扩展字段中取出被 0xFFFFFFFF 占位的大小。"""
+    pos = 0
+    while pos + 4 <= len(extra):
+        field_id, field_len = struct.unpack_from("<HH", extra, pos)
+        data = extra[pos + 4:pos + 4 + field_len]
+        if field_id == _ZIP64_EXTRA_ID:
+            values = [struct.unpack_from("<Q", data, off)[0] for off in range(0, len(data) - 7, 8)]
+            if uncompressed == 0xFFFFFFFF and values:
+                uncompressed = values.pop(0)
+            if compressed == 0xFFFFFFFF and values:
+                compressed = values.pop(0)
+            return compressed, uncompressed, True
+        pos += 4 + field_len
+    return compressed, uncompressed, False
+
+
+def _decode_name(raw: bytes, flags: int) -> str:
+    """与 zipfile 一致：带 UTF-8 标记用 UTF-8，否则按 cp437 解码。"""
+    name = raw.decode("utf-8" if flags & _FLAG_UTF8 else "cp437")
+    if os.sep != "/":
+        name = name.replace(os.sep, "/")
+    return name
+
+
+def _copy_entry(reader: _ChunkReader, dst, method: int, compressed: int, has_descriptor: bool) -> int:
+    """把一个条目的数据写入 dst，返回解压后数据的 CRC-32。"""
+    crc = 0
+    if method == 0:
+        if has_descriptor:
+            # 存储条目的长度写在数据之后；只有空条目（通常是目录）能直接识别
+            head = reader.read(4)
+            reader.unread(head)
+            if head == _DATA_DESCRIPTOR_SIG:
+                return crc
+            raise StreamUnsupported("无法确定存储条目的长度")
+        remaining = compressed
+        while remaining:
+            data = reader.read(min(remaining, _STREAM_CHUNK_SIZE))
+            if not data:
+                raise StreamUnsupported("压缩包数据提前结束")
+            remaining -= len(data)
+            dst.write(data)
+            crc = zlib.crc32(data, crc)
+        return crc
+    if method != 8:
+        raise StreamUnsupported(f"不支持的压缩方式 {method}")
+
+    decompressor = zlib.decompressobj(-15)
+    remaining = None if has_descriptor else compressed
+    while not decompressor.eof:
+        if remaining is None:
+            data = reader.read_some()
+        else:
+            data = reader.read(min(remaining, _STREAM_CHUNK_SIZE))
+            remaining -= len(data)
+        if not data:
+            raise StreamUnsupported("压缩包数据提前结束")
+        out = decompressor.decompress(data)
+        dst.write(out)
+        crc = zlib.crc32(out, crc)
+    if decompressor.unused_data:
+        reader.unread(decompressor.unused_data)
+    return crc
+
+
+def _extract_stream(reader: _ChunkReader, target_dir: Path) -> List[str]:
+    """顺序解析本地文件头并解压到 target_dir，返回文件列表（与 extract_zip 的格式一致）。"""
+    extracted_files: List[str] = []
+    while True:
+        signature = reader.read(4)
+        if signature != _LOCAL_HEADER_SIG:
+            # 到达中央目录（或结尾），条目已全部处理
+            break
+        (_, flags, method, _, _, crc, compressed, uncompressed,
+         name_len, extra_len) = _LOCAL_HEADER.unpack(reader.read_exact(_LOCAL_HEADER.size))
+        name = _decode_name(reader.read_exact(name_len), flags)
+        extra = reader.read_exact(extra_len)
+        if flags & _FLAG_ENCRYPTED:
+            raise StreamUnsupported("压缩包已加密")
+        compressed, uncompressed, is_zip64 = _zip64_sizes(extra, compressed, uncompressed)
+        has_descriptor = bool(flags & _FLAG_DATA_DESCRIPTOR)
+
+        dest_parts = PurePosixPath(name).parts
+        if not dest_parts or any(part == ".." for part in dest_parts):
+            # 非法路径：读掉数据但不写入
+            with open(os.devnull, "wb") as sink:
+                _copy_entry(reader, sink, method, compressed, has_descriptor)
+        elif name.endswith("/"):
+            target_dir.joinpath(*dest_parts).mkdir(parents=True, exist_ok=True)
+            with open(os.devnull, "wb") as sink:
+                _copy_entry(reader, sink, method, compressed, has_descriptor)
+        else:
+            destination = target_dir.joinpath(*dest_parts)
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            with destination.open("wb") as dst:
+                actual_crc = _copy_entry(reader, dst, method, compressed, has_descriptor)
+            if has_descriptor:
+                crc = _read_descriptor_crc(reader, is_zip64)
+            if actual_crc != crc:
+                raise Exception(f"解压失败：{name} CRC-32 校验失败")
+            extracted_files.append(str(Path(*dest_parts)))
+            continue
+        if has_descriptor:
+            _read_descriptor_crc(reader, is_zip64)
+    return extracted_files
+
+
+def _read_descriptor_crc(reader: _ChunkReader, is_zip64: bool) -> int:
+    """读取数据描述符（签名可选），返回其中的 CRC-32。"""
+    head = reader.read_exact(4)
+    if head == _DATA_DESCRIPTOR_SIG:
+        head = reader.read_exact(4)
+    reader.read_exact(16 if is_zip64 else 8)
+    return struct.unpack("<I", head)[0]
+
+
+def download_and_extract(url: str, zip_path: Path, target_dir: Path, show_progress: bool = True,
+                         expected_sha256: str = "", expected_size: int = 0) -> Optional[List[str]]:
+    """
+    下载 zip 的同时解压到 target_dir，完整的压缩包仍保存到 zip_path 以便之后重装。
+
+    无法流式解压（或下载中断）时，退回为先完成下载（断点续传）再用 extract_zip 解压。
+    给出 expected_sha256 / expected_size 时，与其不符的压缩包会被删除并视为下载失败。
+
+    Returns:
+        解压出的文件列表（相对路径），下载失败返回 None
+    """
+    part_path = zip_path.with_name(zip_path.name + ".part")
+    if part_path.exists():
+        # 上次下载未完成：只能续传后再解压
+        return _download_then_extract(url, zip_path, target_dir, show_progress, expected_sha256, expected_size)
+
+    reader = _ChunkReader()
+    result: dict = {}
+    # 解析线程结束（成功读到中央目录或出错）后，下载线程不再往队列里放数据
+    consumer_done = threading.Event()
+
+    def _consume() -> None:
+        try:
+            result["files"] = _extract_stream(reader, target_dir)
+        except Exception as exc:
+            result["error"] = exc
+        finally:
+            consumer_done.set()
+            # 释放可能在等待的下载线程
+            while True:
+                try:
+                    reader.chunks.get_nowait()
+                except queue.Empty:
+                    break
+
+    worker = threading.Thread(target=_consume, name="stream-extract", daemon=True)
+    worker.start()
+
+    def _feed(chunk: Optional[bytes]) -> None:
+        while not consumer_done.is_set():
+            try:
+                reader.chunks.put(chunk, timeout=0.2)
+                return
+            except queue.Full:
+                continue
+
+    started = time.perf_counter()
+    digest = hashlib.sha256()
+    download_ok = False
+    try:
+        zip_path.parent.mkdir(parents=True, exist_ok=True)
+        with http_client.get(url, stream=True, headers={"Accept-Encoding": "identity"}) as response:
+            response.raise_for_status()
+            total_size = int(response.headers.get("content-length", 0))
+            downloaded = 0
+            with open(part_path, "wb") as f, ProgressBar(total_size, enabled=show_progress) as progress:
+                for chunk in response.iter_content(chunk_size=_STREAM_CHUNK_SIZE):
+                    if not chunk:
+                        continue
+                    f.write(chunk)
+                    digest.update(chunk)
+                    _feed(chunk)
+                    downloaded += len(chunk)
+                    progress.advance(len(chunk))
+            download_ok = not total_size or downloaded >= total_size
+    except requests.exceptions.RequestException as exc:
+        print(f"\n下载中断（{exc}），将续传后再解压。")
+    finally:
+        _feed(None)
+        worker.join()
+
+    if not download_ok:
+        return _download_then_extract(url, zip_path, target_dir, show_progress, expected_sha256, expected_size)
+    if (expected_size and downloaded != expected_size) or \
+            (expected_sha256 and digest.hexdigest() != expected_sha256.lower()):
+        # 已解压的文件会在重新下载后被增量解压覆盖
+        print("文件校验失败：压缩包与公告中的大小或 SHA-256 不一致，已删除下载的文件。")
+        part_path.unlink()
+        return None
+    part_path.replace(zip_path)
+
+    files = result.get("files")
+    if files is None:
+        error = result.get("error")
+        if error and not isinstance(error, StreamUnsupported):
+            raise error
+        print(f"无法边下载边解压（{error}），改为下载完成后解压。")
+        return utils.extract_zip(zip_path, target_dir, strip_common_root=False, show_progress=show_progress,
+                                 workers=config.EXTRACT_WORKERS, incremental=True)
+    # 以中央目录为准核对一遍，确保没有遗漏条目
+    expected = [str(Path(rel)) for rel in utils.zip_entry_map(zip_path)]
+    if files != expected:
+        return utils.extract_zip(zip_path, target_dir, strip_common_root=False, show_progress=show_progress,
+                                 workers=config.EXTRACT_WORKERS, incremental=True)
+    if show_progress:
+        elapsed = time.perf_counter() - started
+        print(f"下载并解压完成：{len(files)} 个文件，用时 {elapsed:.1f} 秒")
+    return files
+
+
+def _download_then_extract(url: str, zip_path: Path, target_dir: Path, show_progress: bool,
+                           expected_sha256: str = "", expected_size: int = 0) -> Optional[List[str]]:
+    """常规流程：下载（支持续传）完成后再增量解压。"""
+    if not utils.download_file(url, zip_path, show_progress=show_progress, segments=config.DOWNLOAD_SEGMENTS,
+                               expected_sha256=expected_sha256, expected_size=expected_size):
+        return None
+    return utils.extract_zip(zip_path, target_dir, strip_common_root=False, show_progress=show_progress,
+                             workers=config.EXTRACT_WORKERS, incremental=True)
@@ -8,16 +8,20 @@ from . import utils
 from . import announcement
 
 
-def get_latest_version_info() -> Optional[dict]:
+def get_latest_version_info(blocking: bool = True) -> Optional[dict]:
     """
     从公告 JSON 获取最新版本信息。
+
+    Args:
+        blocking: 为 False 时只读取已缓存的公告，不联网也不打印错误（用于菜单绘制）
     
     Returns:
         包含 latest_version 和 download_url 的字典，获取失败返回 None
     """
-    ann = announcement.get_announcement()
+    ann = announcement.get_announcement() if blocking else announcement.peek_announcement()
     if not ann["success"]:
-        print(f"无法获取版本信息: {ann['error']}")
+        if blocking:
+            print(f"无法获取版本信息: {ann['error']}")
         return None
     
     data = ann.get("data", {})
@@ -25,7 +29,8 @@ def get_latest_version_info() -> Optional[dict]:
     download_url = data.get("download_url")
     
     if not latest_version or not download_url:
-        print("公告中缺少版本或下载链接信息。")
+        if blocking:
+            print("公告中缺少版本或下载链接信息。")
         return None
     
     return {
@@ -34,16 +39,16 @@ def get_latest_version_info() -> Optional[dict]:
     }
 
 
-def check_update() -> Optional[dict]:
+def check_update(blocking: bool = True) -> Optional[dict]:
     """
-    检查是否有新版本。
+    检查是否有新版本。blocking 为 False 时只使用已缓存的公告。
     
     Returns:
         如果有新版本，返回 {"has_update": True, "latest_version": "...", "download_url": "..."}
         如果已是最新版本，返回 {"has_update": False, "current_version": "..."}
         获取信息失败返回 None
     """
-    version_info = get_latest_version_info()
+    version_info = get_latest_version_info(blocking)
     if not version_info:
         return None
     
@@ -105,7 +110,7 @@ def auto_update() -> None:
     dest_path = config.BASE_DIR / f"SPT-Installer-{latest_version}.exe"
     
     print(f"正在下载到: {dest_path}")
-    if utils.download_file(download_url, dest_path, show_progress=True):
+    if utils.download_file(download_url, dest_path, show_progress=True, segments=config.DOWNLOAD_SEGMENTS):
         print(f"下载完成！已保存到: {dest_path}")
         print('请你关闭软件，启动新版本')
         # if _confirm("是否立即运行更新程序？"):
@@ -1,12 +1,24 @@
+import hashlib
+import json
+import mmap
 import os
 import re
 import shutil
+import struct
 import subprocess
 import sys
+import threading
+import time
 import zipfile
+import zlib
 import requests
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass
 from pathlib import Path, PurePosixPath
-from typing import Iterable, List, Optional
+from typing import Callable, Collection, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from . import http_client
+from .progress import ProgressBar
 
 # ANSI 颜色定义，用于菜单/提示高亮
 class Colors:
@@ -25,6 +37,16 @@ def color_text(text: str, color: str) -> str:
 
 
 CHINESE_RE = re.compile(r"[\u4e00-\u9fff]")
+# 解压时单次读写的缓冲区大小
+_COPY_BUFFER_SIZE = 1024 * 1024
+# 未压缩条目每次由内核复制的字节数（两次之间推进进度）
+_STORED_COPY_CHUNK = 8 * 1024 * 1024
+_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+_LOCAL_HEADER_SIG = b"PK\x03\x04"
+# 下载时单次读取的块大小
+_DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# 分段下载时每段的最小字节数，文件太小时不值得开多个连接
+_MIN_SEGMENT_SIZE = 1024 * 1024
 
 
 def clear_screen() -> None:
@@ -106,62 +128,462 @@ def detect_common_root(entries: Iterable[str]) -> Optional[str]:
     return root_name
 
 
-def _print_progress(current: int, total: int) -> None:
-    """简单文字进度条，按行覆盖显示。"""
-    if total == 0:
-        return
-    bar_len = 30
-    filled = int(bar_len * current / total)
-    bar = "█" * filled + "-" * (bar_len - filled)
-    percent = int(current * 100 / total)
-    print(f"\r[{bar}] {percent:3d}% ({current}/{total})", end="", flush=True)
+class ZipEntry(NamedTuple):
+    """中央目录中的一个条目。"""
+    name: str
+    file_size: int
+    compress_size: int
+    crc: int
+    header_offset: int
+
+    def is_dir(self) -> bool:
+        return self.name.endswith("/")
+
+
+@dataclass
+class ZipIndex:
+    """压缩包中央目录的缓存：条目、统一顶层目录和解压后总大小。"""
+    entries: List[ZipEntry]
+    common_root: Optional[str]
+    total_bytes: int
+
+    @classmethod
+    def from_archive(cls, archive: zipfile.ZipFile) -> "ZipIndex":
+        entries = [ZipEntry(info.filename, info.file_size, info.compress_size, info.CRC, info.header_offset)
+                   for info in archive.infolist()]
+        return cls(entries, detect_common_root(entry.name for entry in entries),
+                   sum(entry.file_size for entry in entries))
+
+
+# 索引文件格式有变化时递增，旧文件会被重新生成
+_ZIP_INDEX_VERSION = 1
+
+
+def _zip_index_path(zip_path: Path) -> Path:
+    """压缩包的索引文件：<文件名>.index.json，与压缩包放在同一目录。"""
+    return zip_path.with_name(zip_path.name + ".index.json")
+
+
+def load_zip_index(zip_path: Path) -> ZipIndex:
+    """读取压缩包的中央目录索引。
+
+    索引文件的大小和修改时间与压缩包一致时直接使用，否则重新解析中央目录并写入索引文件（写入失败不影响结果）。
+    """
+    stat = zip_path.stat()
+    index_path = _zip_index_path(zip_path)
+    try:
+        cached = json.loads(index_path.read_text(encoding="utf-8"))
+        if (cached.get("version") == _ZIP_INDEX_VERSION and cached.get("size") == stat.st_size
+                and cached.get("mtime_ns") == stat.st_mtime_ns):
+            return ZipIndex([ZipEntry(*entry) for entry in cached["entries"]], cached["common_root"],
+                            cached["total_bytes"])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    with zipfile.ZipFile(zip_path) as archive:
+        index = ZipIndex.from_archive(archive)
+    payload = {
+        "version": _ZIP_INDEX_VERSION,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "common_root": index.common_root,
+        "total_bytes": index.total_bytes,
+        "entries": index.entries,
+    }
+    try:
+        tmp_path = index_path.with_name(index_path.name + ".tmp")
+        tmp_path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+        tmp_path.replace(index_path)
+    except OSError:
+        pass
+    return index
+
+
+def _plan_entries(index: ZipIndex, strip_common_root: bool,
+                  members: Optional[Collection[str]] = None) -> List[Tuple[ZipEntry, Tuple[str, ...]]]:
+    """生成解压计划：去除统一顶层目录、过滤含 .. 的条目，返回 (条目, 目标路径片段) 列表。
+
+    传入 members 时只保留目标相对路径（/ 分隔）在其中的文件条目；目录条目总会保留（创建目录不影响已有内容）。
+    """
+    root_to_strip = index.common_root if strip_common_root else None
+    plan = []
+    for entry in index.entries:
+        dest_parts = PurePosixPath(entry.name).parts
+        if root_to_strip and dest_parts and dest_parts[0] == root_to_strip:
+            dest_parts = dest_parts[1:]
+        if not dest_parts:
+            continue
+        if any(part == ".." for part in dest_parts):
+            continue
+        if members is not None and not entry.is_dir() and "/".join(dest_parts) not in members:
+            continue
+        plan.append((entry, dest_parts))
+    return plan
+
+
+def zip_entry_map(zip_path: Path, strip_common_root: bool = False) -> Dict[str, Tuple[int, int]]:
+    """按中央目录索引返回 {目标相对路径（/ 分隔）: (CRC-32, 解压后大小)}，不含目录条目。"""
+    return {
+        "/".join(dest_parts): (entry.crc, entry.file_size)
+        for entry, dest_parts in _plan_entries(load_zip_index(zip_path), strip_common_root)
+        if not entry.is_dir()
+    }
+
+
+def file_crc32(path: Path) -> int:
+    """流式计算文件的 CRC-32，与 zip 条目记录的 CRC 对应。"""
+    crc = 0
+    with path.open("rb") as f:
+        while True:
+            chunk = f.read(_COPY_BUFFER_SIZE)
+            if not chunk:
+                return crc
+            crc = zlib.crc32(chunk, crc)
+
+
+def changed_entries(zip_path: Path, target_dir: Path, strip_common_root: bool = False) -> Set[str]:
+    """返回目标目录中缺失或与压缩包内容不同（大小 + CRC-32）的文件（目标相对路径，/ 分隔）。"""
+    changed = set()
+    for rel, (crc, size) in zip_entry_map(zip_path, strip_common_root).items():
+        destination = target_dir / rel
+        try:
+            if destination.stat().st_size == size and file_crc32(destination) == crc:
+                continue
+        except OSError:
+            pass
+        changed.add(rel)
+    return changed
+
+
+def file_sha256(path: Path) -> str:
+    """流式计算文件的 SHA-256（十六进制小写）。"""
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        while True:
+            chunk = f.read(_COPY_BUFFER_SIZE)
+            if not chunk:
+                return digest.hexdigest()
+            digest.update(chunk)
+
+
+def verify_file(path: Path, expected_sha256: str = "", expected_size: int = 0) -> bool:
+    """检查本地文件是否与公告给出的大小和 SHA-256 一致；未给出的项不检查。"""
+    if not path.is_file():
+        return False
+    if expected_size and path.stat().st_size != expected_size:
+        return False
+    if expected_sha256 and file_sha256(path) != expected_sha256.lower():
+        return False
+    return True
+
+
+class _ExtractStats:
+    """增量解压统计：写入、跳过、以及做过 CRC 比对的条目数（线程安全）。"""
+
+    def __init__(self) -> None:
+        self.written = 0
+        self.skipped = 0
+        self.verified = 0
+        self._lock = threading.Lock()
+
+    def add(self, written: bool, verified: bool) -> None:
+        with self._lock:
+            if written:
+                self.written += 1
+            else:
+                self.skipped += 1
+            if verified:
+                self.verified += 1
+
+
+def _stored_data_offset(archive: zipfile.ZipFile, info: zipfile.ZipInfo) -> Optional[int]:
+    """读取本地文件头，返回条目数据在压缩包中的偏移；文件头异常时返回 None。"""
+    # ZipFile 内部每次读取前都会重新定位，这里直接移动文件指针不影响它
+    archive.fp.seek(info.header_offset)
+    header = archive.fp.read(_LOCAL_HEADER.size)
+    if len(header) != _LOCAL_HEADER.size or header[:4] != _LOCAL_HEADER_SIG:
+        return None
+    fields = _LOCAL_HEADER.unpack(header)
+    return info.header_offset + _LOCAL_HEADER.size + fields[10] + fields[11]
+
+
+def _kernel_copy(src_fd: int, dst_fd: int, offset: int, count: int, progress: Optional[ProgressBar]) -> bool:
+    """用 copy_file_range / sendfile 在内核中复制，两者都不可用时返回 False（目标文件尚未写入）。"""
+    for name in ("copy_file_range", "sendfile"):
+        copy = getattr(os, name, None)
+        if copy is None or (name == "sendfile" and not sys.platform.startswith("linux")):
+            continue
+        copied = 0
+        try:
+            while copied < count:
+                size = min(_STORED_COPY_CHUNK, count - copied)
+                if name == "copy_file_range":
+                    sent = copy(src_fd, dst_fd, size, offset + copied)
+                else:
+                    sent = copy(dst_fd, src_fd, offset + copied, size)
+                if sent == 0:
+                    raise EOFError("压缩包在条目数据中途结束")
+                copied += sent
+                if progress:
+                    progress.advance(sent)
+        except OSError:
+            if copied:
+                raise
+            # 文件系统或内核不支持，换下一种方式
+            continue
+        return True
+    return False
+
+
+def _mmap_copy(src_fd: int, dst, offset: int, count: int, progress: Optional[ProgressBar]) -> int:
+    """通过内存映射复制条目数据，返回 CRC-32。"""
+    aligned = offset - offset % mmap.ALLOCATIONGRANULARITY
+    crc = 0
+    start = offset - aligned
+    with mmap.mmap(src_fd, start + count, access=mmap.ACCESS_READ, offset=aligned) as view, \
+            memoryview(view) as data:
+        for pos in range(start, start + count, _COPY_BUFFER_SIZE):
+            with data[pos:min(pos + _COPY_BUFFER_SIZE, start + count)] as chunk:
+                crc = zlib.crc32(chunk, crc)
+                dst.write(chunk)
+                if progress:
+                    progress.advance(len(chunk))
+    return crc
+
+
+def _copy_stored(archive: zipfile.ZipFile, info: zipfile.ZipInfo, destination: Path,
+                 progress: Optional[ProgressBar]) -> bool:
+    """未压缩条目的快速复制：从数据偏移直接复制到目标文件，不经过 zipfile 的逐块读写。
+
+    优先使用 copy_file_range / sendfile，不可用时（如 Windows）使用内存映射；复制后仍校验 CRC-32。
+    条目加密、压缩包不是普通文件等无法走快速路径的情况返回 False，由调用方按常规方式解压。
+    """
+    if info.compress_type != zipfile.ZIP_STORED or info.flag_bits & 0x1 or info.file_size != info.compress_size:
+        return False
+    try:
+        src_fd = archive.fp.fileno()
+    except (AttributeError, OSError, ValueError):
+        return False
+    offset = _stored_data_offset(archive, info)
+    if offset is None:
+        return False
+    with destination.open("wb") as dst:
+        if info.file_size == 0:
+            crc = 0
+        elif _kernel_copy(src_fd, dst.fileno(), offset, info.file_size, progress):
+            crc = None
+        else:
+            crc = _mmap_copy(src_fd, dst, offset, info.file_size, progress)
+    if crc is None:
+        # 内核复制不经过用户态，从页缓存重新读取计算 CRC
+        crc = file_crc32(destination)
+    if crc != info.CRC:
+        raise zipfile.BadZipFile(f"Bad CRC-32 for file {info.filename!r}")
+    return True
+
+
+def _write_entry(archive: zipfile.ZipFile, info: zipfile.ZipInfo, destination: Path,
+                 stats: Optional[_ExtractStats] = None, progress: Optional[ProgressBar] = None) -> bool:
+    """把单个条目写到目标位置；目录条目只创建文件夹。返回是否写入了文件。
+
+    传入 stats 时为增量模式：目标文件大小一致且 CRC-32 相同则跳过写入。
+    传入 progress 时按写入（或比对）的字节数推进进度。
+    未压缩（ZIP_STORED）的条目优先走 _copy_stored 快速路径。
+    """
+    if info.is_dir():
+        destination.mkdir(parents=True, exist_ok=True)
+        return False
+    if stats is not None:
+        verified = False
+        try:
+            if destination.stat().st_size == info.file_size:
+                verified = True
+                if file_crc32(destination) == info.CRC:
+                    stats.add(written=False, verified=True)
+                    if progress:
+                        progress.advance(info.file_size)
+                    return False
+        except OSError:
+            # 目标不存在或无法读取，按需要写入处理
+            pass
+        stats.add(written=True, verified=verified)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    if _copy_stored(archive, info, destination, progress):
+        return True
+    with archive.open(info, "r") as src, destination.open("wb") as dst:
+        if progress is None:
+            shutil.copyfileobj(src, dst, _COPY_BUFFER_SIZE)
+            return True
+        while True:
+            chunk = src.read(_COPY_BUFFER_SIZE)
+            if not chunk:
+                break
+            dst.write(chunk)
+            progress.advance(len(chunk))
+    return True
+
+
+def _extract_parallel(zip_path: Path, target_dir: Path, plan: List[Tuple[zipfile.ZipInfo, Tuple[str, ...]]],
+                      workers: int, progress: ProgressBar, stats: Optional[_ExtractStats] = None,
+                      executor: Optional[ThreadPoolExecutor] = None,
+                      on_entry: Optional[Callable[[str], None]] = None
+                      ) -> Iterator[Tuple[zipfile.ZipInfo, Tuple[str, ...], bool]]:
+    """多线程解压：每个线程持有独立的 ZipFile 句柄，按条目大小从大到小调度。
+
+    按完成顺序产出 (条目, 目标路径片段, 是否写入)，只含文件条目。
+    传入 executor 时使用这个共享线程池（多个解压任务共用同一份线程数），否则按 workers 新建。
+    """
+    local = threading.local()
+    handles: List[zipfile.ZipFile] = []
+    handles_lock = threading.Lock()
 
+    def _worker(info: zipfile.ZipInfo, dest_parts: Tuple[str, ...]) -> Tuple[zipfile.ZipInfo, Tuple[str, ...], bool]:
+        archive = getattr(local, "archive", None)
+        if archive is None:
+            archive = zipfile.ZipFile(zip_path)
+            local.archive = archive
+            with handles_lock:
+                handles.append(archive)
+        written = _write_entry(archive, info, target_dir.joinpath(*dest_parts), stats, progress)
+        if on_entry:
+            on_entry("/".join(dest_parts))
+        return info, dest_parts, written
 
-def extract_zip(zip_path: Path, target_dir: Path, strip_common_root: bool = False, show_progress: bool = False) -> List[str]:
-    """解压 zip 到目标目录，可选去除统一顶层目录，并显示进度。返回解压的文件列表（相对路径）。"""
-    extracted_files = []
+    # 先建目录，避免线程之间反复探测同一层级
+    for info, dest_parts in plan:
+        if info.is_dir():
+            target_dir.joinpath(*dest_parts).mkdir(parents=True, exist_ok=True)
+    # 大文件优先，避免最慢的条目最后才开始
+    files = sorted((item for item in plan if not item[0].is_dir()), key=lambda item: item[0].file_size, reverse=True)
+    pool = executor or ThreadPoolExecutor(max_workers=workers)
+    # 限制同时排队的条目数：共享线程池时各个解压任务轮流占用线程，不会一个排满队列、另一个等它全部完成
+    window = max(2, workers * 2)
+    pending: Set[Future] = set()
     try:
+        for info, dest_parts in files:
+            if len(pending) >= window:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            pending.add(pool.submit(_worker, info, dest_parts))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        # 出错时取消尚未开始的条目，等正在写入的条目结束后关闭所有线程的句柄
+        if executor is None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        else:
+            for future in pending:
+                future.cancel()
+            wait(pending)
+        for archive in handles:
+            archive.close()
+
+
+def _print_extract_summary(file_count: int, total_bytes: int, elapsed: float) -> None:
+    """打印解压吞吐量汇总。"""
+    size_mb = total_bytes / (1024 * 1024)
+    speed = size_mb / elapsed if elapsed > 0 else 0.0
+    print(f"解压完成：{file_count} 个文件，{size_mb:.1f} MB，用时 {elapsed:.1f} 秒，平均 {speed:.1f} MB/s")
+
+
+class ExtractedEntry(NamedTuple):
+    """iter_extract_zip 产出的单个文件结果。"""
+    path: str  # 目标相对路径（/ 分隔）
+    size: int
+    crc: int
+    written: bool  # 增量模式下内容相同而跳过时为 False
+
+
+_CORRUPT_ZIP_MESSAGE = "解压失败：压缩包文件损坏（CRC-32 校验失败）\n请重新下载一键安装器压缩包，确保文件完整后再试。"
+
+
+def iter_extract_zip(zip_path: Path, target_dir: Path, strip_common_root: bool = False, show_progress: bool = False,
+                     workers: int = 1, incremental: bool = False,
+                     members: Optional[Collection[str]] = None,
+                     executor: Optional[ThreadPoolExecutor] = None,
+                     progress: Optional[ProgressBar] = None,
+                     on_entry: Optional[Callable[[str], None]] = None) -> Iterator[ExtractedEntry]:
+    """逐个产出解压结果的流式接口，不保存完整的文件列表；参数含义同 extract_zip。
+
+    单线程时按压缩包顺序产出，多线程时按完成顺序产出；需要迭代到结束才算解压完成。
+    """
+    stats = _ExtractStats() if incremental else None
+    started = time.perf_counter()
+    file_count = 0
+    total_bytes = 0
+    try:
+        index = load_zip_index(zip_path)
         with zipfile.ZipFile(zip_path) as archive:
-            entries = archive.infolist()
-            root_to_strip = detect_common_root(archive.namelist()) if strip_common_root else None
-            total = len(entries)
-            for idx, info in enumerate(entries, start=1):
-                dest_parts = PurePosixPath(info.filename).parts
-                if not dest_parts:
-                    if show_progress:
-                        _print_progress(idx, total)
-                    continue
-                if root_to_strip and dest_parts[0] == root_to_strip:
-                    dest_parts = dest_parts[1:]
-                if not dest_parts:
-                    if show_progress:
-                        _print_progress(idx, total)
-                    continue
-                if any(part == ".." for part in dest_parts):
-                    if show_progress:
-                        _print_progress(idx, total)
-                    continue
-                destination = target_dir.joinpath(*dest_parts)
-                if info.is_dir():
-                    destination.mkdir(parents=True, exist_ok=True)
+            plan = [(archive.getinfo(entry.name), dest_parts)
+                    for entry, dest_parts in _plan_entries(index, strip_common_root, members)]
+            # 进度按解压后的字节数计算，单个大文件也能看到推进
+            bar = progress or ProgressBar(sum(info.file_size for info, _ in plan), enabled=show_progress)
+            try:
+                if workers > 1 or executor is not None:
+                    results = _extract_parallel(zip_path, target_dir, plan, workers, bar, stats, executor, on_entry)
                 else:
-                    destination.parent.mkdir(parents=True, exist_ok=True)
-                    with archive.open(info, "r") as src, destination.open("wb") as dst:
-                        shutil.copyfileobj(src, dst)
-                # 记录解压的文件（仅非目录）
-                if not info.is_dir():
-                    extracted_files.append(str(Path(*dest_parts)))
-                if show_progress:
-                    _print_progress(idx, total)
-            if show_progress and total:
-                print()
+                    results = _extract_sequential(archive, target_dir, plan, bar, stats, on_entry)
+                for info, dest_parts, written in results:
+                    file_count += 1
+                    total_bytes += info.file_size
+                    yield ExtractedEntry("/".join(dest_parts), info.file_size, info.CRC, written)
+            finally:
+                if progress is None:
+                    bar.finish()
     except zipfile.BadZipFile as e:
-        raise Exception("解压失败：压缩包文件损坏（CRC-32 校验失败）\n请重新下载一键安装器压缩包，确保文件完整后再试。") from e
+        raise Exception(_CORRUPT_ZIP_MESSAGE) from e
     except Exception as e:
         # 重新抛出其他异常
         if "CRC" in str(e).upper():
-            raise Exception("解压失败：压缩包文件损坏（CRC-32 校验失败）\n请重新下载一键安装器压缩包，确保文件完整后再试。") from e
+            raise Exception(_CORRUPT_ZIP_MESSAGE) from e
         raise
+    if show_progress:
+        _print_extract_summary(file_count, total_bytes, time.perf_counter() - started)
+        if stats is not None:
+            print(f"增量解压：写入 {stats.written} 个，跳过 {stats.skipped} 个未变化文件，CRC 比对 {stats.verified} 个")
+
+
+def _extract_sequential(archive: zipfile.ZipFile, target_dir: Path,
+                        plan: List[Tuple[zipfile.ZipInfo, Tuple[str, ...]]], progress: ProgressBar,
+                        stats: Optional[_ExtractStats] = None,
+                        on_entry: Optional[Callable[[str], None]] = None
+                        ) -> Iterator[Tuple[zipfile.ZipInfo, Tuple[str, ...], bool]]:
+    """单线程按压缩包顺序解压，产出格式同 _extract_parallel。"""
+    for info, dest_parts in plan:
+        written = _write_entry(archive, info, target_dir.joinpath(*dest_parts), stats, progress)
+        if info.is_dir():
+            continue
+        if on_entry:
+            on_entry("/".join(dest_parts))
+        yield info, dest_parts, written
+
+
+def extract_zip(zip_path: Path, target_dir: Path, strip_common_root: bool = False, show_progress: bool = False,
+                workers: int = 1, incremental: bool = False,
+                members: Optional[Collection[str]] = None,
+                executor: Optional[ThreadPoolExecutor] = None,
+                progress: Optional[ProgressBar] = None,
+                on_entry: Optional[Callable[[str], None]] = None) -> List[str]:
+    """解压 zip 到目标目录，可选去除统一顶层目录，并显示进度。返回解压的文件列表（相对路径）。
+
+    workers 大于 1 时启用多线程解压（zlib 解压时会释放 GIL）。
+    incremental 为 True 时跳过与压缩包内容相同（大小 + CRC-32）的已有文件，返回列表仍包含这些文件。
+    members 为目标相对路径（/ 分隔）集合，传入时只解压其中的文件。
+    executor / progress 用于多个任务同时进行时共用线程池和进度条（progress 由调用方负责结束）。
+    on_entry 在每个文件写完（或增量模式下确认无需写入）后以目标相对路径（/ 分隔）调用，可能来自多个线程。
+    文件很多时可改用 iter_extract_zip 逐个处理结果。
+    """
+    extracted_files = [str(Path(entry.path)) for entry in iter_extract_zip(
+        zip_path, target_dir, strip_common_root, show_progress, workers, incremental, members, executor, progress,
+        on_entry)]
+    if workers > 1 or executor is not None:
+        # 保持压缩包内的顺序
+        order = {"/".join(dest_parts): idx for idx, (_, dest_parts) in enumerate(
+            _plan_entries(load_zip_index(zip_path), strip_common_root, members))}
+        extracted_files.sort(key=lambda rel: order[Path(rel).as_posix()])
     return extracted_files
 
 
@@ -173,43 +595,309 @@ def open_in_explorer(path: Path) -> None:
     subprocess.Popen(["explorer", str(path)])
 
 
-def download_file(url: str, dest_path: Path, show_progress: bool = True) -> bool:
+class _DownloadInterrupted(requests.exceptions.ConnectionError):
+    """连接在文件下载完之前被关闭。"""
+
+
+class _PartHasher:
+    """边下载边计算 .part 文件的 SHA-256。
+
+    hashed 之前的字节已计入摘要；续传或分段下载时，摘要尚未覆盖的已写入部分从文件中补读。
     """
-    从 URL 下载文件到指定路径，支持显示进度条。
+
+    def __init__(self, part_path: Path) -> None:
+        self.part_path = part_path
+        self.hashed = 0
+        self._digest = hashlib.sha256()
+
+    def update(self, chunk: bytes) -> None:
+        self._digest.update(chunk)
+        self.hashed += len(chunk)
+
+    def sync(self, offset: int) -> None:
+        """让摘要正好覆盖文件前 offset 字节：重新下载时清零，续传时补读已有内容。"""
+        if offset < self.hashed:
+            self.hashed = 0
+            self._digest = hashlib.sha256()
+        if offset == self.hashed:
+            return
+        with open(self.part_path, "rb") as f:
+            f.seek(self.hashed)
+            while self.hashed < offset:
+                chunk = f.read(min(offset - self.hashed, _COPY_BUFFER_SIZE))
+                if not chunk:
+                    raise _DownloadInterrupted("下载文件被截断，将重新下载")
+                self.update(chunk)
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+
+def _download_to_part(url: str, part_path: Path, show_progress: bool, hasher: Optional[_PartHasher] = None) -> None:
+    """把 url 的内容续写到 .part 文件；已有部分内容时用 Range 请求续传。"""
+    offset = part_path.stat().st_size if part_path.exists() else 0
+    # 禁用压缩传输，保证字节偏移与文件一致
+    headers = {"Accept-Encoding": "identity"}
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+    with http_client.get(url, stream=True, headers=headers) as response:
+        if offset and response.status_code == 416:
+            # 服务器认为范围越界：若 .part 已经是完整文件则直接完成，否则从头下载
+            content_range = response.headers.get("content-range", "")
+            if content_range.endswith(f"/{offset}"):
+                if hasher:
+                    hasher.sync(offset)
+                return
+            part_path.unlink()
+            raise _DownloadInterrupted("续传位置无效，将重新下载")
+        response.raise_for_status()
+        if offset and response.status_code != 206:
+            # 服务器不支持 Range，只能从头开始
+            offset = 0
+        if hasher:
+            hasher.sync(offset)
+        length = int(response.headers.get("content-length", 0))
+        total_size = offset + length if length else 0
+        downloaded = offset
+
+        with open(part_path, "ab" if offset else "wb") as f, \
+                ProgressBar(total_size, enabled=show_progress, initial=offset) as progress:
+            for chunk in response.iter_content(chunk_size=_DOWNLOAD_CHUNK_SIZE):
+                if chunk:
+                    f.write(chunk)
+                    if hasher:
+                        hasher.update(chunk)
+                    downloaded += len(chunk)
+                    progress.advance(len(chunk))
+
+        if total_size and downloaded < total_size:
+            raise _DownloadInterrupted(f"连接中断，已接收 {downloaded}/{total_size} 字节")
+
+
+def _probe_range_size(url: str) -> int:
+    """用 HEAD 请求探测文件大小；服务器不声明 Accept-Ranges: bytes 时返回 0。
+
+    有些服务器拒绝 HEAD（403 / 405 等），探测失败一律视为不支持分段，交给单连接下载处理。
+    """
+    try:
+        response = http_client.head(url, allow_redirects=True, headers={"Accept-Encoding": "identity"})
+    except requests.exceptions.RequestException:
+        return 0
+    if not response.ok or response.headers.get("accept-ranges", "").lower() != "bytes":
+        return 0
+    return int(response.headers.get("content-length", 0))
+
+
+def _segment_state_path(part_path: Path) -> Path:
+    """分段下载状态文件路径：<文件名>.part.json。"""
+    return part_path.with_name(part_path.name + ".json")
+
+
+class _SegmentedDownload:
+    """分段下载状态：把文件切成若干字节区间，记录每段已写入的字节数。
+
+    状态保存在 <文件名>.part.json 中，进程中途退出后可以按段续传。
+    """
+
+    def __init__(self, part_path: Path, size: int, segments: List[List[int]]) -> None:
+        self.part_path = part_path
+        self.state_path = _segment_state_path(part_path)
+        self.size = size
+        # 每段为 [起始偏移, 结束偏移（含）, 已写入字节数]
+        self.segments = segments
+        self.lock = threading.Lock()
+        self.failed = threading.Event()
+        self.hasher: Optional[_PartHasher] = None
+        self._last_save = 0.0
+
+    @classmethod
+    def open(cls, part_path: Path, size: int, count: int) -> "_SegmentedDownload":
+        """读取已有的分段状态；大小不符或不存在时重新切分并预分配文件。"""
+        state_path = _segment_state_path(part_path)
+        if state_path.exists() and part_path.exists():
+            try:
+                state = json.loads(state_path.read_text(encoding="utf-8"))
+                if state.get("size") == size:
+                    return cls(part_path, size, state["segments"])
+            except Exception:
+                pass
+        step = -(-size // count)
+        segments = [[start, min(start + step, size) - 1, 0] for start in range(0, size, step)]
+        download = cls(part_path, size, segments)
+        # 先写状态再预分配，避免出现没有状态记录的空洞文件
+        download.save()
+        with open(part_path, "wb") as f:
+            f.truncate(size)
+        return download
+
+    @property
+    def downloaded(self) -> int:
+        return sum(segment[2] for segment in self.segments)
+
+    def contiguous(self) -> int:
+        """从文件开头起连续写完的字节数。"""
+        end = 0
+        for start, last, written in self.segments:
+            end = start + written
+            if end <= last:
+                break
+        return end
+
+    def save(self, force: bool = True) -> None:
+        """写入分段状态；force 为 False 时最多每秒写一次。"""
+        now = time.monotonic()
+        if not force and now - self._last_save < 1.0:
+            return
+        self._last_save = now
+        payload = {"size": self.size, "segments": self.segments}
+        self.state_path.write_text(json.dumps(payload), encoding="utf-8")
+
+    def fetch(self, url: str, index: int, progress: ProgressBar) -> None:
+        """下载第 index 段中尚未写入的部分。"""
+        segment = self.segments[index]
+        start = segment[0] + segment[2]
+        end = segment[1]
+        if start > end:
+            return
+        headers = {"Accept-Encoding": "identity", "Range": f"bytes={start}-{end}"}
+        with http_client.get(url, stream=True, headers=headers) as response:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise _DownloadInterrupted("服务器未按分段返回数据")
+            # 不使用缓冲：写入的数据立即对计算摘要的补读可见
+            with open(self.part_path, "r+b", buffering=0) as f:
+                f.seek(start)
+                for chunk in response.iter_content(chunk_size=_DOWNLOAD_CHUNK_SIZE):
+                    if self.failed.is_set():
+                        raise _DownloadInterrupted("其他分段下载失败")
+                    if not chunk:
+                        continue
+                    position = segment[0] + segment[2]
+                    chunk = chunk[:end + 1 - position]
+                    f.write(chunk)
+                    progress.advance(len(chunk))
+                    with self.lock:
+                        segment[2] += len(chunk)
+                        if self.hasher is not None:
+                            if self.hasher.hashed == position:
+                                # 正好接在摘要之后，直接用内存中的数据
+                                self.hasher.update(chunk)
+                            elif position + len(chunk) > end:
+                                # 本段写完，补读摘要之后已连续写好的部分
+                                self.hasher.sync(self.contiguous())
+                        self.save(force=False)
+        if segment[0] + segment[2] <= end:
+            raise _DownloadInterrupted(f"分段 {index + 1} 连接中断")
+
+
+def _download_segmented(url: str, part_path: Path, size: int, count: int, show_progress: bool,
+                        hasher: Optional[_PartHasher] = None) -> None:
+    """多连接并发下载各个分段到预分配的 .part 文件。"""
+    download = _SegmentedDownload.open(part_path, size, count)
+    if hasher:
+        hasher.sync(download.contiguous())
+        download.hasher = hasher
+    progress = ProgressBar(size, enabled=show_progress, initial=download.downloaded)
+    pool = ThreadPoolExecutor(max_workers=len(download.segments))
+    try:
+        futures = [pool.submit(download.fetch, url, idx, progress) for idx in range(len(download.segments))]
+        error: Optional[BaseException] = None
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as exc:
+                # 通知其他分段尽快停下，保存进度后交给外层重试
+                download.failed.set()
+                error = error or exc
+        if error:
+            raise error
+    finally:
+        pool.shutdown(wait=True)
+        download.save()
+        progress.finish()
+    if hasher:
+        hasher.sync(size)
+    download.state_path.unlink()
+
+
+def _check_download(part_path: Path, hasher: Optional[_PartHasher], expected_sha256: str, expected_size: int) -> bool:
+    """下载结束后核对大小和边下载边计算的 SHA-256。"""
+    actual_size = part_path.stat().st_size
+    if expected_size and actual_size != expected_size:
+        print(f"文件校验失败：大小为 {actual_size} 字节，公告中为 {expected_size} 字节，已删除下载的文件。")
+        return False
+    if hasher:
+        hasher.sync(actual_size)
+        if hasher.hexdigest() != expected_sha256.lower():
+            print("文件校验失败：SHA-256 与公告不一致，文件可能已损坏，已删除下载的文件。")
+            return False
+    return True
+
+
+def download_file(url: str, dest_path: Path, show_progress: bool = True, retries: int = 5, backoff: float = 1.0,
+                  segments: int = 1, expected_sha256: str = "", expected_size: int = 0) -> bool:
+    """
+    从 URL 下载文件到指定路径，支持显示进度条和断点续传。
+
+    数据先写入同目录下的 <文件名>.part，下载完整后才重命名为目标文件；
+    连接中断时按指数退避自动重试，并用 Range 请求从断点继续。
+    segments 大于 1 且服务器支持 Range 时，把文件切成多段并发下载，否则退回单连接。
+    给出 expected_sha256 时边写入边计算摘要，下载结束后与其不符的文件会被直接删除。
     
     Args:
         url: 文件下载链接
         dest_path: 目标文件路径
         show_progress: 是否显示进度条
+        retries: 中断后的最大重试次数
+        backoff: 首次重试前的等待秒数，之后每次翻倍
+        segments: 并发连接数
+        expected_sha256: 公告给出的 SHA-256，为空时不校验
+        expected_size: 公告给出的文件大小，为 0 时不校验
     
     Returns:
-        True 表示下载成功，False 表示失败
+        True 表示下载成功，False 表示失败（.part 文件会保留，下次调用时续传）
     """
-    try:
-        response = requests.get(url, stream=True, timeout=30)
-        response.raise_for_status()
-        
-        total_size = int(response.headers.get('content-length', 0))
-        downloaded = 0
-        
-        # 确保目标目录存在
-        dest_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        with open(dest_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-                    downloaded += len(chunk)
-                    if show_progress and total_size > 0:
-                        _print_progress(downloaded, total_size)
-        
-        if show_progress and total_size > 0:
-            print()  # 换行
-        
-        return True
-    except requests.exceptions.RequestException as e:
-        print(f"下载失败: {e}")
-        return False
-    except Exception as e:
-        print(f"保存文件失败: {e}")
-        return False
\ No newline at end of file
+    part_path = dest_path.with_name(dest_path.name + ".part")
+    hasher = _PartHasher(part_path) if expected_sha256 else None
+    if expected_size and part_path.exists() and part_path.stat().st_size > expected_size:
+        # 比公告给出的大小还大，不可能是有效的断点
+        part_path.unlink()
+    attempt = 0
+    while True:
+        try:
+            # 确保目标目录存在
+            dest_path.parent.mkdir(parents=True, exist_ok=True)
+            # 单连接留下的 .part 没有分段状态，只能继续按单连接续传
+            state_path = _segment_state_path(part_path)
+            size = 0
+            if segments > 1 and (state_path.exists() or not part_path.exists()):
+                size = _probe_range_size(url)
+            if size >= segments * _MIN_SEGMENT_SIZE:
+                _download_segmented(url, part_path, size, segments, show_progress, hasher)
+            else:
+                if state_path.exists():
+                    # 预分配的分段文件不是有效前缀，不能按单连接续传
+                    state_path.unlink()
+                    part_path.unlink(missing_ok=True)
+                _download_to_part(url, part_path, show_progress, hasher)
+            if not _check_download(part_path, hasher, expected_sha256, expected_size):
+                part_path.unlink()
+                return False
+            part_path.replace(dest_path)
+            return True
+        except requests.exceptions.RequestException as e:
+            response = getattr(e, "response", None)
+            if response is not None and response.status_code < 500:
+                # 4xx 重试也不会有结果
+                print(f"下载失败: {e}")
+                return False
+            attempt += 1
+            if attempt > retries:
+                print(f"\n下载失败: {e}")
+                return False
+            delay = backoff * (2 ** (attempt - 1))
+            print(f"\n下载中断（{e}），{delay:.0f} 秒后进行第 {attempt}/{retries} 次重试...")
+            time.sleep(delay)
+        except Exception as e:
+            print(f"保存文件失败: {e}")
+            return False
@@ -0,0 +1,170 @@
+"""测试用的本地 HTTP 替身：支持 Range 请求和 ETag 条件请求，可注入连接中断。"""
+
+import re
+import socket
+import sys
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    """客户端提前断开连接（如只读取响应头）属于正常情况，不打印异常。"""
+
+    def handle_error(self, request, client_address) -> None:
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class RangeHTTPServer:
+    """在 127.0.0.1 随机端口上提供内存中的文件。
+
+    Args:
+        files: {路径（不含前导 /）: 内容}
+        support_ranges: 是否响应 Range 请求（False 时总是返回完整内容）
+        drop_after: 每次响应最多发送的字节数，之后直接断开连接
+        drop_times: 前多少次 GET 请求会被中途断开
+        head_status: 不为 None 时 HEAD 请求一律返回该状态码（模拟拒绝 HEAD 的服务器）
+    """
+
+    def __init__(self, files: Dict[str, bytes], support_ranges: bool = True,
+                 drop_after: Optional[int] = None, drop_times: int = 0,
+                 head_status: Optional[int] = None) -> None:
+        self.files = files
+        self.support_ranges = support_ranges
+        self.drop_after = drop_after
+        self.drop_times = drop_times
+        self.head_status = head_status
+        # 每个请求记录 (方法, 路径, Range 头)
+        self.requests: List[Tuple[str, str, Optional[str]]] = []
+        # 客户端连接的 (地址, 端口)，用于观察连接复用
+        self.connections = set()
+        self._sockets = set()
+        self._lock = threading.Lock()
+        self._server = _QuietHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def url(self, name: str) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/{name}"
+
+    def __enter__(self) -> "RangeHTTPServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        # 同时断开 keep-alive 连接，模拟服务器彻底下线
+        with self._lock:
+            for sock in self._sockets:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def _make_handler(self):
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # keep-alive 下头部和正文分两次发送，关闭 Nagle 避免与延迟 ACK 叠加
+            disable_nagle_algorithm = True
+
+            def setup(self) -> None:
+                super().setup()
+                with owner._lock:
+                    owner._sockets.add(self.connection)
+
+            def log_message(self, format, *args) -> None:  # noqa: A002 - 保持基类签名
+                pass
+
+            def _resolve(self) -> Optional[bytes]:
+                with owner._lock:
+                    owner.requests.append((self.command, self.path, self.headers.get("Range")))
+                    owner.connections.add(self.client_address)
+                data = owner.files.get(self.path.lstrip("/"))
+                if data is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                return data
+
+            def _byte_range(self, size: int) -> Optional[Tuple[int, int]]:
+                header = self.headers.get("Range")
+                if not owner.support_ranges or not header:
+                    return None
+                match = _RANGE_RE.fullmatch(header.strip())
+                if not match:
+                    return None
+                first, last = match.groups()
+                if not first:
+                    # bytes=-N：文件末尾 N 字节
+                    start, end = max(0, size - int(last)), size - 1
+                else:
+                    start, end = int(first), min(int(last), size - 1) if last else size - 1
+                return start, end
+
+            def _send_headers(self, data: bytes) -> Tuple[int, int]:
+                size = len(data)
+                etag = f'"{zlib.crc32(data):08x}-{size}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return 0, -1
+                byte_range = self._byte_range(size)
+                if byte_range and byte_range[0] >= size:
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{size}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return 0, -1
+                if byte_range:
+                    start, end = byte_range
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+                else:
+                    start, end = 0, size - 1
+                    self.send_response(200)
+                if owner.support_ranges:
+                    self.send_header("Accept-Ranges", "bytes")
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(end - start + 1))
+                self.end_headers()
+                return start, end
+
+            def do_HEAD(self) -> None:
+                if owner.head_status is not None:
+                    with owner._lock:
+                        owner.requests.append((self.command, self.path, self.headers.get("Range")))
+                    self.send_response(owner.head_status)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                data = self._resolve()
+                if data is not None:
+                    self._send_headers(data)
+
+            def do_GET(self) -> None:
+                data = self._resolve()
+                if data is None:
+                    return
+                start, end = self._send_headers(data)
+                body = data[start:end + 1]
+                with owner._lock:
+                    drop = owner.drop_after is not None and owner.drop_times > 0
+                    if drop:
+                        owner.drop_times -= 1
+                if drop and len(body) > owner.drop_after:
+                    self.wfile.write(body[:owner.drop_after])
+                    self.wfile.flush()
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+        return Handler
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""测试公告缓存：TTL 内不联网、过期后条件请求、离线时返回旧缓存（使用本地 HTTP 替身）。"""
+
+import json
+import tempfile
+import threading
+import time
+from pathlib import Path
+import sys
+
+# 添加项目根目录和 test 目录到路径
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from range_http_server import RangeHTTPServer
+from scripts import announcement
+
+ANNOUNCEMENT = {"latest_version": "1.2", "content": "官方交流群"}
+
+
+def _reset_cache(cache_file: Path, url: str, ttl: float) -> None:
+    """把公告模块指向临时缓存文件和本地替身，并清空内存缓存。"""
+    announcement._CACHE_FILE = cache_file
+    announcement.ANNOUNCEMENT_URL = url
+    announcement.CACHE_TTL = ttl
+    announcement._cache = None
+    announcement._last_attempt = 0.0
+
+
+def test_cache_and_revalidation():
+    """测试 TTL 内复用缓存，过期后使用 ETag 重新验证。"""
+    print("=" * 60)
+    print("测试 1: TTL 缓存与条件请求")
+    print("=" * 60)
+
+    payload = json.dumps(ANNOUNCEMENT, ensure_ascii=False).encode("utf-8")
+    with tempfile.TemporaryDirectory() as tmpdir, \
+            RangeHTTPServer({"announcement.json": payload}) as server:
+        cache_file = Path(tmpdir) / "announcement_cache.json"
+        _reset_cache(cache_file, server.url("announcement.json"), ttl=300)
+
+        for _ in range(5):
+            ann = announcement.get_announcement()
+            assert ann["success"] and ann["data"] == ANNOUNCEMENT
+        assert len(server.requests) == 1, f"TTL 内应只联网一次，实际 {len(server.requests)} 次"
+        assert cache_file.exists(), "公告应持久化到磁盘"
+        print("[OK] TTL 内只联网一次")
+
+        # 模拟重新启动：内存缓存清空，磁盘缓存已过期
+        _reset_cache(cache_file, server.url("announcement.json"), ttl=0)
+        ann = announcement.get_announcement()
+        assert ann["success"] and ann["data"] == ANNOUNCEMENT
+        assert len(server.requests) == 2, "过期后应重新验证一次"
+        print("[OK] 过期后通过 ETag 条件请求重新验证")
+
+
+def test_offline_serves_stale_copy():
+    """测试网络不可用时返回旧缓存。"""
+    print("\n" + "=" * 60)
+    print("测试 2: 离线时返回旧缓存")
+    print("=" * 60)
+
+    payload = json.dumps(ANNOUNCEMENT, ensure_ascii=False).encode("utf-8")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache_file = Path(tmpdir) / "announcement_cache.json"
+        with RangeHTTPServer({"announcement.json": payload}) as server:
+            url = server.url("announcement.json")
+            _reset_cache(cache_file, url, ttl=300)
+            assert announcement.get_announcement()["success"]
+
+        # 服务器已关闭，磁盘缓存已过期
+        _reset_cache(cache_file, url, ttl=0)
+        ann = announcement.get_announcement()
+        assert ann["success"] and ann.get("stale"), "离线时应返回旧缓存"
+        assert ann["data"] == ANNOUNCEMENT
+        print("[OK] 离线时返回旧缓存")
+
+
+def test_background_refresh_does_not_block():
+    """测试菜单读取公告不等待网络，后台刷新完成后下一次读取拿到新内容。"""
+    print("\n" + "=" * 60)
+    print("测试 3: 后台刷新公告")
+    print("=" * 60)
+
+    payload = json.dumps(ANNOUNCEMENT, ensure_ascii=False).encode("utf-8")
+    with tempfile.TemporaryDirectory() as tmpdir, \
+            RangeHTTPServer({"announcement.json": payload}) as server:
+        _reset_cache(Path(tmpdir) / "announcement_cache.json", server.url("announcement.json"), ttl=300)
+
+        started = time.perf_counter()
+        first = announcement.peek_announcement()
+        announcement.refresh_in_background()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        assert not first["success"], "首次启动还没有缓存"
+        assert elapsed_ms < 50, f"读取缓存公告应立即返回，实际 {elapsed_ms:.1f} ms"
+
+        announcement._refresh_thread.join(timeout=10)
+        second = announcement.peek_announcement()
+        assert second["success"] and second["data"] == ANNOUNCEMENT, "后台刷新后应显示新内容"
+        print(f"[OK] 菜单读取耗时 {elapsed_ms:.2f} ms，后台刷新后显示新公告")
+
+
+def test_fetch_runs_outside_lock():
+    """测试联网期间不持有缓存锁，同时读取公告的线程等待同一次请求的结果。"""
+    print("\n" + "=" * 60)
+    print("测试 4: 联网时不持有缓存锁")
+    print("=" * 60)
+
+    payload = json.dumps(ANNOUNCEMENT, ensure_ascii=False).encode("utf-8")
+    original_fetch = announcement._fetch
+    entered = threading.Event()
+    release = threading.Event()
+
+    def _slow_fetch(cached):
+        entered.set()
+        assert release.wait(10)
+        return original_fetch(cached)
+
+    with tempfile.TemporaryDirectory() as tmpdir, \
+            RangeHTTPServer({"announcement.json": payload}) as server:
+        _reset_cache(Path(tmpdir) / "announcement_cache.json", server.url("announcement.json"), ttl=300)
+        results = []
+        announcement._fetch = _slow_fetch
+        try:
+            threads = [threading.Thread(target=lambda: results.append(announcement.get_announcement()))
+                       for _ in range(3)]
+            threads[0].start()
+            assert entered.wait(10), "后台线程未开始联网"
+            for thread in threads[1:]:
+                thread.start()
+            assert announcement._cache_lock.acquire(timeout=1), "联网期间不应持有缓存锁"
+            announcement._cache_lock.release()
+            release.set()
+            for thread in threads:
+                thread.join(timeout=10)
+        finally:
+            announcement._fetch = original_fetch
+
+        assert len(results) == 3 and all(ann["success"] and ann["data"] == ANNOUNCEMENT for ann in results), results
+        assert len(server.requests) == 1, f"同时读取应只联网一次，实际 {len(server.requests)} 次"
+        print("[OK] 联网期间缓存锁可用，同时读取的线程共用一次请求")
+
+
+if __name__ == "__main__":
+    try:
+        test_cache_and_revalidation()
+        test_offline_serves_stale_copy()
+        test_background_refresh_does_not_block()
+        test_fetch_runs_outside_lock()
+        print("\n" + "=" * 60)
+        print("[PASS] 所有测试通过！")
+        print("=" * 60)
+    except AssertionError as e:
+        print(f"\n[FAIL] 测试失败: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n[ERROR] 测试出错: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
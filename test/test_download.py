@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""测试 utils.download_file 断点续传的单元测试（使用本地 HTTP 替身）。"""
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+import sys
+
+# 添加项目根目录和 test 目录到路径
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from range_http_server import RangeHTTPServer
+from scripts.utils import download_file, verify_file
+
+PAYLOAD = os.urandom(300 * 1024)
+
+
+def test_resume_after_dropped_connections():
+    """测试连接多次中断后通过 Range 请求续传完成。"""
+    print("=" * 60)
+    print("测试 1: 中断后断点续传")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir, \
+            RangeHTTPServer({"server.zip": PAYLOAD}, drop_after=100 * 1024, drop_times=2) as server:
+        dest = Path(tmpdir) / "server.zip"
+        assert download_file(server.url("server.zip"), dest, show_progress=False, backoff=0)
+        assert dest.read_bytes() == PAYLOAD, "续传后的文件内容应完整一致"
+        assert not dest.with_name("server.zip.part").exists(), ".part 文件应在完成后被重命名"
+        ranges = [header for _, _, header in server.requests]
+        assert len(ranges) == 3 and ranges[0] is None, f"续传请求不符合预期: {ranges}"
+        offsets = [int(header[len("bytes="):-1]) for header in ranges[1:]]
+        assert 0 < offsets[0] < offsets[1], f"续传应从已下载的位置继续: {ranges}"
+        print("[OK] 两次中断后续传完成")
+
+
+def test_failed_download_keeps_part_file():
+    """测试重试耗尽时只保留 .part 文件，下次调用可以继续。"""
+    print("\n" + "=" * 60)
+    print("测试 2: 失败时保留 .part 文件")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir, \
+            RangeHTTPServer({"mod.zip": PAYLOAD}, drop_after=80 * 1024, drop_times=3) as server:
+        dest = Path(tmpdir) / "mod.zip"
+        assert not download_file(server.url("mod.zip"), dest, show_progress=False, retries=2, backoff=0)
+        part = dest.with_name("mod.zip.part")
+        assert not dest.exists(), "未完成的下载不应出现目标文件"
+        assert part.stat().st_size > 0, "应保留已接收的数据"
+
+        assert download_file(server.url("mod.zip"), dest, show_progress=False, backoff=0)
+        assert dest.read_bytes() == PAYLOAD
+        print("[OK] 再次调用时从 .part 继续下载完成")
+
+
+def test_server_without_range_support():
+    """测试服务器不支持 Range 时从头重新下载。"""
+    print("\n" + "=" * 60)
+    print("测试 3: 服务器不支持 Range")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir, \
+            RangeHTTPServer({"a.zip": PAYLOAD}, support_ranges=False, drop_after=1024, drop_times=1) as server:
+        dest = Path(tmpdir) / "a.zip"
+        assert download_file(server.url("a.zip"), dest, show_progress=False, backoff=0)
+        assert dest.read_bytes() == PAYLOAD, "不支持 Range 时应从头覆盖写入"
+        print("[OK] 回退为完整下载")
+
+
+BIG_PAYLOAD = os.urandom(6 * 1024 * 1024)
+
+
+def test_segmented_download():
+    """测试分段下载：多个 Range 请求并发拼出完整文件，中断的分段会续传。"""
+    print("\n" + "=" * 60)
+    print("测试 4: 分段并发下载")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir, \
+            RangeHTTPServer({"big.zip": BIG_PAYLOAD}, drop_after=512 * 1024, drop_times=2) as server:
+        dest = Path(tmpdir) / "big.zip"
+        assert download_file(server.url("big.zip"), dest, show_progress=False, backoff=0, segments=4)
+        assert dest.read_bytes() == BIG_PAYLOAD, "分段下载后的文件内容应完整一致"
+        assert not dest.with_name("big.zip.part.json").exists(), "完成后应删除分段状态文件"
+        starts = {header for method, _, header in server.requests if method == "GET"}
+        assert {"bytes=0-1572863", "bytes=1572864-3145727"} <= starts, f"应按分段发起 Range 请求: {starts}"
+        print(f"[OK] 分段下载完成，共 {len(server.requests)} 个请求")
+
+
+def test_segmented_falls_back_without_ranges():
+    """测试服务器不支持 Range 时分段模式退回单连接。"""
+    print("\n" + "=" * 60)
+    print("测试 5: 分段模式回退单连接")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir, \
+            RangeHTTPServer({"big.zip": BIG_PAYLOAD}, support_ranges=False) as server:
+        dest = Path(tmpdir) / "big.zip"
+        assert download_file(server.url("big.zip"), dest, show_progress=False, backoff=0, segments=4)
+        assert dest.read_bytes() == BIG_PAYLOAD
+        gets = [header for method, _, header in server.requests if method == "GET"]
+        assert gets == [None], f"应只发起一次完整下载: {gets}"
+        print("[OK] 回退为单连接下载")
+
+        # 拒绝 HEAD 的服务器：探测失败不算下载失败
+        for status in (403, 405):
+            with RangeHTTPServer({"big.zip": BIG_PAYLOAD}, head_status=status) as strict:
+                dest = Path(tmpdir) / f"head-{status}.zip"
+                assert download_file(strict.url("big.zip"), dest, show_progress=False, backoff=0, segments=4), \
+                    f"HEAD 返回 {status} 时应退回单连接下载"
+                assert dest.read_bytes() == BIG_PAYLOAD
+                gets = [header for method, _, header in strict.requests if method == "GET"]
+                assert gets == [None], f"应只发起一次完整下载: {gets}"
+        print("[OK] HEAD 被拒绝时回退为单连接下载")
+
+
+def test_sha256_verified_while_downloading():
+    """测试边下载边计算 SHA-256：续传和分段模式下摘要正确，不一致时删除文件。"""
+    print("\n" + "=" * 60)
+    print("测试 6: SHA-256 校验")
+    print("=" * 60)
+
+    small_sha = hashlib.sha256(PAYLOAD).hexdigest()
+    big_sha = hashlib.sha256(BIG_PAYLOAD).hexdigest()
+    with tempfile.TemporaryDirectory() as tmpdir, \
+            RangeHTTPServer({"a.zip": PAYLOAD, "big.zip": BIG_PAYLOAD},
+                            drop_after=100 * 1024, drop_times=1) as server:
+        tmp = Path(tmpdir)
+        # 单连接：中途断开后续传，摘要要包含续传前已写入的部分
+        dest = tmp / "a.zip"
+        assert not download_file(server.url("a.zip"), dest, show_progress=False, retries=0,
+                                 expected_sha256=small_sha)
+        server.drop_times = 1
+        assert download_file(server.url("a.zip"), dest, show_progress=False, backoff=0,
+                             expected_sha256=small_sha.upper(), expected_size=len(PAYLOAD))
+        assert verify_file(dest, small_sha, len(PAYLOAD)), "下载后的文件应通过校验"
+
+        # 分段：各段乱序完成，摘要仍按文件顺序计算
+        server.drop_after = 512 * 1024
+        server.drop_times = 2
+        big = tmp / "big.zip"
+        assert download_file(server.url("big.zip"), big, show_progress=False, backoff=0, segments=4,
+                             expected_sha256=big_sha)
+        assert big.read_bytes() == BIG_PAYLOAD
+
+        bad = tmp / "bad.zip"
+        assert not download_file(server.url("big.zip"), bad, show_progress=False, segments=4,
+                                 expected_sha256="0" * 64)
+        assert not bad.exists() and not bad.with_name("bad.zip.part").exists(), "校验失败的文件应被删除"
+        assert not download_file(server.url("a.zip"), bad, show_progress=False, expected_size=len(PAYLOAD) + 1)
+        assert not verify_file(big, small_sha), "内容不同的文件不应通过校验"
+        print("[OK] SHA-256 与大小校验正确")
+
+
+if __name__ == "__main__":
+    try:
+        test_resume_after_dropped_connections()
+        test_failed_download_keeps_part_file()
+        test_server_without_range_support()
+        test_segmented_download()
+        test_segmented_falls_back_without_ranges()
+        test_sha256_verified_while_downloading()
+        print("\n" + "=" * 60)
+        print("[PASS] 所有测试通过！")
+        print("=" * 60)
+    except AssertionError as e:
+        print(f"\n[FAIL] 测试失败: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n[ERROR] 测试出错: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""测试 utils.extract_zip 解压功能的单元测试。"""
+
+import json
+import tempfile
+import zipfile
+from pathlib import Path
+import sys
+
+# 添加项目根目录和 test 目录到路径
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from zip_fixtures import make_zip
+from scripts import utils
+from scripts.config import MANIFEST_FILE
+from scripts.manifest import load_manifest, record_mod_installation
+from scripts.utils import extract_zip, iter_extract_zip, load_zip_index, zip_entry_map
+
+
+SAMPLE_ENTRIES = {
+    "SPT/": None,
+    "SPT/SPT.Server.exe": b"server" * 1000,
+    "SPT/SPT_Data/configs/http.json": b'{"port": 6969}',
+    "SPT/user/mods/": None,
+    "SPT/big.bundle": bytes(range(256)) * 4096,
+    "SPT/../evil.txt": b"should be skipped",
+}
+
+
+def test_sequential_extract():
+    """测试单线程解压：去除顶层目录并过滤 .. 条目。"""
+    print("=" * 60)
+    print("测试 1: 单线程解压")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        zip_path = tmp / "server.zip"
+        make_zip(zip_path, SAMPLE_ENTRIES)
+        target = tmp / "install"
+
+        files = extract_zip(zip_path, target, strip_common_root=True)
+        expected = [
+            str(Path("SPT.Server.exe")),
+            str(Path("SPT_Data/configs/http.json")),
+            str(Path("big.bundle")),
+        ]
+        assert files == expected, f"期望 {expected}，得到 {files}"
+        assert (target / "user" / "mods").is_dir(), "目录条目应被创建"
+        assert not (tmp / "evil.txt").exists(), ".. 条目不应被解压"
+        assert (target / "big.bundle").read_bytes() == SAMPLE_ENTRIES["SPT/big.bundle"]
+        print("[OK] 单线程解压结果正确")
+
+
+def test_parallel_extract_matches_sequential():
+    """测试多线程解压与单线程解压结果一致。"""
+    print("\n" + "=" * 60)
+    print("测试 2: 多线程解压")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        entries = dict(SAMPLE_ENTRIES)
+        for idx in range(200):
+            entries[f"SPT/BepInEx/plugins/mod{idx % 7}/file{idx}.dll"] = f"payload-{idx}".encode() * (idx + 1)
+        zip_path = tmp / "client.zip"
+        make_zip(zip_path, entries)
+
+        sequential = extract_zip(zip_path, tmp / "seq", strip_common_root=False)
+        parallel = extract_zip(zip_path, tmp / "par", strip_common_root=False, workers=4)
+        assert parallel == sequential, "多线程返回的文件列表应与单线程一致（保持压缩包顺序）"
+        for rel in sequential:
+            assert (tmp / "par" / rel).read_bytes() == (tmp / "seq" / rel).read_bytes(), f"{rel} 内容不一致"
+        print(f"[OK] 多线程解压 {len(parallel)} 个文件，与单线程一致")
+
+
+def test_incremental_extract_skips_unchanged():
+    """测试增量解压：未变化的文件不重写，被改动的文件恢复原内容。"""
+    print("\n" + "=" * 60)
+    print("测试 3: 增量解压")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        zip_path = tmp / "server.zip"
+        make_zip(zip_path, SAMPLE_ENTRIES)
+        target = tmp / "install"
+        first = extract_zip(zip_path, target, strip_common_root=True)
+
+        unchanged = target / "big.bundle"
+        before = unchanged.stat().st_mtime_ns
+        # 同样大小但内容不同，必须通过 CRC 才能发现
+        tampered = target / "SPT.Server.exe"
+        tampered.write_bytes(b"x" * len(SAMPLE_ENTRIES["SPT/SPT.Server.exe"]))
+
+        for workers in (1, 4):
+            second = extract_zip(zip_path, target, strip_common_root=True, workers=workers, incremental=True)
+            assert second == first, "增量模式返回的文件列表应包含跳过的文件"
+        assert unchanged.stat().st_mtime_ns == before, "未变化的文件不应被重写"
+        assert tampered.read_bytes() == SAMPLE_ENTRIES["SPT/SPT.Server.exe"], "内容不同的文件应被重写"
+        print("[OK] 增量解压只重写了变化的文件")
+
+
+
+def test_zip_index_sidecar():
+    """测试中央目录索引：首次生成索引文件，之后不再打开压缩包，压缩包变化后重新生成。"""
+    print("\n" + "=" * 60)
+    print("测试 4: 中央目录索引文件")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        zip_path = tmp / "server.zip"
+        make_zip(zip_path, SAMPLE_ENTRIES)
+        index = load_zip_index(zip_path)
+        sidecar = tmp / "server.zip.index.json"
+        assert sidecar.exists(), "应在压缩包旁生成索引文件"
+        assert index.common_root == "SPT"
+        assert index.total_bytes == sum(len(v) for v in SAMPLE_ENTRIES.values() if v is not None)
+
+        original = utils.zipfile.ZipFile
+        opened = []
+
+        def _counting(file, mode="r", *args, **kwargs):
+            if mode == "r":
+                opened.append(file)
+            return original(file, mode, *args, **kwargs)
+
+        utils.zipfile.ZipFile = _counting
+        try:
+            entries = zip_entry_map(zip_path, strip_common_root=True)
+            assert not opened, "索引有效时列出条目不应打开压缩包"
+            assert entries["big.bundle"][1] == len(SAMPLE_ENTRIES["SPT/big.bundle"])
+            assert "../evil.txt" not in entries and "SPT.Server.exe" in entries
+
+            # 压缩包被替换后索引失效
+            make_zip(zip_path, {"other/readme.txt": b"new"})
+            assert list(zip_entry_map(zip_path, strip_common_root=True)) == ["readme.txt"]
+            assert len(opened) == 1, "压缩包变化后应重新解析一次中央目录"
+        finally:
+            utils.zipfile.ZipFile = original
+        print("[OK] 索引文件按大小和修改时间复用")
+
+
+def test_stored_fast_path():
+    """测试未压缩条目的快速复制：内核复制与内存映射两种方式结果一致，数据损坏时 CRC 校验失败。"""
+    print("\n" + "=" * 60)
+    print("测试 5: 未压缩条目快速复制")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        zip_path = tmp / "client.zip"
+        payload = bytes(range(256)) * 40000
+        with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_STORED) as archive:
+            archive.writestr("Data/big.bundle", payload)
+            archive.writestr("Data/empty.bundle", b"")
+            archive.writestr("Data/packed.txt", b"text" * 1000, compress_type=zipfile.ZIP_DEFLATED)
+
+        calls = []
+        original_copy_stored = utils._copy_stored
+
+        def _tracking(archive, info, destination, progress):
+            used = original_copy_stored(archive, info, destination, progress)
+            calls.append((info.filename, used))
+            return used
+
+        original_kernel_copy = utils._kernel_copy
+        utils._copy_stored = _tracking
+        try:
+            extract_zip(zip_path, tmp / "kernel")
+            # 模拟 Windows：没有 copy_file_range / sendfile 时使用内存映射
+            utils._kernel_copy = lambda *args: False
+            extract_zip(zip_path, tmp / "mmap", workers=2)
+        finally:
+            utils._copy_stored = original_copy_stored
+            utils._kernel_copy = original_kernel_copy
+        for name in ("kernel", "mmap"):
+            assert (tmp / name / "Data" / "big.bundle").read_bytes() == payload, f"{name} 方式内容不一致"
+            assert (tmp / name / "Data" / "empty.bundle").read_bytes() == b""
+            assert (tmp / name / "Data" / "packed.txt").read_bytes() == b"text" * 1000
+        assert ("Data/big.bundle", True) in calls and ("Data/packed.txt", False) in calls, f"{calls}"
+
+        # 篡改未压缩数据（长度不变），CRC 校验应失败
+        data = bytearray(zip_path.read_bytes())
+        start = data.find(payload[:1024])
+        data[start + 5000] ^= 0xFF
+        zip_path.write_bytes(bytes(data))
+        for use_kernel in (True, False):
+            if not use_kernel:
+                utils._kernel_copy = lambda *args: False
+            try:
+                extract_zip(zip_path, tmp / f"corrupt-{use_kernel}")
+                raise AssertionError("损坏的条目应校验失败")
+            except Exception as exc:
+                assert "CRC" in str(exc), f"应提示 CRC 校验失败: {exc}"
+            finally:
+                utils._kernel_copy = original_kernel_copy
+        print("[OK] 未压缩条目绕过 zipfile 读写，结果一致且校验 CRC")
+
+
+def test_iter_extract_streams_results():
+    """测试流式解压：逐个产出结果，增量模式标记跳过的文件，结果可直接交给标记文件记录。"""
+    print("\n" + "=" * 60)
+    print("测试 6: 流式解压接口")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        zip_path = tmp / "mod.zip"
+        make_zip(zip_path, SAMPLE_ENTRIES)
+        target = tmp / "install"
+
+        results = iter_extract_zip(zip_path, target, strip_common_root=True)
+        first = next(results)
+        assert first.path == "SPT.Server.exe" and first.written, f"第一个结果不正确: {first}"
+        assert not (target / "big.bundle").exists(), "单线程时应在产出结果的同时逐个解压"
+        rest = list(results)
+        assert [entry.path for entry in rest] == ["SPT_Data/configs/http.json", "big.bundle"]
+        assert (target / "user" / "mods").is_dir(), "目录条目应被创建"
+
+        (target / "big.bundle").write_bytes(b"changed")
+        entries = {entry.path: entry for entry in iter_extract_zip(zip_path, target, strip_common_root=True,
+                                                                   incremental=True, workers=2)}
+        assert entries["big.bundle"].written and not entries["SPT.Server.exe"].written, "增量模式应标记跳过的文件"
+        assert entries["big.bundle"].crc == zip_entry_map(zip_path, True)["big.bundle"][0]
+
+        # 标记文件记录直接消费生成器
+        (target / MANIFEST_FILE).write_text(json.dumps({"version": "4.0"}), encoding="utf-8")
+        files = (str(Path(entry.path)) for entry in iter_extract_zip(zip_path, tmp / "other", strip_common_root=True))
+        record_mod_installation("1.0", "4.0", target, "TestMod", files)
+        record = load_manifest(target)["mods"]["TestMod"]
+        assert record["files"] == [str(Path("SPT.Server.exe")), str(Path("SPT_Data/configs/http.json")), "big.bundle"]
+        assert record["directories"] == [str(Path("SPT_Data/configs"))]
+        assert (tmp / "other" / "big.bundle").exists(), "记录时应完成解压"
+        print("[OK] 流式解压逐个产出结果")
+
+
+if __name__ == "__main__":
+    try:
+        test_sequential_extract()
+        test_parallel_extract_matches_sequential()
+        test_incremental_extract_skips_unchanged()
+        test_zip_index_sidecar()
+        test_stored_fast_path()
+        test_iter_extract_streams_results()
+        print("\n" + "=" * 60)
+        print("[PASS] 所有测试通过！")
+        print("=" * 60)
+    except AssertionError as e:
+        print(f"\n[FAIL] 测试失败: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n[ERROR] 测试出错: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
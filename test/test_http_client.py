@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""测试共享 HTTP 会话的连接复用，并对比逐次新建连接的耗时（使用本地 HTTP 替身）。"""
+
+import socket
+import time
+from pathlib import Path
+import sys
+
+import requests
+
+# 添加项目根目录和 test 目录到路径
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from range_http_server import RangeHTTPServer
+from scripts import http_client
+
+REQUEST_COUNT = 50
+
+
+def test_shared_session_reuses_connection():
+    """测试多次请求同一主机只建立一个连接。"""
+    print("=" * 60)
+    print("测试 1: 共享会话连接复用")
+    print("=" * 60)
+
+    with RangeHTTPServer({"announcement.json": b'{"content": "hi"}'}) as server:
+        url = server.url("announcement.json")
+
+        started = time.perf_counter()
+        for _ in range(REQUEST_COUNT):
+            requests.get(url, timeout=10).raise_for_status()
+        plain_elapsed = time.perf_counter() - started
+        plain_connections = len(server.connections)
+
+        server.connections.clear()
+        started = time.perf_counter()
+        for _ in range(REQUEST_COUNT):
+            http_client.get(url).raise_for_status()
+        pooled_elapsed = time.perf_counter() - started
+        pooled_connections = len(server.connections)
+
+    print(f"requests.get:     {REQUEST_COUNT} 次请求，{plain_connections} 个连接，{plain_elapsed * 1000:.1f} ms")
+    print(f"http_client.get:  {REQUEST_COUNT} 次请求，{pooled_connections} 个连接，{pooled_elapsed * 1000:.1f} ms")
+    assert plain_connections == REQUEST_COUNT, "模块级 requests.get 每次都会新建连接"
+    assert pooled_connections == 1, f"共享会话应复用同一个连接，实际 {pooled_connections} 个"
+    print("[OK] 共享会话复用了连接")
+
+
+def test_quick_request_fails_fast_offline():
+    """测试 get_quick 连接失败时不重试，立即抛出异常。"""
+    print("\n" + "=" * 60)
+    print("测试 2: 连接失败不重试的请求")
+    print("=" * 60)
+
+    # 取一个空闲端口后关闭，连接会被拒绝
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        url = f"http://127.0.0.1:{probe.getsockname()[1]}/announcement.json"
+
+    assert http_client.get_session(connect_retries=0).get_adapter(url).max_retries.connect == 0
+    assert http_client.get_session().get_adapter(url).max_retries.connect == 3, "普通请求仍应重试连接"
+    started = time.perf_counter()
+    try:
+        http_client.get_quick(url)
+    except requests.exceptions.ConnectionError:
+        pass
+    else:
+        raise AssertionError("连接被拒绝时应抛出 ConnectionError")
+    elapsed = time.perf_counter() - started
+    assert elapsed < 1, f"连接失败不应重试等待，实际耗时 {elapsed:.1f} 秒"
+    print(f"[OK] 连接失败 {elapsed * 1000:.1f} ms 内返回")
+
+
+if __name__ == "__main__":
+    try:
+        test_shared_session_reuses_connection()
+        test_quick_request_fails_fast_offline()
+        print("\n" + "=" * 60)
+        print("[PASS] 所有测试通过！")
+        print("=" * 60)
+    except AssertionError as e:
+        print(f"\n[FAIL] 测试失败: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n[ERROR] 测试出错: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
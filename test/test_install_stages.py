@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""测试自动安装的并发阶段：结果与顺序安装一致，重名文件按原顺序覆盖。"""
+
+import contextlib
+import io
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import sys
+
+# 添加项目根目录和 test 目录到路径
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from zip_fixtures import make_zip, snapshot
+from scripts import config, installers, utils
+from scripts.config import GameVersion
+from scripts.install_journal import InstallJournal, journal_path, pending_install_version
+
+CLIENT_ENTRIES = {
+    "EscapeFromTarkov.exe": b"client" * 10000,
+    "BepInEx/config/BepInEx.cfg": b"[Logging]\nEnabled = true\n",
+    "BepInEx/plugins/spt/spt-core.dll": b"client-side core",
+}
+SERVER_ENTRIES = {
+    "SPT/SPT.Server.exe": b"server" * 10000,
+    "SPT/SPT_Data/configs/http.json": b'{"port": 6969}',
+    # 与客户端重名：顺序安装时服务端后写入，应保留服务端版本
+    "SPT/BepInEx/plugins/spt/spt-core.dll": b"patched core from server zip",
+}
+
+
+def test_concurrent_matches_sequential():
+    """测试并发安装与顺序安装得到相同的目录内容。"""
+    print("=" * 60)
+    print("测试 1: 并发安装阶段")
+    print("=" * 60)
+
+    original_required = config.REQUIRED_DIR
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        client_zip = tmp / "client.zip"
+        server_zip = tmp / "server.zip"
+        make_zip(client_zip, CLIENT_ENTRIES)
+        make_zip(server_zip, SERVER_ENTRIES)
+        required = tmp / "required_src"
+        (required / "dotnet").mkdir(parents=True)
+        (required / "dotnet" / "runtime.exe").write_bytes(b"runtime" * 1000)
+        config.REQUIRED_DIR = required
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                sequential = installers._install_sequentially(tmp / "seq", client_zip, server_zip)
+                concurrent = installers._install_concurrently(tmp / "con", client_zip, server_zip)
+        finally:
+            config.REQUIRED_DIR = original_required
+
+        expected = snapshot(tmp / "seq")
+        assert snapshot(tmp / "con") == expected, "并发安装的结果应与顺序安装一致"
+        assert expected["BepInEx/plugins/spt/spt-core.dll"] == b"patched core from server zip"
+        assert set(concurrent) == set(sequential) == {"客户端", "服务端", "required"}, concurrent
+        print("[OK] 并发安装结果一致，重名文件保留服务端版本")
+
+
+
+def test_resume_after_interruption():
+    """测试安装中断后，续装只写入日志中未完成的文件。"""
+    print("\n" + "=" * 60)
+    print("测试 2: 中断后继续安装")
+    print("=" * 60)
+
+    original_required = config.REQUIRED_DIR
+    original_workers = config.EXTRACT_WORKERS
+    original_write = utils._write_entry
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        client_entries = {f"EscapeFromTarkov_Data/file{idx}.assets": f"asset-{idx}".encode() * 100
+                          for idx in range(40)}
+        client_zip = tmp / "client.zip"
+        server_zip = tmp / "server.zip"
+        make_zip(client_zip, client_entries)
+        make_zip(server_zip, SERVER_ENTRIES)
+        config.REQUIRED_DIR = tmp / "no_required"
+        config.EXTRACT_WORKERS = 1
+        version = GameVersion(label="4.0.5", server_zip="server.zip", client_zip="client.zip")
+        install = tmp / "install"
+        written = []
+
+        def _crashing(archive, info, destination, *args, **kwargs):
+            if len(written) == 25:
+                raise KeyboardInterrupt("用户关闭了窗口")
+            written.append(info.filename)
+            return original_write(archive, info, destination, *args, **kwargs)
+
+        try:
+            utils._write_entry = _crashing
+            journal = InstallJournal.open(install, version)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    installers._install_sequentially(install, client_zip, server_zip, journal)
+            except KeyboardInterrupt:
+                pass
+            journal.close()
+            # 模拟进程被强制结束时写了一半的最后一行
+            with journal_path(install).open("a", encoding="utf-8") as f:
+                f.write('{"type": "files", "stage": "cli')
+            assert pending_install_version(install) == "4.0.5", "中断后应能识别未完成的安装"
+
+            written.clear()
+            journal = InstallJournal.open(install, version)
+            assert len(journal.completed("client")) == 25, "已写完的文件应全部记录在日志中"
+            with contextlib.redirect_stdout(io.StringIO()):
+                installers._install_sequentially(install, client_zip, server_zip, journal)
+            journal.remove()
+        finally:
+            utils._write_entry = original_write
+            config.REQUIRED_DIR = original_required
+            config.EXTRACT_WORKERS = original_workers
+
+        assert len(written) == 15 + len(SERVER_ENTRIES), f"续装应只写入未完成的文件，实际写入 {len(written)} 个"
+        for name, content in client_entries.items():
+            assert (install / name).read_bytes() == content, f"{name} 内容不完整"
+        assert (install / "SPT.Server.exe").exists()
+        assert not journal_path(install).exists(), "安装完成后应删除日志"
+        print("[OK] 中断后只补做了剩余的文件")
+
+
+def test_shared_pool_interleaves_stages():
+    """测试两个解压任务共用线程池时交替推进，后开始的任务不必等前一个全部完成。"""
+    print("\n" + "=" * 60)
+    print("测试 3: 共享线程池的解压任务交替推进")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        client_zip = tmp / "client.zip"
+        server_zip = tmp / "server.zip"
+        make_zip(client_zip, {f"client/file{idx}.bin": b"c" * 64 for idx in range(60)})
+        make_zip(server_zip, {f"server/file{idx}.bin": b"s" * 64 for idx in range(10)})
+        order = []
+        started = threading.Event()
+
+        def _client_entry(name: str) -> None:
+            started.set()
+            time.sleep(0.005)
+            order.append("client")
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            client = threading.Thread(target=utils.extract_zip, args=(client_zip, tmp / "out"),
+                                      kwargs={"workers": 2, "executor": pool, "on_entry": _client_entry})
+            client.start()
+            assert started.wait(5), "客户端解压未开始"
+            utils.extract_zip(server_zip, tmp / "out", workers=2, executor=pool,
+                              on_entry=lambda name: order.append("server"))
+            client.join()
+
+        assert order.count("client") == 60 and order.count("server") == 10
+        last_server = len(order) - 1 - order[::-1].index("server")
+        remaining = order[last_server:].count("client")
+        assert remaining > 30, f"服务端应在客户端完成前解压完，之后只剩 {remaining} 个客户端文件"
+        print(f"[OK] 服务端完成时客户端还剩 {remaining} 个文件")
+
+
+if __name__ == "__main__":
+    try:
+        test_concurrent_matches_sequential()
+        test_resume_after_interruption()
+        test_shared_pool_interleaves_stages()
+        print("\n" + "=" * 60)
+        print("[PASS] 所有测试通过！")
+        print("=" * 60)
+    except AssertionError as e:
+        print(f"\n[FAIL] 测试失败: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n[ERROR] 测试出错: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
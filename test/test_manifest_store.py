@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""测试 SQLite 标记数据库：旧版 JSON 自动导入、按索引查询、单字段更新与 JSON 导出。"""
+
+import json
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+import sys
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scripts import manifest
+from scripts.config import GameVersion, MANIFEST_DB, MANIFEST_FILE
+
+LEGACY_MANIFEST = {
+    "version": "4.0.5",
+    "server_zip": "SPT-4.0.5.zip",
+    "client_zip": "Client.0.16.9.zip",
+    "installed_at": "2025-11-24T13:00:00",
+    "mods": {
+        "ExampleMod": {
+            "mod_version": "1.2",
+            "mod_supported_versions": "4.0.5",
+            "files": ["BepInEx/plugins/Example/a.dll", "BepInEx/plugins/Example/b.dll", "readme.txt"],
+            "directories": ["BepInEx/plugins/Example"],
+            "installed_at": "2025-11-24T13:05:00",
+        },
+    },
+    "fika": {"mode": "host", "host_ip": "1.2.3.4", "my_ip": "", "updated_at": "2025-11-24T13:10:00"},
+}
+
+
+def test_legacy_json_is_imported():
+    """测试旧版 JSON 标记文件首次访问时被导入，读取结果与原内容一致。"""
+    print("=" * 60)
+    print("测试 1: 导入旧版标记文件")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        (root / MANIFEST_FILE).write_text(json.dumps(LEGACY_MANIFEST, ensure_ascii=False), encoding="utf-8")
+
+        loaded = manifest.load_manifest(root)
+        assert (root / MANIFEST_DB).exists(), "首次访问应创建数据库"
+        assert loaded == LEGACY_MANIFEST, f"导入后内容应一致: {loaded}"
+        assert manifest.get_fika_config(root)["host_ip"] == "1.2.3.4"
+        assert manifest.list_mods(root) == {"ExampleMod": 3}
+        assert manifest.get_mod_directories(root, "ExampleMod") == ["BepInEx/plugins/Example"]
+
+        # 之后的修改只写入数据库，JSON 需要时再导出
+        manifest.clear_fika_config(root)
+        assert manifest.get_fika_config(root) is None
+        assert json.loads((root / MANIFEST_FILE).read_text(encoding="utf-8"))["fika"]["mode"] == "host"
+        manifest.export_manifest_json(root)
+        exported = json.loads((root / MANIFEST_FILE).read_text(encoding="utf-8"))
+        assert "fika" not in exported
+        assert exported["mods"]["ExampleMod"]["file_groups"] == [
+            ["BepInEx/plugins/Example/", ["a.dll", "b.dll"]], ["", ["readme.txt"]]], "导出时文件应按文件夹分组"
+
+        assert manifest.load_manifest(root / "missing") is None, "没有标记时应视为未安装"
+        print("[OK] 旧版标记文件导入并可重新导出")
+
+
+def test_indexed_queries_with_many_files():
+    """测试大量 MOD 文件时，单字段更新与文件归属查询不受文件总数影响。"""
+    print("\n" + "=" * 60)
+    print("测试 2: 索引查询")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        manifest.write_manifest(root, GameVersion("4.0.5", "server.zip", "client.zip"))
+        for mod_idx in range(40):
+            files = (f"BepInEx/plugins/Mod{mod_idx}/item{idx}.bundle" for idx in range(2500))
+            manifest.record_mod_installation("1.0", "4.0.5", root, f"Mod{mod_idx}", files)
+        manifest.record_mod_installation("1.0", "4.0.5", root, "Overwriter", ["BepInEx/plugins/Mod3/item7.bundle"])
+
+        started = time.perf_counter()
+        for _ in range(20):
+            manifest.update_manifest_server_version(root, "4.0.6", "server-4.0.6.zip")
+            manifest.save_fika_config(root, "client", "1.2.3.4", "5.6.7.8")
+        update_elapsed = (time.perf_counter() - started) / 40
+        owners = manifest.find_file_owners(root, ["BepInEx/plugins/Mod3/item7.bundle", "SPT/SPT.Server.exe"])
+        assert owners == {"BepInEx/plugins/Mod3/item7.bundle": ["Mod3", "Overwriter"]}, f"{owners}"
+
+        info = manifest.get_install_info(root)
+        assert info["version"] == "4.0.6" and info["fika"]["my_ip"] == "5.6.7.8" and "mods" not in info
+        assert len(manifest.get_mod_files(root, "Mod39")) == 2500
+
+        # 重新安装同名 MOD 会替换旧记录
+        manifest.record_mod_installation("2.0", "4.0.6", root, "Mod39", ["only.dll"])
+        assert manifest.get_mod_files(root, "Mod39") == ["only.dll"]
+        manifest.remove_mod_record(root, "Mod39")
+        assert manifest.get_mod_files(root, "Mod39") is None
+        assert len(manifest.list_mods(root)) == 40
+        manifest.clear_mod_records(root)
+        assert manifest.list_mods(root) == {}
+        print(f"[OK] 10 万个文件记录下单字段更新平均 {update_elapsed * 1000:.1f} 毫秒")
+
+
+def test_reads_are_cached():
+    """测试重复读取只需 stat：本模块的修改同步到缓存，外部修改数据库后缓存失效。"""
+    print("\n" + "=" * 60)
+    print("测试 3: 进程内缓存")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        manifest.write_manifest(root, GameVersion("4.0.5", "server.zip", "client.zip"))
+        manifest.record_mod_installation("1.0", "4.0.5", root, "ExampleMod", ["a.dll", "sub/b.dll"])
+
+        original = manifest._open_store
+        opened = []
+
+        def _counting(*args, **kwargs):
+            opened.append(args)
+            return original(*args, **kwargs)
+
+        manifest._open_store = _counting
+        try:
+            for _ in range(50):
+                assert manifest.get_install_info(root)["version"] == "4.0.5"
+                assert manifest.get_fika_config(root) is None
+                assert manifest.load_manifest(root)["mods"]["ExampleMod"]["files"] == ["a.dll", "sub/b.dll"]
+            assert len(opened) == 2, f"未变化时应只查询一次，实际打开数据库 {len(opened)} 次"
+
+            # 修改函数同步更新缓存，不需要重新查询
+            opened.clear()
+            manifest.save_fika_config(root, "host", "1.2.3.4")
+            manifest.update_manifest_server_version(root, "4.0.6", "server-4.0.6.zip")
+            manifest.remove_mod_record(root, "ExampleMod")
+            assert len(opened) == 3
+            info = manifest.get_install_info(root)
+            assert info["version"] == "4.0.6" and info["fika"]["host_ip"] == "1.2.3.4"
+            assert manifest.load_manifest(root)["mods"] == {}
+            assert len(opened) == 3, "修改后读取应命中缓存"
+            info["version"] = "changed by caller"
+            assert manifest.get_install_info(root)["version"] == "4.0.6", "调用方修改返回值不应影响缓存"
+
+            # 模拟其他进程直接修改数据库
+            time.sleep(0.01)
+            conn = sqlite3.connect(root / MANIFEST_DB)
+            with conn:
+                conn.execute("UPDATE installs SET version = '4.1.0' WHERE id = 1")
+            conn.close()
+            assert manifest.get_install_info(root)["version"] == "4.1.0", "外部修改后缓存应失效"
+            assert len(opened) == 4
+        finally:
+            manifest._open_store = original
+        print("[OK] 重复读取命中缓存，外部修改后重新读取")
+
+
+def test_snapshot_and_recovery():
+    """测试 WAL 模式、按修改量刷新 JSON 快照，以及数据库损坏后从快照恢复。"""
+    print("\n" + "=" * 60)
+    print("测试 4: 快照与损坏恢复")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        manifest.write_manifest(root, GameVersion("4.0.5", "server.zip", "client.zip"))
+        conn = sqlite3.connect(root / MANIFEST_DB)
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        conn.close()
+        assert journal_mode == "wal", f"应使用 WAL 模式: {journal_mode}"
+
+        snapshot = root / MANIFEST_FILE
+        original_threshold = manifest._SNAPSHOT_THRESHOLD
+        manifest._SNAPSHOT_THRESHOLD = 1000
+        try:
+            manifest.record_mod_installation("1.0", "4.0.5", root, "Small", ["a.dll"])
+            assert "Small" not in json.loads(snapshot.read_text(encoding="utf-8"))["mods"], "修改量小时不应重写快照"
+            manifest.record_mod_installation("1.0", "4.0.5", root, "Big", (f"big/{idx}.dll" for idx in range(1500)))
+            mods = json.loads(snapshot.read_text(encoding="utf-8"))["mods"]
+            assert set(mods) == {"Small", "Big"}, "修改量超过阈值后应刷新快照"
+            assert not list(root.glob("*.tmp")), "快照应先写临时文件再重命名"
+            manifest.save_fika_config(root, "host", "1.2.3.4")
+        finally:
+            manifest._SNAPSHOT_THRESHOLD = original_threshold
+
+        # 模拟数据库文件被写坏
+        manifest._cache.clear()
+        (root / MANIFEST_DB).write_bytes(b"not a sqlite database" * 100)
+        loaded = manifest.load_manifest(root)
+        assert loaded is not None, "数据库损坏时应从快照恢复，而不是当作未安装"
+        assert set(loaded["mods"]) == {"Small", "Big"} and len(loaded["mods"]["Big"]["files"]) == 1500
+        assert "fika" not in loaded, "快照之后的修改会丢失"
+        assert list(root.glob(f"{MANIFEST_DB}.corrupt-*")), "损坏的数据库应被保留"
+        manifest.remove_mod_record(root, "Small")
+        assert manifest.list_mods(root) == {"Big": 1500}, "恢复后的数据库应可以继续修改"
+        print("[OK] 快照按修改量刷新，损坏后从快照恢复")
+
+
+def test_grouped_paths():
+    """测试按文件夹分组保存：路径原样还原，数据库明显变小。"""
+    print("\n" + "=" * 60)
+    print("测试 5: 按文件夹分组保存路径")
+    print("=" * 60)
+
+    paths = ["a.dll", "BepInEx/plugins/X/a.dll", "BepInEx\\plugins\\X\\b.dll", "dir/", "a/b\\c.txt", "b.dll"]
+    assert list(manifest.decode_file_groups(manifest.encode_file_groups(paths))) == paths
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        manifest.write_manifest(root, GameVersion("4.0.5", "server.zip", "client.zip"))
+        manifest.record_mod_installation("1.0", "4.0.5", root, "Old", paths)
+        manifest._cache.clear()
+
+        assert manifest.get_mod_files(root, "Old") == paths, "路径应与原来完全一致"
+        assert manifest.find_file_owners(root, ["BepInEx\\plugins\\X\\b.dll"]) == {
+            "BepInEx\\plugins\\X\\b.dll": ["Old"]}
+        assert manifest.get_mod_directories(root, "Old") == ["BepInEx/plugins/X", "BepInEx\\plugins\\X", "a/b", "dir"]
+
+        # 大量文件共享深前缀时，数据库与快照都应比保存完整路径小得多
+        long_prefix = "BepInEx/plugins/SomeAuthor-VeryLongPluginPackName/assets/content/bundles"
+        files = [f"{long_prefix}/group{idx // 2000}/item{idx}.bundle" for idx in range(20000)]
+        manifest.record_mod_installation("1.0", "4.0.5", root, "Big", files)
+        manifest.remove_mod_record(root, "Old")
+        manifest.export_manifest_json(root)
+        full_size = len(json.dumps(files))
+        snapshot_size = (root / MANIFEST_FILE).stat().st_size
+        assert snapshot_size < full_size / 2, f"快照 {snapshot_size} 字节，完整路径 {full_size} 字节"
+        assert manifest.get_mod_files(root, "Big") == files
+
+        conn = sqlite3.connect(root / MANIFEST_DB)
+        dirs = conn.execute("SELECT COUNT(*) FROM dirs").fetchone()[0]
+        conn.close()
+        assert dirs == 10, f"卸载 Old 后不再使用的文件夹应被删除: {dirs}"
+
+        # 从分组快照恢复
+        manifest._cache.clear()
+        manifest_db = root / MANIFEST_DB
+        for suffix in ("", "-wal", "-shm"):
+            Path(str(manifest_db) + suffix).unlink(missing_ok=True)
+        assert manifest.get_mod_files(root, "Big") == files, "应能从分组形式的快照导入"
+        print(f"[OK] 快照 {snapshot_size // 1024} KB（完整路径 {full_size // 1024} KB），路径原样还原")
+
+
+def test_loaded_manifest_survives_changes():
+    """测试遍历 load_manifest 的结果时修改标记：已返回的对象不变，之后读取得到新内容。"""
+    print("\n" + "=" * 60)
+    print("测试 6: 修改标记不影响已返回的对象")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        manifest.write_manifest(root, GameVersion("4.0.5", "server.zip", "client.zip"))
+        for name in ("ModA", "ModB", "ModC"):
+            manifest.record_mod_installation("1.0", "4.0.5", root, name, [f"{name}/plugin.dll"])
+
+        loaded = manifest.load_manifest(root)
+        for name in loaded["mods"]:
+            manifest.remove_mod_record(root, name)
+        manifest.update_manifest_server_version(root, "4.0.6", "server-4.0.6.zip")
+        assert list(loaded["mods"]) == ["ModA", "ModB", "ModC"], "已返回的对象不应被修改"
+        assert loaded["version"] == "4.0.5" and "updated_at" not in loaded
+        current = manifest.load_manifest(root)
+        assert current["mods"] == {} and current["version"] == "4.0.6"
+
+        manifest.record_mod_installation("1.0", "4.0.6", root, "ModD", ["ModD/plugin.dll"])
+        loaded = manifest.load_manifest(root)
+        manifest.clear_mod_records(root)
+        assert list(loaded["mods"]) == ["ModD"]
+        assert manifest.load_manifest(root)["mods"] == {}
+        print("[OK] 遍历 MOD 记录时可以删除记录")
+
+
+if __name__ == "__main__":
+    try:
+        test_legacy_json_is_imported()
+        test_indexed_queries_with_many_files()
+        test_reads_are_cached()
+        test_snapshot_and_recovery()
+        test_grouped_paths()
+        test_loaded_manifest_survives_changes()
+        print("\n" + "=" * 60)
+        print("[PASS] 所有测试通过！")
+        print("=" * 60)
+    except AssertionError as e:
+        print(f"\n[FAIL] 测试失败: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n[ERROR] 测试出错: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
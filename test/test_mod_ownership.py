@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""测试 MOD 文件归属：安装前检测冲突，覆盖的原文件进入备份区，卸载时还原或保留仍被使用的文件。"""
+
+import tempfile
+import time
+import types
+import zipfile
+from pathlib import Path
+import sys
+
+# 添加项目根目录和 test 目录到路径
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from range_http_server import RangeHTTPServer
+from zip_fixtures import make_zip
+from scripts import config, manifest, ownership
+from scripts.config import GameVersion, ModVersion
+from scripts.fika import installer as fika_installer
+
+BASE_FILES = {
+    "BepInEx/config/BepInEx.cfg": b"base config",
+    "EscapeFromTarkov_Data/Managed/Assembly-CSharp.dll": b"base assembly",
+}
+
+
+def _prepare_install(tmp: Path) -> Path:
+    """一个已安装基础客户端的目录：基础文件已写入并记录归属。"""
+    install = tmp / "install"
+    for rel, data in BASE_FILES.items():
+        (install / rel).parent.mkdir(parents=True, exist_ok=True)
+        (install / rel).write_bytes(data)
+    manifest.write_manifest(install, GameVersion("4.0.5", "server.zip", "client.zip"))
+    manifest.record_base_files(install, manifest.BASE_CLIENT, [str(Path(rel)) for rel in BASE_FILES])
+    return install
+
+
+def _install(install: Path, name: str, zip_path: Path) -> list:
+    files, backups = ownership.install_mod_files(install, name, zip_path)
+    manifest.record_mod_installation("1.0", "4.0.5", install, name, files, backups)
+    return backups
+
+
+def _uninstall(install: Path, name: str) -> ownership.ReleaseSummary:
+    summary = ownership.uninstall_mod_files(install, name)
+    manifest.remove_mod_record(install, name)
+    return summary
+
+
+def test_conflicts_and_restore():
+    """测试冲突检测（只查索引）、覆盖基础文件时的备份，以及卸载后还原。"""
+    print("=" * 60)
+    print("测试 1: 冲突检测与备份还原")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        install = _prepare_install(tmp)
+        (install / "user.txt").write_bytes(b"user file")
+        mod_zip = make_zip(tmp / "ModA.zip", {
+            "BepInEx/config/BepInEx.cfg": b"mod config",
+            "BepInEx/plugins/ModA/ModA.dll": b"mod a",
+            "user.txt": b"mod readme",
+        })
+
+        conflicts = ownership.find_conflicts(install, zipfile.ZipFile(mod_zip).namelist(), "ModA")
+        assert conflicts == {"BepInEx/config/BepInEx.cfg": manifest.BASE_CLIENT}, f"{conflicts}"
+
+        backups = _install(install, "ModA", mod_zip)
+        assert sorted(backups) == sorted(str(Path(p)) for p in ("BepInEx/config/BepInEx.cfg", "user.txt"))
+        assert (install / "BepInEx/config/BepInEx.cfg").read_bytes() == b"mod config"
+        assert manifest.list_mods(install) == {"ModA": 3}, "基础文件不应出现在 MOD 列表中"
+        assert ownership.find_conflicts(install, ["BepInEx/plugins/ModA/ModA.dll"], "ModA") == {}, "重装不算冲突"
+        assert ownership.find_conflicts(install, ["BepInEx/plugins/ModA/ModA.dll"], "ModB") == {
+            "BepInEx/plugins/ModA/ModA.dll": "ModA"}
+
+        summary = _uninstall(install, "ModA")
+        assert (summary.deleted, summary.restored) == (1, 2), f"{summary}"
+        assert (install / "BepInEx/config/BepInEx.cfg").read_bytes() == b"base config", "基础文件应被还原"
+        assert (install / "user.txt").read_bytes() == b"user file", "未登记的原文件也应被还原"
+        assert not (install / "BepInEx/plugins/ModA/ModA.dll").exists()
+        assert not any((install / config.MOD_BACKUP_DIR).rglob("*.*")), "卸载后备份应被清理"
+        print("[OK] 冲突只按索引检测，卸载后原文件全部还原")
+
+
+def test_stacked_mods():
+    """测试多个 MOD 覆盖同一文件：先卸载中间的 MOD 时文件不变，最后还原为基础文件。"""
+    print("\n" + "=" * 60)
+    print("测试 2: 多个 MOD 覆盖同一文件")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        install = _prepare_install(tmp)
+        cfg = install / "BepInEx/config/BepInEx.cfg"
+        _install(install, "ModA", make_zip(tmp / "a.zip", {"BepInEx/config/BepInEx.cfg": b"a",
+                                                            "shared/lib.dll": b"lib", "a_only.txt": b"a"}))
+        _install(install, "ModB", make_zip(tmp / "b.zip", {"BepInEx/config/BepInEx.cfg": b"b",
+                                                            "shared/lib.dll": b"lib-b"}))
+        assert cfg.read_bytes() == b"b"
+
+        summary = _uninstall(install, "ModA")
+        assert cfg.read_bytes() == b"b", "仍被之后的 MOD 覆盖的文件应保持不变"
+        assert (install / "shared/lib.dll").read_bytes() == b"lib-b"
+        assert not (install / "a_only.txt").exists()
+        assert summary.kept == 2 and summary.deleted == 1, f"{summary}"
+
+        _uninstall(install, "ModB")
+        assert cfg.read_bytes() == b"base config", "最后应还原为基础文件"
+        assert not (install / "shared/lib.dll").exists(), "没有其他所有者的文件应被删除"
+
+        # 内容相同的文件不会被重写，也就没有备份：卸载时仍属于基础文件，保留
+        _install(install, "Same", make_zip(tmp / "same.zip", {"BepInEx/config/BepInEx.cfg": b"base config"}))
+        assert manifest.get_mod_backups(install, "Same") == []
+        _uninstall(install, "Same")
+        assert cfg.read_bytes() == b"base config"
+        print("[OK] 备份在 MOD 之间转交，卸载顺序不影响结果")
+
+
+def test_reinstall_and_uninstall_all():
+    """测试重装新版本（沿用备份、处理不再包含的文件）与一键卸载时还原基础文件。"""
+    print("\n" + "=" * 60)
+    print("测试 3: 重装与一键卸载")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        install = _prepare_install(tmp)
+        assembly = install / "EscapeFromTarkov_Data/Managed/Assembly-CSharp.dll"
+        _install(install, "Mod", make_zip(tmp / "v1.zip", {"BepInEx/config/BepInEx.cfg": b"v1",
+                                                            "EscapeFromTarkov_Data/Managed/Assembly-CSharp.dll": b"v1",
+                                                            "old.txt": b"v1"}))
+        backups = _install(install, "Mod", make_zip(tmp / "v2.zip", {"BepInEx/config/BepInEx.cfg": b"v2",
+                                                                      "new.txt": b"v2"}))
+        assert backups == [str(Path("BepInEx/config/BepInEx.cfg"))], f"应沿用上次的备份: {backups}"
+        assert assembly.read_bytes() == b"base assembly", "新版本不再覆盖的基础文件应被还原"
+        assert not (install / "old.txt").exists(), "新版本不再包含的文件应被删除"
+
+        restored = ownership.restore_base_files(install)
+        manifest.clear_mod_records(install)
+        assert restored == 1 and (install / "BepInEx/config/BepInEx.cfg").read_bytes() == b"base config"
+        assert not (install / config.MOD_BACKUP_DIR).exists()
+        assert manifest.get_mod_files(install, manifest.BASE_CLIENT), "一键卸载后基础文件的归属应保留"
+        print("[OK] 重装沿用备份，一键卸载还原基础文件")
+
+
+def test_case_insensitive_paths():
+    """测试只有大小写或分隔符不同的路径视为同一文件（Windows 文件系统不区分大小写）。"""
+    print("\n" + "=" * 60)
+    print("测试 4: 忽略大小写的归属")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        install = _prepare_install(tmp)
+        mod_zip = make_zip(tmp / "Case.zip", {"bepinex/CONFIG/bepinex.cfg": b"mod config",
+                                              "BepInEx/plugins/Case/case.dll": b"case"})
+        conflicts = ownership.find_conflicts(install, zipfile.ZipFile(mod_zip).namelist(), "Case")
+        assert conflicts == {"bepinex/CONFIG/bepinex.cfg": manifest.BASE_CLIENT}, f"{conflicts}"
+        owners = manifest.find_file_owners(install, ["BEPINEX\\config\\BepInEx.CFG"])
+        assert owners == {"BEPINEX\\config\\BepInEx.CFG": [manifest.BASE_CLIENT]}, f"{owners}"
+
+        _install(install, "Case", mod_zip)
+        summary = _uninstall(install, "Case")
+        assert summary.kept == 1 and summary.deleted == 1, f"仍属于基础文件的路径不应被删除: {summary}"
+        assert (install / "BepInEx/config/BepInEx.cfg").read_bytes() == b"base config"
+        print("[OK] 大小写不同的路径按同一文件检测冲突")
+
+
+def test_fika_download_is_backed_up():
+    """测试边下载边安装 Fika 时同样经过暂存提交，被覆盖的基础文件卸载后还原。"""
+    print("\n" + "=" * 60)
+    print("测试 5: Fika 下载安装的备份")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        install = _prepare_install(tmp)
+        zip_path = make_zip(tmp / "fika-src.zip", {
+            "BepInEx/config/BepInEx.cfg": b"fika config",
+            "BepInEx/plugins/Fika/Fika.Core.dll": b"fika",
+        })
+        original_discover, original_mods_dir = fika_installer.get_fika_mod_from_announcement, config.MODS_DIR
+        with RangeHTTPServer({"fika.zip": zip_path.read_bytes()}) as server:
+            fika_installer.get_fika_mod_from_announcement = lambda: ModVersion(
+                "Fika-1.0", "fika.zip", server.url("fika.zip"))
+            config.MODS_DIR = tmp / "mods"
+            try:
+                assert fika_installer.download_and_install_fika(types.SimpleNamespace(install_path=install))
+            finally:
+                fika_installer.get_fika_mod_from_announcement = original_discover
+                config.MODS_DIR = original_mods_dir
+
+        assert (install / "BepInEx/config/BepInEx.cfg").read_bytes() == b"fika config"
+        assert manifest.get_mod_backups(install, "Fika-1.0") == [str(Path("BepInEx/config/BepInEx.cfg"))]
+        _uninstall(install, "Fika-1.0")
+        assert (install / "BepInEx/config/BepInEx.cfg").read_bytes() == b"base config", "卸载 Fika 后应还原基础文件"
+        print("[OK] Fika 覆盖的基础文件已备份并在卸载后还原")
+
+
+def test_conflict_check_scales():
+    """测试已安装数百个 MOD 时，冲突检测的耗时只与压缩包的文件夹数有关。"""
+    print("\n" + "=" * 60)
+    print("测试 6: 大量 MOD 时的冲突检测")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        install = Path(tmpdir)
+        manifest.write_manifest(install, GameVersion("4.0.5", "server.zip", "client.zip"))
+        manifest.record_base_files(install, manifest.BASE_CLIENT, (
+            str(Path(f"EscapeFromTarkov_Data/StreamingAssets/Windows/assets/sub{idx % 100}/file{idx}.bundle"))
+            for idx in range(40000)))
+        for mod_idx in range(300):
+            files = (str(Path(f"BepInEx/plugins/Mod{mod_idx}/assets/item{idx}.bundle")) for idx in range(100))
+            manifest.record_mod_installation("1.0", "4.0.5", install, f"Mod{mod_idx}", files)
+
+        names = [f"BepInEx/plugins/New/assets/item{idx}.bundle" for idx in range(2000)]
+        names += [f"BepInEx/plugins/Mod{idx}/assets/item{idx % 100}.bundle" for idx in range(0, 300, 3)]
+        names += [f"EscapeFromTarkov_Data/StreamingAssets/Windows/assets/sub7/file{idx}.bundle"
+                  for idx in range(7, 40000, 100)]
+        started = time.perf_counter()
+        conflicts = ownership.find_conflicts(install, names, "New")
+        elapsed = time.perf_counter() - started
+        assert len(conflicts) == 100 + 400, f"{len(conflicts)}"
+        assert conflicts["BepInEx/plugins/Mod3/assets/item3.bundle"] == "Mod3"
+        assert elapsed < 1.0, f"冲突检测耗时 {elapsed:.2f} 秒"
+        print(f"[OK] 300 个 MOD、7 万个文件记录下检测 {len(names)} 个文件用时 {elapsed * 1000:.0f} 毫秒")
+
+
+if __name__ == "__main__":
+    try:
+        test_conflicts_and_restore()
+        test_stacked_mods()
+        test_reinstall_and_uninstall_all()
+        test_case_insensitive_paths()
+        test_fika_download_is_backed_up()
+        test_conflict_check_scales()
+        print("\n" + "=" * 60)
+        print("[PASS] 所有测试通过！")
+        print("=" * 60)
+    except AssertionError as e:
+        print(f"\n[FAIL] 测试失败: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n[ERROR] 测试出错: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
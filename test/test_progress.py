@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""测试字节进度条：限制刷新频率、显示速度与剩余时间。"""
+
+import contextlib
+import io
+import tempfile
+import threading
+import zipfile
+from pathlib import Path
+import sys
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scripts.progress import ProgressBar
+from scripts.utils import extract_zip
+
+
+def test_progress_is_throttled():
+    """测试大量小更新只重绘少数几次，结束时显示 100% 与用时。"""
+    print("=" * 60)
+    print("测试 1: 刷新频率限制")
+    print("=" * 60)
+
+    output = io.StringIO()
+    total = 20000 * 4096
+    with contextlib.redirect_stdout(output):
+        progress = ProgressBar(total)
+
+        def _worker() -> None:
+            for _ in range(5000):
+                progress.advance(4096)
+
+        threads = [threading.Thread(target=_worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        progress.finish()
+        progress.finish()
+
+    text = output.getvalue()
+    redraws = text.count("\r")
+    assert progress.current == total, "多线程累加的字节数应准确"
+    assert redraws < 50, f"20000 次更新不应重绘 {redraws} 次"
+    last = text.rsplit("\r", 1)[-1]
+    assert "100%" in last and "MB/s" in last and "用时" in last, f"最终状态不完整: {last!r}"
+    assert text.count("\n") == 1, "重复调用 finish 只应换行一次"
+    print(f"[OK] 20000 次更新重绘 {redraws} 次")
+
+
+def test_extract_progress_counts_bytes():
+    """测试解压进度按字节推进：大文件占据绝大部分进度。"""
+    print("\n" + "=" * 60)
+    print("测试 2: 解压按字节计算进度")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        zip_path = tmp / "client.zip"
+        with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("EscapeFromTarkov_Data/big.bundle", b"\0" * (8 * 1024 * 1024))
+            for idx in range(50):
+                archive.writestr(f"BepInEx/plugins/small{idx}.dll", b"x" * 100)
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            extract_zip(zip_path, tmp / "install", show_progress=True, workers=2)
+        text = output.getvalue()
+        assert "8.0/8.0 MB" in text, f"进度应以字节显示: {text!r}"
+        print("[OK] 解压进度按字节显示")
+
+
+if __name__ == "__main__":
+    try:
+        test_progress_is_throttled()
+        test_extract_progress_counts_bytes()
+        print("\n" + "=" * 60)
+        print("[PASS] 所有测试通过！")
+        print("=" * 60)
+    except AssertionError as e:
+        print(f"\n[FAIL] 测试失败: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n[ERROR] 测试出错: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""测试远程 zip 差量获取（使用本地 HTTP 替身）。"""
+
+import hashlib
+import io
+import os
+import struct
+import tempfile
+import zipfile
+from pathlib import Path
+import sys
+
+# 添加项目根目录和 test 目录到路径
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from range_http_server import RangeHTTPServer
+from scripts import remote_zip, utils
+from scripts.remote_zip import RangeUnsupported, fetch_delta
+
+BUNDLE = os.urandom(2 * 1024 * 1024)
+OLD_ENTRIES = {
+    "SPT.Server.exe": b"server-4.0.4" * 5000,
+    "SPT_Data/Server/bundles/map.bundle": BUNDLE,
+    "SPT_Data/Server/configs/core.json": b'{"sptVersion": "4.0.4"}',
+    "SPT_Data/Server/old.json": b"removed in new version",
+}
+NEW_ENTRIES = {
+    "SPT.Server.exe": b"server-4.0.5" * 5000,
+    "SPT_Data/Server/bundles/map.bundle": BUNDLE,
+    "SPT_Data/Server/configs/core.json": b'{"sptVersion": "4.0.4"}',
+    "SPT_Data/Server/new.json": os.urandom(64 * 1024),
+}
+
+
+def _build_zip(root: str, entries: dict, info_zip_extra: bool = False) -> bytes:
+    """生成带统一顶层目录的测试压缩包（bundle 以存储方式写入，与实际服务端包一致）。
+
+    info_zip_extra 为 True 时模仿 Info-ZIP：本地文件头的 UT 扩展字段带三个时间，中央目录中只带修改时间。
+    """
+    raw = io.BytesIO()
+    with zipfile.ZipFile(raw, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(zipfile.ZipInfo(f"{root}/"), b"")
+        for name, content in entries.items():
+            info = zipfile.ZipInfo(f"{root}/{name}", date_time=(2025, 11, 24, 13, 0, 0))
+            info.compress_type = zipfile.ZIP_STORED if name.endswith(".bundle") else zipfile.ZIP_DEFLATED
+            if info_zip_extra:
+                info.extra = struct.pack("<HHB3l", 0x5455, 13, 7, 1764000000, 1764000100, 1764000200)
+            archive.writestr(info, content)
+        if info_zip_extra:
+            # 本地文件头已写出，关闭时按修改后的 extra 写中央目录
+            for info in archive.infolist():
+                if info.extra:
+                    info.extra = struct.pack("<HHBl", 0x5455, 5, 7, 1764000000)
+    return raw.getvalue()
+
+
+def test_fetch_only_changed_entries():
+    """测试只下载变化的条目，拼出的压缩包与远程内容一致。"""
+    print("=" * 60)
+    print("测试 1: 差量获取新版本压缩包")
+    print("=" * 60)
+
+    new_zip = _build_zip("SPT-4.0.5", NEW_ENTRIES)
+    with tempfile.TemporaryDirectory() as tmpdir, RangeHTTPServer({"server.zip": new_zip}) as server:
+        tmp = Path(tmpdir)
+        base_zip = tmp / "SPT-4.0.4.zip"
+        base_zip.write_bytes(_build_zip("SPT-4.0.4", OLD_ENTRIES))
+        install = tmp / "install"
+        utils.extract_zip(base_zip, install, strip_common_root=True)
+
+        dest_zip = tmp / "SPT-4.0.5.zip"
+        result = fetch_delta(server.url("server.zip"), base_zip, dest_zip, install_root=install)
+
+        assert dest_zip.read_bytes() == new_zip, "拼出的压缩包应与远程文件逐字节一致"
+        with zipfile.ZipFile(dest_zip) as archive:
+            assert archive.testzip() is None, "拼出的压缩包应能通过校验"
+        assert sorted(result.changed) == ["SPT.Server.exe", "SPT_Data/Server/new.json"], result.changed
+        assert result.fetched_bytes < len(new_zip) // 4, f"下载了 {result.fetched_bytes} 字节，未跳过相同条目"
+        assert not dest_zip.with_name(dest_zip.name + ".delta").exists(), "临时文件应被清理"
+        print(f"[OK] 完整包 {result.total_size} 字节，只下载了 {result.fetched_bytes} 字节")
+
+
+def test_missing_install_file_counts_as_changed():
+    """测试安装目录中缺失的文件即使内容未变也会列为需要写入。"""
+    print("\n" + "=" * 60)
+    print("测试 2: 安装目录缺失文件")
+    print("=" * 60)
+
+    new_zip = _build_zip("SPT-4.0.5", NEW_ENTRIES)
+    with tempfile.TemporaryDirectory() as tmpdir, RangeHTTPServer({"server.zip": new_zip}) as server:
+        tmp = Path(tmpdir)
+        base_zip = tmp / "SPT-4.0.4.zip"
+        base_zip.write_bytes(_build_zip("SPT-4.0.4", OLD_ENTRIES))
+        install = tmp / "install"
+        utils.extract_zip(base_zip, install, strip_common_root=True)
+        (install / "SPT_Data" / "Server" / "configs" / "core.json").unlink()
+
+        result = fetch_delta(server.url("server.zip"), base_zip, tmp / "new.zip", install_root=install,
+                             show_progress=False)
+        assert "SPT_Data/Server/configs/core.json" in result.changed, "缺失的文件应需要写入"
+        print("[OK] 缺失文件被列为变化条目")
+
+
+def test_skips_entries_the_extractor_skips():
+    """测试含 .. 的条目与解压时一样被跳过，不列为变化条目，但拼出的压缩包仍完整。"""
+    print("\n" + "=" * 60)
+    print("测试 3: 跳过含 .. 的条目")
+    print("=" * 60)
+
+    new_zip = _build_zip("SPT-4.0.5", {**NEW_ENTRIES, "../evil.txt": b"outside the install dir"})
+    with tempfile.TemporaryDirectory() as tmpdir, RangeHTTPServer({"server.zip": new_zip}) as server:
+        tmp = Path(tmpdir)
+        base_zip = tmp / "SPT-4.0.4.zip"
+        base_zip.write_bytes(_build_zip("SPT-4.0.4", OLD_ENTRIES))
+        install = tmp / "install"
+        utils.extract_zip(base_zip, install, strip_common_root=True)
+
+        dest_zip = tmp / "SPT-4.0.5.zip"
+        result = fetch_delta(server.url("server.zip"), base_zip, dest_zip, install_root=install,
+                             show_progress=False)
+        assert dest_zip.read_bytes() == new_zip, "拼出的压缩包应与远程文件逐字节一致"
+        assert sorted(result.changed) == sorted(utils.changed_entries(dest_zip, install, strip_common_root=True)), \
+            result.changed
+        assert not any(".." in rel for rel in result.changed), result.changed
+        print("[OK] 变化条目与解压时的规则一致")
+
+
+def test_local_extra_differs_from_central():
+    """测试本地文件头的扩展字段与中央目录不同时，拼出的压缩包仍与远程逐字节一致。"""
+    print("\n" + "=" * 60)
+    print("测试 4: 本地文件头与中央目录的扩展字段不同")
+    print("=" * 60)
+
+    new_zip = _build_zip("SPT-4.0.5", NEW_ENTRIES, info_zip_extra=True)
+    with zipfile.ZipFile(io.BytesIO(new_zip)) as archive:
+        info = archive.getinfo("SPT-4.0.5/SPT_Data/Server/bundles/map.bundle")
+        local_extra = struct.unpack_from("<H", new_zip, info.header_offset + 28)[0]
+        assert local_extra != len(info.extra), "测试数据的本地扩展字段应与中央目录不同"
+    with tempfile.TemporaryDirectory() as tmpdir, RangeHTTPServer({"server.zip": new_zip}) as server:
+        tmp = Path(tmpdir)
+        base_zip = tmp / "SPT-4.0.4.zip"
+        base_zip.write_bytes(_build_zip("SPT-4.0.4", OLD_ENTRIES))
+        dest_zip = tmp / "SPT-4.0.5.zip"
+        result = fetch_delta(server.url("server.zip"), base_zip, dest_zip, show_progress=False,
+                             expected_sha256=hashlib.sha256(new_zip).hexdigest())
+
+        assert dest_zip.read_bytes() == new_zip, "拼出的压缩包应与远程文件逐字节一致"
+        assert result.fetched_bytes < len(new_zip) // 4, f"下载了 {result.fetched_bytes} 字节，未跳过相同条目"
+        print("[OK] 复用的条目使用远程的本地文件头，SHA-256 校验通过")
+
+
+def test_server_without_range_support():
+    """测试服务器不支持 Range 时抛出 RangeUnsupported，且不留下文件。"""
+    print("\n" + "=" * 60)
+    print("测试 5: 服务器不支持 Range")
+    print("=" * 60)
+
+    new_zip = _build_zip("SPT-4.0.5", NEW_ENTRIES)
+    with tempfile.TemporaryDirectory() as tmpdir, \
+            RangeHTTPServer({"server.zip": new_zip}, support_ranges=False) as server:
+        tmp = Path(tmpdir)
+        base_zip = tmp / "SPT-4.0.4.zip"
+        base_zip.write_bytes(_build_zip("SPT-4.0.4", OLD_ENTRIES))
+        dest_zip = tmp / "SPT-4.0.5.zip"
+        original_get = remote_zip.http_client.get
+        responses = []
+
+        def _recording_get(*args, **kwargs):
+            response = original_get(*args, **kwargs)
+            responses.append(response)
+            return response
+
+        remote_zip.http_client.get = _recording_get
+        try:
+            fetch_delta(server.url("server.zip"), base_zip, dest_zip, show_progress=False)
+        except RangeUnsupported:
+            pass
+        else:
+            raise AssertionError("应抛出 RangeUnsupported")
+        finally:
+            remote_zip.http_client.get = original_get
+        assert not dest_zip.exists(), "失败时不应生成压缩包"
+        read = sum(response.raw.tell() for response in responses)
+        assert read < len(new_zip) // 2, f"服务器返回完整文件时不应读取正文，实际读取 {read} 字节"
+        print("[OK] 不支持 Range 时交给完整下载")
+
+
+if __name__ == "__main__":
+    try:
+        test_fetch_only_changed_entries()
+        test_missing_install_file_counts_as_changed()
+        test_skips_entries_the_extractor_skips()
+        test_local_extra_differs_from_central()
+        test_server_without_range_support()
+        print("\n" + "=" * 60)
+        print("[PASS] 所有测试通过！")
+        print("=" * 60)
+    except AssertionError as e:
+        print(f"\n[FAIL] 测试失败: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n[ERROR] 测试出错: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
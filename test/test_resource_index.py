@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""测试本地资源包校验索引：文件不变时不重新计算摘要，变化或损坏时能发现。"""
+
+import hashlib
+import os
+import tempfile
+import time
+from pathlib import Path
+import sys
+
+# 添加项目根目录和 test 目录到路径
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from zip_fixtures import make_zip
+from scripts import resource_index, utils
+
+
+def _reset_index(root: Path) -> None:
+    """把索引指向临时目录，并清空内存中的索引。"""
+    resource_index._ROOT = root
+    resource_index._INDEX_FILE = root / "verify_index.json"
+    resource_index._index = None
+
+
+class _CountHashes:
+    """统计 utils.file_sha256 的调用次数。"""
+
+    def __enter__(self):
+        self.calls = 0
+        self._original = utils.file_sha256
+
+        def _counting(path):
+            self.calls += 1
+            return self._original(path)
+
+        utils.file_sha256 = _counting
+        return self
+
+    def __exit__(self, *exc):
+        utils.file_sha256 = self._original
+
+
+def test_check_package_uses_index():
+    """测试同一文件只计算一次摘要，修改后重新计算，截断的压缩包被识别。"""
+    print("=" * 60)
+    print("测试 1: 校验结果缓存")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        _reset_index(root)
+        mod_zip = root / "mods" / "mod.zip"
+        make_zip(mod_zip, {"BepInEx/plugins/mod.dll": os.urandom(64 * 1024)})
+        sha = hashlib.sha256(mod_zip.read_bytes()).hexdigest()
+
+        with _CountHashes() as counter:
+            assert resource_index.check_package(mod_zip, sha, mod_zip.stat().st_size)
+            assert resource_index.check_package(mod_zip, sha)
+            assert not resource_index.check_package(mod_zip, "0" * 64), "摘要不一致时应返回 False"
+            assert counter.calls == 1, f"文件未变化时不应重新计算摘要，实际计算 {counter.calls} 次"
+
+            # 重新加载索引文件后仍然命中
+            resource_index._index = None
+            assert resource_index.check_package(mod_zip, sha)
+            assert counter.calls == 1, "索引应持久化到磁盘"
+
+            # 模拟下载中断：截断后中央目录丢失
+            data = mod_zip.read_bytes()
+            mod_zip.write_bytes(data[:len(data) // 2])
+            assert not resource_index.check_package(mod_zip), "不完整的压缩包应校验失败"
+            assert counter.calls == 2, "文件变化后应重新计算"
+        print("[OK] 校验索引按大小和修改时间复用结果")
+
+
+def test_scan_packages_warm_is_fast():
+    """测试批量校验：首次计算后，再次扫描数百个压缩包只需读取索引。"""
+    print("\n" + "=" * 60)
+    print("测试 2: 批量校验")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        _reset_index(root)
+        mods = root / "mods"
+        for idx in range(300):
+            make_zip(mods / f"mod{idx}.zip", {"BepInEx/plugins/mod.dll": f"payload-{idx}".encode() * 100})
+        (mods / "broken.zip").write_bytes(b"PK\x03\x04 not a zip")
+        good_sha = hashlib.sha256((mods / "mod0.zip").read_bytes()).hexdigest()
+        expected = {"mod0.zip": (good_sha, 0), "mod1.zip": (good_sha, 0)}
+
+        cold_start = time.perf_counter()
+        problems = resource_index.scan_packages([mods], expected)
+        cold = time.perf_counter() - cold_start
+        names = sorted(path.name for path, _ in problems)
+        assert names == ["broken.zip", "mod1.zip"], f"应发现损坏和摘要不一致的压缩包: {names}"
+
+        resource_index._index = None
+        with _CountHashes() as counter:
+            warm_start = time.perf_counter()
+            problems = resource_index.scan_packages([mods], expected)
+            warm = time.perf_counter() - warm_start
+        assert counter.calls == 0, "文件未变化时不应重新计算摘要"
+        assert sorted(path.name for path, _ in problems) == names
+        print(f"[OK] 301 个压缩包：首次 {cold * 1000:.0f} 毫秒，再次 {warm * 1000:.0f} 毫秒")
+
+
+if __name__ == "__main__":
+    try:
+        test_check_package_uses_index()
+        test_scan_packages_warm_is_fast()
+        print("\n" + "=" * 60)
+        print("[PASS] 所有测试通过！")
+        print("=" * 60)
+    except AssertionError as e:
+        print(f"\n[FAIL] 测试失败: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n[ERROR] 测试出错: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""测试服务端差量切换的单元测试。"""
+
+import tempfile
+from pathlib import Path
+import sys
+
+# 添加项目根目录和 test 目录到路径
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from zip_fixtures import make_zip
+from scripts import manifest as manifest_store
+from scripts.config import GameVersion
+from scripts.server_version import _switch_differential
+from scripts.utils import extract_zip
+
+
+def test_differential_switch():
+    """测试差量切换：删除旧版独有文件、写入变化文件、保留相同文件。"""
+    print("=" * 60)
+    print("测试 1: 服务端差量切换")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        old_zip = tmp / "SPT-old.zip"
+        new_zip = tmp / "SPT-new.zip"
+        make_zip(old_zip, {
+            "SPT/SPT.Server.exe": b"old server",
+            "SPT/SPT_Data/same.json": b"identical",
+            "SPT/SPT_Data/Legacy/stale.dll": b"stale",
+            "SPT/mod-overwritten.dll": b"old base file",
+        }, root="SPT-server")
+        make_zip(new_zip, {
+            "SPT/SPT.Server.exe": b"new server!",
+            "SPT/SPT_Data/same.json": b"identical",
+            "SPT/SPT_Data/added.json": b"added",
+        }, root="SPT-server")
+        install = tmp / "install"
+        extract_zip(old_zip, install, strip_common_root=True)
+        same_file = install / "SPT" / "SPT_Data" / "same.json"
+        before = same_file.stat().st_mtime_ns
+        manifest = {"mods": {"SomeMod": {"files": ["SPT/mod-overwritten.dll"]}}}
+
+        _switch_differential(old_zip, new_zip, install, manifest)
+
+        assert (install / "SPT" / "SPT.Server.exe").read_bytes() == b"new server!", "变化的文件应被更新"
+        assert (install / "SPT" / "SPT_Data" / "added.json").exists(), "新增文件应被写入"
+        assert not (install / "SPT" / "SPT_Data" / "Legacy").exists(), "旧版独有文件及其空文件夹应被删除"
+        assert (install / "SPT" / "mod-overwritten.dll").exists(), "MOD 记录的文件不应被删除"
+        assert same_file.stat().st_mtime_ns == before, "相同文件不应被重写"
+        print("[OK] 差量切换结果正确")
+
+
+def test_client_files_are_kept():
+    """测试旧版服务端独有、但客户端也包含的文件（记录为客户端所有）在切换时保留。"""
+    print("\n" + "=" * 60)
+    print("测试 2: 保留客户端文件")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        old_zip = tmp / "SPT-old.zip"
+        new_zip = tmp / "SPT-new.zip"
+        make_zip(old_zip, {
+            "SPT/SPT.Server.exe": b"old server",
+            "BepInEx/plugins/spt/spt-core.dll": b"shared with client",
+            "SPT/stale.dll": b"stale",
+        }, root="SPT-server")
+        make_zip(new_zip, {"SPT/SPT.Server.exe": b"new server"}, root="SPT-server")
+        install = tmp / "install"
+        extract_zip(old_zip, install, strip_common_root=True)
+        manifest_store.write_manifest(install, GameVersion("old", "SPT-old.zip", "client.zip"))
+        manifest_store.record_base_files(install, manifest_store.BASE_CLIENT,
+                                         [str(Path("BepInEx/plugins/spt/spt-core.dll"))])
+
+        _switch_differential(old_zip, new_zip, install, {"mods": {}})
+
+        assert (install / "BepInEx" / "plugins" / "spt" / "spt-core.dll").exists(), "客户端也包含的文件不应被删除"
+        assert not (install / "SPT" / "stale.dll").exists(), "只属于旧版服务端的文件应被删除"
+        print("[OK] 客户端文件在切换服务端时保留")
+
+
+if __name__ == "__main__":
+    try:
+        test_differential_switch()
+        test_client_files_are_kept()
+        print("\n" + "=" * 60)
+        print("[PASS] 所有测试通过！")
+        print("=" * 60)
+    except AssertionError as e:
+        print(f"\n[FAIL] 测试失败: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n[ERROR] 测试出错: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
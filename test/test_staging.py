@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""测试暂存提交：文件先解压到暂存目录再重命名替换，中途失败时安装目录保持原样。"""
+
+import os
+import tempfile
+from pathlib import Path
+import sys
+
+# 添加项目根目录和 test 目录到路径
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from zip_fixtures import make_zip, snapshot
+from scripts import staging
+
+
+def test_commit_replaces_and_removes():
+    """测试提交：变化的文件被替换、旧文件被删除、相同文件不动，暂存目录被清理。"""
+    print("=" * 60)
+    print("测试 1: 暂存提交")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        install = tmp / "install"
+        (install / "SPT").mkdir(parents=True)
+        (install / "SPT" / "same.dll").write_bytes(b"same")
+        (install / "SPT" / "changed.dll").write_bytes(b"old")
+        (install / "SPT" / "stale.dll").write_bytes(b"stale")
+        same_mtime = (install / "SPT" / "same.dll").stat().st_mtime_ns
+        zip_path = tmp / "server.zip"
+        make_zip(zip_path, {"SPT/same.dll": b"same", "SPT/changed.dll": b"new",
+                             "SPT/added/new.dll": b"added", "SPT/empty/": b""})
+
+        staged = staging.extract_staged(zip_path, install, removals=["SPT/stale.dll", "SPT/missing.dll"],
+                                        show_progress=False)
+        assert snapshot(install) == {"SPT/same.dll": b"same", "SPT/changed.dll": b"new",
+                                      "SPT/added/new.dll": b"added"}
+        assert (install / "SPT" / "empty").is_dir(), "空目录条目应被创建"
+        assert staged.removed == ["SPT/stale.dll"], f"只应报告实际删除的文件: {staged.removed}"
+        assert (install / "SPT" / "same.dll").stat().st_mtime_ns == same_mtime, "内容相同的文件不应被重写"
+        leftovers = [p.name for p in tmp.iterdir() if ".staging-" in p.name]
+        assert not leftovers, f"暂存目录应被删除: {leftovers}"
+        print("[OK] 提交后内容正确，暂存目录已清理")
+
+
+def test_failure_rolls_back():
+    """测试提交中途失败（模拟文件被占用）时，已替换和已删除的文件全部还原。"""
+    print("\n" + "=" * 60)
+    print("测试 2: 失败回滚")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        install = tmp / "install"
+        install.mkdir()
+        for idx in range(20):
+            (install / f"file{idx}.txt").write_bytes(f"old-{idx}".encode())
+        (install / "stale.txt").write_bytes(b"stale")
+        before = snapshot(install)
+        zip_path = tmp / "server.zip"
+        make_zip(zip_path, {**{f"file{idx}.txt": f"new-{idx}".encode() for idx in range(20)},
+                             "sub/added.txt": b"added"})
+
+        original_replace = os.replace
+        calls = {"count": 0}
+
+        def _flaky_replace(src, dst):
+            calls["count"] += 1
+            if calls["count"] == 15:
+                raise PermissionError("文件被占用")
+            return original_replace(src, dst)
+
+        staging.os.replace = _flaky_replace
+        try:
+            staging.extract_staged(zip_path, install, removals=["stale.txt"], show_progress=False)
+            raise AssertionError("提交失败时应抛出 PermissionError")
+        except PermissionError:
+            pass
+        finally:
+            staging.os.replace = original_replace
+
+        assert snapshot(install) == before, "回滚后安装目录应与提交前完全一致"
+        assert not (install / "sub").exists(), "提交时新建的目录应被回滚"
+        leftovers = [p.name for p in tmp.iterdir() if ".staging-" in p.name]
+        assert not leftovers, f"暂存目录应被删除: {leftovers}"
+        print("[OK] 第 15 次重命名失败后安装目录完全还原")
+
+
+if __name__ == "__main__":
+    try:
+        test_commit_replaces_and_removes()
+        test_failure_rolls_back()
+        print("\n" + "=" * 60)
+        print("[PASS] 所有测试通过！")
+        print("=" * 60)
+    except AssertionError as e:
+        print(f"\n[FAIL] 测试失败: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n[ERROR] 测试出错: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""测试边下载边解压流程（使用本地 HTTP 替身）。"""
+
+import io
+import os
+import tempfile
+import zipfile
+from pathlib import Path
+import sys
+
+# 添加项目根目录和 test 目录到路径
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from range_http_server import RangeHTTPServer
+from scripts import stream_extract, utils
+from scripts.stream_extract import download_and_extract
+
+ENTRIES = {
+    "BepInEx/": None,
+    "BepInEx/plugins/Fika/Fika.Core.dll": os.urandom(200 * 1024),
+    "BepInEx/config/com.fika.core.cfg": b"[Network]\nPort = 25565\n" * 100,
+    "SPT/user/mods/fika-server/package.json": b'{"name": "fika-server"}',
+    "../evil.txt": b"skip me",
+}
+
+
+class _Unseekable(io.RawIOBase):
+    """不可 seek 的输出流，让 zipfile 写出带数据描述符的条目。"""
+
+    def __init__(self) -> None:
+        self.buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.buffer += data
+        return len(data)
+
+
+def _build_zip(compression: int, streamed: bool = False) -> bytes:
+    """生成测试压缩包；streamed 为 True 时写到不可 seek 的流（带数据描述符）。"""
+    raw = _Unseekable() if streamed else io.BytesIO()
+    with zipfile.ZipFile(raw, "w", compression=compression) as archive:
+        for name, content in ENTRIES.items():
+            if content is None:
+                archive.writestr(zipfile.ZipInfo(name), b"")
+            elif streamed:
+                with archive.open(name, "w") as dst:
+                    dst.write(content)
+            else:
+                archive.writestr(name, content)
+    return bytes(raw.buffer) if streamed else raw.getvalue()
+
+
+def _check_install(tmp: Path, zip_bytes: bytes, files) -> None:
+    zip_path = tmp / "mods" / "fika.zip"
+    assert zip_path.read_bytes() == zip_bytes, "完整压缩包应保存到本地"
+    expected = utils.extract_zip(zip_path, tmp / "reference")
+    assert files == expected, f"文件列表应与 extract_zip 一致: {files} != {expected}"
+    for rel in expected:
+        assert (tmp / "install" / rel).read_bytes() == (tmp / "reference" / rel).read_bytes(), rel
+    assert not (tmp / "evil.txt").exists(), ".. 条目不应被解压"
+
+
+def test_stream_extract_without_fallback():
+    """测试普通压缩包和带数据描述符的压缩包都能在下载过程中直接解压。"""
+    print("=" * 60)
+    print("测试 1: 边下载边解压")
+    print("=" * 60)
+
+    original = stream_extract.utils.extract_zip
+
+    def _forbidden(*args, **kwargs):
+        raise AssertionError("不应退回为下载完成后解压")
+
+    for streamed in (False, True):
+        zip_bytes = _build_zip(zipfile.ZIP_DEFLATED, streamed=streamed)
+        with tempfile.TemporaryDirectory() as tmpdir, RangeHTTPServer({"fika.zip": zip_bytes}) as server:
+            tmp = Path(tmpdir)
+            stream_extract.utils.extract_zip = _forbidden
+            try:
+                files = download_and_extract(server.url("fika.zip"), tmp / "mods" / "fika.zip", tmp / "install",
+                                             show_progress=False)
+            finally:
+                stream_extract.utils.extract_zip = original
+            _check_install(tmp, zip_bytes, files)
+        print(f"[OK] {'带数据描述符的' if streamed else '普通'}压缩包边下载边解压成功")
+
+
+def test_stream_extract_fallbacks():
+    """测试无法流式解析的压缩包和下载中断时，退回为下载完成后解压。"""
+    print("\n" + "=" * 60)
+    print("测试 2: 回退流程")
+    print("=" * 60)
+
+    # 存储方式 + 数据描述符无法确定条目长度
+    zip_bytes = _build_zip(zipfile.ZIP_STORED, streamed=True)
+    with tempfile.TemporaryDirectory() as tmpdir, RangeHTTPServer({"fika.zip": zip_bytes}) as server:
+        tmp = Path(tmpdir)
+        files = download_and_extract(server.url("fika.zip"), tmp / "mods" / "fika.zip", tmp / "install",
+                                     show_progress=False)
+        _check_install(tmp, zip_bytes, files)
+    print("[OK] 无法流式解析时下载完成后解压")
+
+    zip_bytes = _build_zip(zipfile.ZIP_DEFLATED)
+    with tempfile.TemporaryDirectory() as tmpdir, \
+            RangeHTTPServer({"fika.zip": zip_bytes}, drop_after=100 * 1024, drop_times=1) as server:
+        tmp = Path(tmpdir)
+        files = download_and_extract(server.url("fika.zip"), tmp / "mods" / "fika.zip", tmp / "install",
+                                     show_progress=False)
+        _check_install(tmp, zip_bytes, files)
+        assert server.requests[-1][2] is not None, "中断后应使用 Range 续传"
+    print("[OK] 下载中断时续传后解压")
+
+
+if __name__ == "__main__":
+    try:
+        test_stream_extract_without_fallback()
+        test_stream_extract_fallbacks()
+        print("\n" + "=" * 60)
+        print("[PASS] 所有测试通过！")
+        print("=" * 60)
+    except AssertionError as e:
+        print(f"\n[FAIL] 测试失败: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n[ERROR] 测试出错: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
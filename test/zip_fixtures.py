@@ -0,0 +1,27 @@
+"""测试共用的压缩包与目录工具：按 {条目名: 内容} 生成 zip，读取目录内容做对比。"""
+
+import zipfile
+from pathlib import Path
+from typing import Dict, Optional
+
+
+def make_zip(path: Path, entries: Dict[str, Optional[bytes]], root: Optional[str] = None) -> Path:
+    """按 {条目名: 内容} 创建测试压缩包并返回其路径。
+
+    内容为 None 表示目录条目；给出 root 时所有条目放在该顶层目录下。
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in entries.items():
+            if root:
+                name = f"{root}/{name}"
+            if content is None:
+                archive.writestr(zipfile.ZipInfo(name), b"")
+            else:
+                archive.writestr(name, content)
+    return path
+
+
+def snapshot(root: Path) -> Dict[str, bytes]:
+    """目录中所有文件的 {相对路径（/ 分隔）: 内容}。"""
+    return {path.relative_to(root).as_posix(): path.read_bytes() for path in root.rglob("*") if path.is_file()}